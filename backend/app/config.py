@@ -1,34 +1,158 @@
-import logging
-from typing import Optional
-
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
-logging.basicConfig(level='DEBUG', format="%(levelname)s: %(message)s")
-
 
 class Settings(BaseSettings):
-    JWT_SECRET_KEY: Optional[str] = "your-secret-key-here"
-    JWT_ALGORITHM: Optional[str] = "HS256"
-    SERVICE_ACCOUNT_KEY: Optional[str] = None
-    FIREBASE_CREDENTIALS_PATH: Optional[str] = ""
-    FIREBASE_WEB_API_KEY: Optional[str] = None
-    
+    """Application settings, read from the environment and ``.env``."""
+
+    JWT_SECRET_KEY: str | None = "your-secret-key-here"  # noqa: S105
+    JWT_ALGORITHM: str | None = "HS256"
+    SERVICE_ACCOUNT_KEY: str | None = None
+    FIREBASE_CREDENTIALS_PATH: str | None = ""
+    FIREBASE_WEB_API_KEY: str | None = None
+
     # Firebase credentials
-    FIREBASE_TYPE: Optional[str] = "service_account"
-    FIREBASE_PROJECT_ID: Optional[str] = None
-    FIREBASE_PRIVATE_KEY_ID: Optional[str] = None
-    FIREBASE_PRIVATE_KEY: Optional[str] = None
-    FIREBASE_CLIENT_EMAIL: Optional[str] = None
-    FIREBASE_CLIENT_ID: Optional[str] = None
-    FIREBASE_AUTH_URI: Optional[str] = ""
-    FIREBASE_TOKEN_URI: Optional[str] = ""
-    FIREBASE_AUTH_PROVIDER_CERT_URL: Optional[str] = ""
-    FIREBASE_CLIENT_CERT_URL: Optional[str] = ""
-    FIREBASE_UNIVERSE_DOMAIN: Optional[str] = ""
-    
+    FIREBASE_TYPE: str | None = "service_account"
+    FIREBASE_PROJECT_ID: str | None = None
+    FIREBASE_PRIVATE_KEY_ID: str | None = None
+    FIREBASE_PRIVATE_KEY: str | None = None
+    FIREBASE_CLIENT_EMAIL: str | None = None
+    FIREBASE_CLIENT_ID: str | None = None
+    FIREBASE_AUTH_URI: str | None = ""
+    FIREBASE_TOKEN_URI: str | None = ""
+    FIREBASE_AUTH_PROVIDER_CERT_URL: str | None = ""
+    FIREBASE_CLIENT_CERT_URL: str | None = ""
+    FIREBASE_UNIVERSE_DOMAIN: str | None = ""
+
+    # Token verification
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: float = 300.0  # Capped by each token's own expiry
+    TOKEN_VERIFY_THREADS: int = 4
+    FIREBASE_CERT_REFRESH_SECONDS: float = 3600.0
+
     # Firestore Database Configuration
-    FIRESTORE_DB_NAME: Optional[str] = ""  # Default database name
-    
-    OPENAI_API_KEY: Optional[str] = ""
+    FIRESTORE_DB_NAME: str | None = ""  # Default database name
+    FIRESTORE_BACKEND: str = "firestore"  # "firestore" or "memory" (no Firebase at all)
+    MEMORY_FIRESTORE_LATENCY_SECONDS: float = 0.0  # Simulated round-trip time
+
+    OPENAI_API_KEY: str | None = ""
+    OPENAI_TIMEOUT_SECONDS: float = 60.0  # Per attempt
+    OPENAI_CALL_DEADLINE_SECONDS: float = 180.0  # All attempts and backoff of one call
+    # Retries of 408/409/429/5xx, timeouts and connection errors
+    OPENAI_MAX_RETRIES: int = 3
+    OPENAI_RETRY_BASE_DELAY_SECONDS: float = 1.0
+    # Retry-After headers may ask for longer
+    OPENAI_RETRY_MAX_DELAY_SECONDS: float = 30.0
+    # Consecutive failures that open the breaker
+    OPENAI_BREAKER_FAILURE_THRESHOLD: int = 5
+    OPENAI_BREAKER_RECOVERY_SECONDS: float = 30.0
+    OPENAI_BREAKER_HALF_OPEN_CALLS: int = 1  # Trial calls once the recovery time is up
+    OPENAI_MAX_CONNECTIONS: int = 100  # HTTP connection pool size
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_MAX_CONCURRENCY: int = 32  # Concurrent model calls per process
+    OPENAI_MAX_QUEUE_SIZE: int = 1000  # Calls allowed to wait for a free slot
+    OPENAI_BACKEND: str = "openai"  # "openai" or "fake"
+    FAKE_OPENAI_LATENCY_SECONDS: float = 0.5
+    FAKE_OPENAI_LATENCY_JITTER_SECONDS: float = 0.0
+    FAKE_OPENAI_ERROR_RATE: float = 0.0
+    FAKE_OPENAI_BATCH_LATENCY_SECONDS: float = 5.0  # Until a fake batch job completes
+
+    # Background job queue and workers
+    JOB_QUEUE_BACKEND: str = "sqlite"  # "sqlite" or "memory"
+    JOB_QUEUE_SQLITE_PATH: str = "kai_jobs.sqlite3"
+    JOB_QUEUE_MAX_DEPTH: int = 10000  # Submissions are rejected beyond this
+    JOB_QUEUE_BULK_MAX_DEPTH: int = 200000  # Bulk jobs, limited apart from live ones
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_VISIBILITY_TIMEOUT_SECONDS: float = 300.0
+    JOB_RETRY_BASE_DELAY_SECONDS: float = 5.0
+    JOB_RETRY_MAX_DELAY_SECONDS: float = 300.0
+    WORKER_CONCURRENCY: int = 8
+    WORKER_POLL_INTERVAL_SECONDS: float = 1.0
+    RUN_EMBEDDED_WORKER: bool = False  # Run a worker pool inside the API process
+    WORKER_METRICS_PORT: int = 9100  # Prometheus port of kai-worker; 0 disables
+
+    # Admission control on analysis submissions (token buckets)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (per process) or "sqlite" (per host)
+    RATE_LIMIT_SQLITE_PATH: str = "kai_ratelimit.sqlite3"
+    RATE_LIMIT_USER_PER_MINUTE: float = 60.0  # Texts per user
+    RATE_LIMIT_USER_BURST: float = 100.0  # Fits the largest batch
+    RATE_LIMIT_GLOBAL_PER_SECOND: float = 50.0  # Texts across all users; 0 disables
+    RATE_LIMIT_GLOBAL_BURST: float = 500.0
+    # Bulk texts per user, apart from the above
+    RATE_LIMIT_BULK_PER_MINUTE: float = 1000.0
+    RATE_LIMIT_BULK_BURST: float = 5000.0
+
+    # Batched status writes
+    STATUS_WRITER_FLUSH_INTERVAL_SECONDS: float = 0.05
+
+    # Analysis modes
+    ANALYSIS_MODE: str = "model"  # "model", "local" or "local-then-refine"
+    ANALYSIS_STREAMING: bool = False  # Stream model output and expose partial results
+    STREAM_PARTIAL_PUBLISH_INTERVAL_SECONDS: float = 0.1  # To status subscribers
+    STREAM_PARTIAL_WRITE_INTERVAL_SECONDS: float = 1.0  # To the Firestore document
+    ANALYSIS_CHUNK_TOKENS: int = 2000  # Longer texts are analyzed in parallel chunks
+    ANALYSIS_CHUNK_CONCURRENCY: int = 16  # Chunks of one text analyzed at once
+
+    # Model routing; a threshold of 0 disables its rule
+    ANALYSIS_MODEL: str = "gpt-4o"
+    ANALYSIS_FAST_MODEL: str = "gpt-4o-mini"
+    MODEL_ROUTING_ENABLED: bool = True  # False always uses ANALYSIS_MODEL
+    MODEL_ROUTING_PREMIUM_TIERS: str = "premium"  # Tier claims always on ANALYSIS_MODEL
+    # Texts up to this size use the fast model
+    MODEL_ROUTING_SHORT_TEXT_TOKENS: int = 150
+    # Queue depth that switches to the fast model
+    MODEL_ROUTING_BACKLOG_DEPTH: int = 5000
+    MODEL_ROUTING_LATENCY_P95_SECONDS: float = 30.0  # ANALYSIS_MODEL p95 that does too
+
+    # Bulk analyses through the OpenAI Batch API
+    # How often queued bulk texts are batched
+    BULK_COLLECT_INTERVAL_SECONDS: float = 60.0
+    BULK_BATCH_MAX_ITEMS: int = 50000  # Requests per batch file; the API allows 50,000
+    BULK_BATCH_MAX_BYTES: int = 100_000_000  # Batch file size; the API allows 200 MB
+    BULK_POLL_INTERVAL_SECONDS: float = 60.0  # How often running batches are checked
+    BULK_COMPLETION_WINDOW: str = "24h"
+    # Batches a request may go through unanswered before it fails
+    BULK_MAX_BATCHES: int = 3
+
+    # Analysis result cache
+    RESULT_CACHE_MAX_SIZE: int = 10000
+    RESULT_CACHE_TTL_SECONDS: float = 7 * 24 * 3600.0
+    RESULT_CACHE_PERSISTENT: bool = False  # Also keep results in Firestore
+    RESULT_CACHE_COLLECTION: str = "analysis_cache"
+
+    # Per-user cache of analysis list pages; a TTL of 0 disables it
+    # Bounds staleness from writes in other processes
+    LIST_CACHE_TTL_SECONDS: float = 5.0
+    LIST_CACHE_MAX_PAGES: int = 2000
+
+    # Idempotency-Key handling of analysis submissions
+    IDEMPOTENCY_TTL_SECONDS: float = 24 * 3600.0  # How long a key replays its response
+    IDEMPOTENCY_MAX_KEYS: int = 100000  # Keys kept in memory
+    # Duplicates wait this long for the first request
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0
+    # Also keep keys in Firestore, shared by instances
+    IDEMPOTENCY_PERSISTENT: bool = False
+    IDEMPOTENCY_COLLECTION: str = "idempotency_keys"
+    IDEMPOTENCY_LEASE_SECONDS: float = 60.0  # Reservation expiry if its instance dies
+
+    # Analysis history export
+    EXPORT_PAGE_SIZE: int = 1000  # Documents per Firestore stream() query
+    EXPORT_FLUSH_BYTES: int = 65536  # Output buffered before each write to the client
+
+    # Per-user analysis counters; more shards take more writes per second
+    ANALYSIS_STATS_SHARDS: int = 4
+
+    # Analysis status events (SSE and long-poll)
+    # One read of every watched request
+    STATUS_EVENTS_POLL_INTERVAL_SECONDS: float = 2.0
+    STATUS_EVENTS_IDLE_SECONDS: float = 30.0
+    STATUS_EVENTS_HEARTBEAT_SECONDS: float = 15.0
+
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # "text" or "json" (one object per line)
+    LOG_LEVELS: str = "uvicorn.access=WARNING"  # Per-logger levels, comma separated
+    LOG_ACCESS_SAMPLE_RATE: float = 1.0  # Share of per-request access lines kept
+    LOG_QUEUE_SIZE: int = 10000  # Records buffered for the writer thread
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
@@ -1,14 +1,15 @@
 from typing import Annotated
 
 from fastapi import Depends, HTTPException, status
-from firebase_admin import firestore
+from google.cloud.firestore_v1 import AsyncClient
 
 from app.config import Settings
 from app.firebase import get_firestore_client
+from app.jobs import JobQueue, get_job_queue
 
 
 # Dependency to get Firestore client
-def get_db():
+def get_db() -> AsyncClient:
     """Dependency to get Firestore database client."""
     try:
         db = get_firestore_client()
@@ -16,11 +17,13 @@ def get_db():
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Database connection failed: {str(e)}"
+            detail=f"Database connection failed: {e!s}",
         )
 
 
 # Type alias for dependency injection
-DbDependency = Annotated[firestore.Client, Depends(get_db)]
+DbDependency = Annotated[AsyncClient, Depends(get_db)]
+
+JobQueueDependency = Annotated[JobQueue, Depends(get_job_queue)]
 
 SettingsDependency = Annotated[Settings, Depends(Settings())]
@@ -2,6 +2,7 @@ import logging
 
 import firebase_admin
 from firebase_admin import credentials, firestore_async
+from google.cloud.firestore_v1 import AsyncClient
 
 from .config import Settings
 
@@ -10,22 +11,27 @@ _firebase_app = None
 _firestore_client = None
 
 
-def initialize_firebase():
+def initialize_firebase() -> firebase_admin.App | None:
     """Initialize Firebase Admin SDK."""
-
     global _firebase_app
-    
+
+    if settings.FIRESTORE_BACKEND == "memory":
+        logging.info(
+            "Using the in-memory Firestore backend; Firebase is not initialized"
+        )
+        return None
+
     if _firebase_app is not None:
         logging.info("✅ Firebase already initialized")
         return _firebase_app
 
-    # Path to service account key
-    cred_path = settings.FIREBASE_CREDENTIALS_PATH
     cred_dict = {
         "type": settings.FIREBASE_TYPE,
         "project_id": settings.FIREBASE_PROJECT_ID,
         "private_key_id": settings.FIREBASE_PRIVATE_KEY_ID,
-        "private_key": settings.FIREBASE_PRIVATE_KEY.replace('\\n', '\n') if settings.FIREBASE_PRIVATE_KEY else None,
+        "private_key": settings.FIREBASE_PRIVATE_KEY.replace("\\n", "\n")
+        if settings.FIREBASE_PRIVATE_KEY
+        else None,
         "client_email": settings.FIREBASE_CLIENT_EMAIL,
         "client_id": settings.FIREBASE_CLIENT_ID,
         "auth_uri": settings.FIREBASE_AUTH_URI,
@@ -43,28 +49,34 @@ def initialize_firebase():
     return _firebase_app
 
 
-def get_firestore_client():
+def get_firestore_client() -> AsyncClient:
     """Get Firestore database client singleton."""
-
     global _firestore_client
+    if _firestore_client is None and settings.FIRESTORE_BACKEND == "memory":
+        from .local.firestore import InMemoryFirestore
+
+        _firestore_client = InMemoryFirestore(
+            latency=settings.MEMORY_FIRESTORE_LATENCY_SECONDS
+        )
+        logging.info("✅ In-memory Firestore client created")
     if _firestore_client is None:
         if _firebase_app is None:
             initialize_firebase()
-        
+
         # Get database name
         db_name = settings.FIRESTORE_DB_NAME or ""
-        
+
         # Connect to specific database
         # For named databases, use the database parameter
         _firestore_client = firestore_async.client(
             app=_firestore_client, database_id=db_name
         )
-        
+
         logging.info(f"✅ Firestore client connected to database: {db_name}")
-    
+
     return _firestore_client
 
 
-def get_db():
-    """Alias for get_firestore_client()"""
-    return get_firestore_client()
\ No newline at end of file
+def get_db() -> AsyncClient:
+    """Alias for get_firestore_client()."""
+    return get_firestore_client()
@@ -0,0 +1,37 @@
+from app.config import Settings
+from app.jobs.base import Job, JobDeferredError, JobQueue, JobQueueFullError
+from app.jobs.memory import InMemoryJobQueue
+from app.jobs.sqlite import SQLiteJobQueue
+
+settings = Settings()
+_job_queue = None
+
+
+def get_job_queue() -> JobQueue:
+    """Get the job queue singleton for the configured backend."""
+    global _job_queue
+    if _job_queue is None:
+        from app.services.bulk_analysis import BULK_ANALYZE_JOB, BULK_POLL_JOB
+
+        # Bulk work is limited on its own so it never fills the queue for live work
+        type_max_depths = {
+            BULK_ANALYZE_JOB: settings.JOB_QUEUE_BULK_MAX_DEPTH,
+            BULK_POLL_JOB: settings.JOB_QUEUE_BULK_MAX_DEPTH,
+        }
+        backend = settings.JOB_QUEUE_BACKEND
+        if backend == "memory":
+            _job_queue = InMemoryJobQueue(
+                max_depth=settings.JOB_QUEUE_MAX_DEPTH,
+                max_attempts=settings.JOB_MAX_ATTEMPTS,
+                type_max_depths=type_max_depths,
+            )
+        elif backend == "sqlite":
+            _job_queue = SQLiteJobQueue(
+                path=settings.JOB_QUEUE_SQLITE_PATH,
+                max_depth=settings.JOB_QUEUE_MAX_DEPTH,
+                max_attempts=settings.JOB_MAX_ATTEMPTS,
+                type_max_depths=type_max_depths,
+            )
+        else:
+            raise ValueError(f"Unknown job queue backend: {backend}")
+    return _job_queue
@@ -0,0 +1,153 @@
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import Awaitable, Callable, Collection
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+
+class JobQueueFullError(Exception):
+    """Raised when the queue has reached its configured maximum depth."""
+
+
+class JobDeferredError(Exception):
+    """Raised by a handler to run its job again later without using up an attempt."""
+
+    def __init__(self, delay: float, reason: str = "") -> None:
+        super().__init__(reason or f"Job deferred for {delay:.1f}s")
+        self.delay = delay
+
+
+class Job(BaseModel):
+    """A unit of background work stored in a job queue."""
+
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex, description="Job ID")
+    type: str = Field(description="Handler name used to process the job")
+    payload: dict[str, Any] = Field(
+        default_factory=dict, description="Handler arguments"
+    )
+    tenant: str = Field(default="", description="Owner the job is scheduled fairly by")
+    attempts: int = Field(default=0, description="Number of times the job was claimed")
+    max_attempts: int = Field(default=3, description="Claims allowed before giving up")
+    visible_at: float = Field(
+        default_factory=time.time, description="Earliest claim time"
+    )
+    created_at: float = Field(default_factory=time.time, description="Enqueue time")
+    lease_id: str | None = Field(default=None, description="Token of the current lease")
+    last_error: str | None = Field(
+        default=None, description="Error from the last attempt"
+    )
+
+    @property
+    def is_last_attempt(self) -> bool:
+        """Whether a failure of the current attempt is final."""
+        return self.attempts >= self.max_attempts
+
+
+class JobQueue(ABC):
+    """Interface for durable job queues.
+
+    Claimed jobs are leased: they stay invisible to other workers until the
+    visibility timeout expires, after which they can be claimed again. A
+    worker must ``ack`` a job to remove it or ``retry`` it to reschedule it;
+    ``defer`` reschedules it without counting the attempt. Lease-holding
+    calls take the ``lease_id`` returned by ``claim`` so a worker whose
+    lease already expired cannot settle someone else's claim.
+
+    Claims are fair-share: they rotate between the tenants that have
+    visible jobs, starting with the tenant claimed from longest ago, and
+    take that tenant's oldest visible job. One tenant's backlog therefore
+    cannot starve the others.
+
+    Job types in ``type_max_depths`` have a depth limit of their own and
+    are left out of ``max_depth``, which all other types share, so e.g. a
+    backlog of bulk work cannot fill the queue for live work.
+
+    A job whose last lease expires without an ack or retry (its worker
+    died) is dropped by the next claim and passed to
+    ``dead_letter_handler``, which settles the work it stood for.
+    """
+
+    max_depth: int
+    type_max_depths: dict[str, int]
+    dead_letter_handler: Callable[[Job], Awaitable[None]] | None = None
+
+    def max_depth_of(self, job_type: str) -> int:
+        """Depth limit that jobs of ``job_type`` are enqueued against."""
+        return self.type_max_depths.get(job_type, self.max_depth)
+
+    async def _dead_letter(self, job: Job) -> None:
+        """Hand a job whose last lease expired to the dead-letter handler."""
+        logging.warning("Dropping job %s after %s attempts", job.id, job.attempts)
+        if self.dead_letter_handler is None:
+            return
+        try:
+            await self.dead_letter_handler(job)
+        except Exception as e:
+            logging.error("Dead-letter handler failed for job %s: %s", job.id, e)
+
+    @abstractmethod
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: dict[str, Any],
+        delay: float = 0,
+        max_attempts: int | None = None,
+        tenant: str = "",
+    ) -> Job:
+        """Add a job to the queue."""
+
+    async def enqueue_many(
+        self, job_type: str, payloads: list[dict[str, Any]], tenant: str = ""
+    ) -> list[Job]:
+        """Add several jobs of the same type and tenant, all or nothing."""
+        if await self.depth(job_type) + len(payloads) > self.max_depth_of(job_type):
+            raise JobQueueFullError(f"Job queue cannot take {len(payloads)} more jobs")
+        return [
+            await self.enqueue(job_type, payload, tenant=tenant) for payload in payloads
+        ]
+
+    @abstractmethod
+    async def claim(
+        self, visibility_timeout: float, job_types: Collection[str] | None = None
+    ) -> Job | None:
+        """Lease the next visible job, or return None if there is none.
+
+        Args:
+            visibility_timeout: Seconds the job stays leased
+            job_types: Only claim jobs of these types; any type if None
+        """
+
+    @abstractmethod
+    async def extend(self, job: Job, visibility_timeout: float) -> bool:
+        """Push back the lease expiry of a claimed job."""
+
+    @abstractmethod
+    async def ack(self, job: Job) -> bool:
+        """Remove a successfully processed job."""
+
+    @abstractmethod
+    async def retry(self, job: Job, delay: float, error: str) -> bool:
+        """Reschedule a failed job.
+
+        Returns:
+            True if the job was rescheduled, False if it ran out of attempts
+        """
+
+    @abstractmethod
+    async def defer(self, job: Job, delay: float) -> bool:
+        """Reschedule a claimed job without counting the current attempt."""
+
+    @abstractmethod
+    async def depth(self, job_type: str | None = None) -> int:
+        """Count the jobs queued or in flight.
+
+        Args:
+            job_type: Only count the jobs sharing the depth limit of this
+                type; every job if None
+        """
+
+    async def close(self) -> None:  # noqa: B027
+        """Release any resources held by the queue."""
@@ -0,0 +1,144 @@
+import time
+import uuid
+from collections.abc import Collection, Mapping
+from typing import Any
+
+from app.jobs.base import Job, JobQueue, JobQueueFullError
+
+
+class InMemoryJobQueue(JobQueue):
+    """Job queue kept in process memory.
+
+    Jobs do not survive a restart, so this backend is meant for local
+    development and for running the worker pool inside the API process.
+    """
+
+    def __init__(
+        self,
+        max_depth: int,
+        max_attempts: int,
+        type_max_depths: Mapping[str, int] | None = None,
+    ) -> None:
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        self.type_max_depths = dict(type_max_depths or {})
+        self._jobs: dict[str, Job] = {}
+        self._last_claimed: dict[str, float] = {}
+
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: dict[str, Any],
+        delay: float = 0,
+        max_attempts: int | None = None,
+        tenant: str = "",
+    ) -> Job:
+        """Add a job, refusing it once its depth limit is reached."""
+        depth = await self.depth(job_type)
+        if depth >= self.max_depth_of(job_type):
+            raise JobQueueFullError(f"Job queue is full ({depth} {job_type} jobs)")
+        job = Job(
+            type=job_type,
+            payload=payload,
+            max_attempts=max_attempts or self.max_attempts,
+            visible_at=time.time() + delay,
+            tenant=tenant,
+        )
+        self._jobs[job.id] = job
+        return job
+
+    async def claim(
+        self, visibility_timeout: float, job_types: Collection[str] | None = None
+    ) -> Job | None:
+        """Lease the oldest visible job of the tenant served longest ago."""
+        now = time.time()
+        while True:
+            # Oldest visible job of each tenant
+            oldest: dict[str, Job] = {}
+            for job in self._jobs.values():
+                if job.visible_at <= now and (
+                    job_types is None or job.type in job_types
+                ):
+                    current = oldest.get(job.tenant)
+                    if current is None or job.visible_at < current.visible_at:
+                        oldest[job.tenant] = job
+            if not oldest:
+                return None
+            job = min(
+                oldest.values(),
+                key=lambda item: (
+                    self._last_claimed.get(item.tenant, 0.0),
+                    item.visible_at,
+                ),
+            )
+            if job.lease_id is not None and job.is_last_attempt:
+                # The last lease expired without an ack or retry
+                del self._jobs[job.id]
+                await self._dead_letter(job.model_copy())
+                continue
+            job.attempts += 1
+            job.lease_id = uuid.uuid4().hex
+            job.visible_at = now + visibility_timeout
+            self._last_claimed[job.tenant] = now
+            if len(self._last_claimed) > len(self._jobs):
+                tenants = {item.tenant for item in self._jobs.values()}
+                self._last_claimed = {
+                    tenant: claimed_at
+                    for tenant, claimed_at in self._last_claimed.items()
+                    if tenant in tenants
+                }
+            return job.model_copy()
+
+    def _leased(self, job: Job) -> Job | None:
+        stored = self._jobs.get(job.id)
+        if stored is None or stored.lease_id != job.lease_id:
+            return None
+        return stored
+
+    async def extend(self, job: Job, visibility_timeout: float) -> bool:
+        """Push back the lease expiry of a job still held."""
+        stored = self._leased(job)
+        if stored is None:
+            return False
+        stored.visible_at = time.time() + visibility_timeout
+        return True
+
+    async def ack(self, job: Job) -> bool:
+        """Delete a finished job if the lease is still held."""
+        if self._leased(job) is None:
+            return False
+        del self._jobs[job.id]
+        return True
+
+    async def retry(self, job: Job, delay: float, error: str) -> bool:
+        """Release a failed job to be claimed again after ``delay``."""
+        stored = self._leased(job)
+        if stored is None:
+            return False
+        if stored.is_last_attempt:
+            del self._jobs[job.id]
+            return False
+        stored.lease_id = None
+        stored.last_error = error
+        stored.visible_at = time.time() + delay
+        return True
+
+    async def defer(self, job: Job, delay: float) -> bool:
+        """Release a job after ``delay`` without spending an attempt."""
+        stored = self._leased(job)
+        if stored is None:
+            return False
+        stored.attempts = max(stored.attempts - 1, 0)
+        stored.lease_id = None
+        stored.visible_at = time.time() + delay
+        return True
+
+    async def depth(self, job_type: str | None = None) -> int:
+        """Count the jobs sharing the depth limit of ``job_type``."""
+        if job_type is None:
+            return len(self._jobs)
+        if job_type in self.type_max_depths:
+            return sum(1 for job in self._jobs.values() if job.type == job_type)
+        return sum(
+            1 for job in self._jobs.values() if job.type not in self.type_max_depths
+        )
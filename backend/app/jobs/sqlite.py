@@ -0,0 +1,339 @@
+import asyncio
+import functools
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Callable, Collection, Mapping
+from typing import Any, TypeVar
+
+from app.jobs.base import Job, JobQueue, JobQueueFullError
+
+T = TypeVar("T")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    visible_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    lease_id TEXT,
+    last_error TEXT,
+    tenant TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS job_tenants (
+    tenant TEXT PRIMARY KEY,
+    last_claimed_at REAL NOT NULL
+);
+"""
+
+# Created after the tenant column migration for databases that predate it
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS jobs_visible_at ON jobs (visible_at);
+CREATE INDEX IF NOT EXISTS jobs_tenant_visible_at ON jobs (tenant, visible_at);
+CREATE INDEX IF NOT EXISTS jobs_type_tenant_visible_at
+    ON jobs (type, tenant, visible_at);
+DROP INDEX IF EXISTS jobs_type;
+"""
+
+_COLUMNS = (
+    "id, type, payload, attempts, max_attempts, visible_at, created_at, "
+    "lease_id, last_error, tenant"
+)
+
+
+@functools.cache
+def _claim_queries(type_count: int) -> tuple[str, str]:
+    """Build the SQL of a claim's tenant and job lookups for ``type_count`` types.
+
+    With no types (``0``) every job is a candidate. Otherwise each type is
+    looked up in the ``(type, tenant, visible_at)`` index on its own, since
+    a type filter over the tenant index would read every job's row.
+    """
+    if not type_count:
+        return (
+            "SELECT tenant, MIN(visible_at) AS visible_at FROM jobs GROUP BY tenant",
+            f"SELECT {_COLUMNS} FROM jobs WHERE tenant = ? AND visible_at <= ? "  # noqa: S608
+            "ORDER BY visible_at LIMIT 1",
+        )
+    heads_of_type = (
+        "SELECT tenant, MIN(visible_at) AS visible_at FROM jobs "
+        "WHERE type = ? GROUP BY tenant"
+    )
+    next_of_type = (
+        f"SELECT * FROM (SELECT {_COLUMNS} FROM jobs "  # noqa: S608
+        "WHERE type = ? AND tenant = ? AND visible_at <= ? "
+        "ORDER BY visible_at LIMIT 1)"
+    )
+    heads = " UNION ALL ".join([heads_of_type] * type_count)
+    return (
+        f"SELECT tenant, MIN(visible_at) AS visible_at FROM ({heads}) GROUP BY tenant",  # noqa: S608
+        " UNION ALL ".join([next_of_type] * type_count)
+        + " ORDER BY visible_at LIMIT 1",
+    )
+
+
+class SQLiteJobQueue(JobQueue):
+    """Durable job queue stored in a local SQLite database.
+
+    The database file can be shared by the API process and any number of
+    ``kai-worker`` processes on the same host. Blocking SQLite calls run in
+    a thread so they never stall the event loop.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_depth: int,
+        max_attempts: int,
+        type_max_depths: Mapping[str, int] | None = None,
+    ) -> None:
+        self.path = path
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        self.type_max_depths = dict(type_max_depths or {})
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "tenant" not in columns:
+            self._conn.execute(
+                "ALTER TABLE jobs ADD COLUMN tenant TEXT NOT NULL DEFAULT ''"
+            )
+        self._conn.executescript(_INDEXES)
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.to_thread(self._locked, func, *args)
+
+    def _locked(self, func: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            return func(*args)
+
+    @staticmethod
+    def _to_job(row: tuple) -> Job:
+        return Job(
+            id=row[0],
+            type=row[1],
+            payload=json.loads(row[2]),
+            attempts=row[3],
+            max_attempts=row[4],
+            visible_at=row[5],
+            created_at=row[6],
+            lease_id=row[7],
+            last_error=row[8],
+            tenant=row[9],
+        )
+
+    def _depth(self, job_type: str | None) -> int:
+        if job_type is None:
+            sql, params = "SELECT COUNT(*) FROM jobs", ()
+        elif job_type in self.type_max_depths:
+            sql, params = "SELECT COUNT(*) FROM jobs WHERE type = ?", (job_type,)
+        else:
+            own_limits = tuple(self.type_max_depths)
+            sql = "SELECT COUNT(*) FROM jobs"
+            if own_limits:
+                sql += f" WHERE type NOT IN ({', '.join('?' * len(own_limits))})"
+            params = own_limits
+        (depth,) = self._conn.execute(sql, params).fetchone()
+        return depth
+
+    def _enqueue(self, jobs: list[Job]) -> list[Job]:
+        # Jobs enqueued together share one type
+        job_type = jobs[0].type
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            depth = self._depth(job_type)
+            if depth + len(jobs) > self.max_depth_of(job_type):
+                raise JobQueueFullError(f"Job queue is full ({depth} {job_type} jobs)")
+            self._conn.executemany(
+                f"INSERT INTO jobs ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",  # noqa: S608
+                [
+                    (
+                        job.id,
+                        job.type,
+                        json.dumps(job.payload),
+                        job.attempts,
+                        job.max_attempts,
+                        job.visible_at,
+                        job.created_at,
+                        None,
+                        None,
+                        job.tenant,
+                    )
+                    for job in jobs
+                ],
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return jobs
+
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: dict[str, Any],
+        delay: float = 0,
+        max_attempts: int | None = None,
+        tenant: str = "",
+    ) -> Job:
+        """Insert a job, refusing it once its depth limit is reached."""
+        job = Job(
+            type=job_type,
+            payload=payload,
+            max_attempts=max_attempts or self.max_attempts,
+            visible_at=time.time() + delay,
+            tenant=tenant,
+        )
+        (job,) = await self._run(self._enqueue, [job])
+        return job
+
+    async def enqueue_many(
+        self, job_type: str, payloads: list[dict[str, Any]], tenant: str = ""
+    ) -> list[Job]:
+        """Insert jobs in one transaction, all or none."""
+        jobs = [
+            Job(
+                type=job_type,
+                payload=payload,
+                max_attempts=self.max_attempts,
+                tenant=tenant,
+            )
+            for payload in payloads
+        ]
+        return await self._run(self._enqueue, jobs)
+
+    def _claim(
+        self,
+        visibility_timeout: float,
+        job_types: tuple[str, ...] | None,
+        dropped: list[Job],
+    ) -> Job | None:
+        now = time.time()
+        heads_sql, next_sql = _claim_queries(len(job_types or ()))
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                # The tenant claimed from longest ago among those with a
+                # visible job, found from covering index entries alone
+                tenant = self._conn.execute(
+                    f"SELECT next.tenant FROM ({heads_sql}) AS next "  # noqa: S608
+                    "LEFT JOIN job_tenants USING (tenant) "
+                    "WHERE next.visible_at <= ? "
+                    "ORDER BY COALESCE(job_tenants.last_claimed_at, 0), next.visible_at "
+                    "LIMIT 1",
+                    (*(job_types or ()), now),
+                ).fetchone()
+                if tenant is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                row = self._conn.execute(
+                    next_sql,
+                    (tenant[0], now)
+                    if job_types is None
+                    else tuple(
+                        param
+                        for job_type in job_types
+                        for param in (job_type, tenant[0], now)
+                    ),
+                ).fetchone()
+                job = self._to_job(row)
+                if job.lease_id is not None and job.is_last_attempt:
+                    # The last lease expired without an ack or retry
+                    self._conn.execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+                    dropped.append(job)
+                    continue
+                job.attempts += 1
+                job.lease_id = uuid.uuid4().hex
+                job.visible_at = now + visibility_timeout
+                self._conn.execute(
+                    "UPDATE jobs SET attempts = ?, lease_id = ?, visible_at = ? "
+                    "WHERE id = ?",
+                    (job.attempts, job.lease_id, job.visible_at, job.id),
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO job_tenants (tenant, last_claimed_at) VALUES (?, ?)",
+                    (job.tenant, now),
+                )
+                self._conn.execute("COMMIT")
+                return job
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    async def claim(
+        self, visibility_timeout: float, job_types: Collection[str] | None = None
+    ) -> Job | None:
+        """Lease the oldest visible job of the tenant served longest ago."""
+        dropped: list[Job] = []
+        job = await self._run(
+            self._claim,
+            visibility_timeout,
+            tuple(sorted(job_types)) if job_types is not None else None,
+            dropped,
+        )
+        # Handled once the drops are committed
+        for dropped_job in dropped:
+            await self._dead_letter(dropped_job)
+        return job
+
+    def _execute(self, sql: str, params: tuple) -> int:
+        return self._conn.execute(sql, params).rowcount
+
+    async def extend(self, job: Job, visibility_timeout: float) -> bool:
+        """Push back the lease expiry of a job still held."""
+        updated = await self._run(
+            self._execute,
+            "UPDATE jobs SET visible_at = ? WHERE id = ? AND lease_id = ?",
+            (time.time() + visibility_timeout, job.id, job.lease_id),
+        )
+        return updated == 1
+
+    async def ack(self, job: Job) -> bool:
+        """Delete a finished job if the lease is still held."""
+        deleted = await self._run(
+            self._execute,
+            "DELETE FROM jobs WHERE id = ? AND lease_id = ?",
+            (job.id, job.lease_id),
+        )
+        return deleted == 1
+
+    async def retry(self, job: Job, delay: float, error: str) -> bool:
+        """Release a failed job to be claimed again after ``delay``."""
+        if job.is_last_attempt:
+            await self.ack(job)
+            return False
+        updated = await self._run(
+            self._execute,
+            "UPDATE jobs SET lease_id = NULL, last_error = ?, visible_at = ? "
+            "WHERE id = ? AND lease_id = ?",
+            (error, time.time() + delay, job.id, job.lease_id),
+        )
+        return updated == 1
+
+    async def defer(self, job: Job, delay: float) -> bool:
+        """Release a job after ``delay`` without spending an attempt."""
+        updated = await self._run(
+            self._execute,
+            "UPDATE jobs SET lease_id = NULL, attempts = MAX(attempts - 1, 0), visible_at = ? "
+            "WHERE id = ? AND lease_id = ?",
+            (time.time() + delay, job.id, job.lease_id),
+        )
+        return updated == 1
+
+    async def depth(self, job_type: str | None = None) -> int:
+        """Count the jobs sharing the depth limit of ``job_type``."""
+        return await self._run(self._depth, job_type)
+
+    async def close(self) -> None:
+        """Close the database connection."""
+        await self._run(self._conn.close)
@@ -0,0 +1,13 @@
+"""In-process stand-ins for the external services the API depends on.
+
+They are selected with ``FIRESTORE_BACKEND=memory`` and
+``OPENAI_BACKEND=fake`` and let the real ASGI app run without Google or
+OpenAI credentials, e.g. for the load-test benchmark. ``seed_tokens``
+lets local users through authentication without Firebase.
+"""
+
+from app.local.auth import bench_token, seed_tokens
+from app.local.firestore import InMemoryFirestore
+from app.local.openai import FakeAsyncOpenAI
+
+__all__ = ["FakeAsyncOpenAI", "InMemoryFirestore", "bench_token", "seed_tokens"]
@@ -0,0 +1,28 @@
+import time
+
+
+def bench_token(user: int) -> str:
+    """Return the token of local user number ``user``."""
+    return f"bench-token-{user}"
+
+
+def seed_tokens(users: int) -> None:
+    """Cache decoded tokens for ``users`` local users so the middleware accepts them.
+
+    User ``n`` is ``bench-user-{n}`` and sends ``bench_token(n)``; the
+    tokens are valid for a day and never reach Firebase.
+    """
+    from app.utils.token_verification import TokenCache, get_token_cache
+
+    cache = get_token_cache()
+    expires_at = time.time() + 24 * 3600
+    for user in range(users):
+        cache.set(
+            TokenCache.key(bench_token(user)),
+            {
+                "uid": f"bench-user-{user}",
+                "name": f"Bench User {user}",
+                "email": f"bench-{user}@example.com",
+                "exp": expires_at,
+            },
+        )
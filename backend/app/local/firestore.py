@@ -0,0 +1,640 @@
+import asyncio
+import copy
+import functools
+import uuid
+from collections.abc import AsyncIterator, Iterable
+from datetime import UTC, datetime
+from typing import Any
+
+from google.api_core.exceptions import AlreadyExists, InvalidArgument, NotFound
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1.aggregation import AggregationResult
+
+from app.utils.firestore import FIRESTORE_BATCH_LIMIT
+
+DOCUMENT_ID = "__name__"
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+# Values that compare natively when both sides have the same type
+_SCALAR_TYPES = frozenset((str, int, float, bool, datetime, bytes))
+
+
+def _auto_id() -> str:
+    return uuid.uuid4().hex[:20]
+
+
+def _get_field(data: dict, field_path: str) -> tuple[bool, Any]:
+    """Look up a dotted field path; returns whether it exists and its value."""
+    value = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return False, None
+        value = value[part]
+    return True, value
+
+
+def _transform(exists: bool, current: Any, value: Any) -> Any:
+    """Resolve sentinels and transforms against the current field value."""
+    if value is transforms.SERVER_TIMESTAMP:
+        return datetime.now(UTC)
+    if isinstance(value, transforms.Increment):
+        base = current if exists and isinstance(current, int | float) else 0
+        return base + value.value
+    if isinstance(value, transforms.Maximum):
+        return (
+            max(current, value.value)
+            if exists and isinstance(current, int | float)
+            else value.value
+        )
+    if isinstance(value, transforms.Minimum):
+        return (
+            min(current, value.value)
+            if exists and isinstance(current, int | float)
+            else value.value
+        )
+    if isinstance(value, transforms.ArrayUnion):
+        items = list(current) if exists and isinstance(current, list) else []
+        return items + [item for item in value.values if item not in items]
+    if isinstance(value, transforms.ArrayRemove):
+        items = list(current) if exists and isinstance(current, list) else []
+        return [item for item in items if item not in value.values]
+    return copy.deepcopy(value)
+
+
+def _set_field(data: dict, field_path: str, value: Any) -> None:
+    """Set (or delete, for ``DELETE_FIELD``) a dotted field path."""
+    *parents, key = field_path.split(".")
+    target = data
+    for part in parents:
+        child = target.get(part)
+        if not isinstance(child, dict):
+            child = target[part] = {}
+        target = child
+    if value is transforms.DELETE_FIELD:
+        target.pop(key, None)
+    else:
+        target[key] = _transform(key in target, target.get(key), value)
+
+
+def _merge(target: dict, data: dict) -> None:
+    """Deep-merge ``data`` into ``target`` the way ``set(merge=True)`` does."""
+    for key, value in data.items():
+        if value is transforms.DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict):
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            _merge(target[key], value)
+        else:
+            target[key] = _transform(key in target, target.get(key), value)
+
+
+def _type_rank(value: Any) -> int:
+    # Firestore orders values of different types by type first
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, int | float):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, list):
+        return 8
+    if isinstance(value, dict):
+        return 9
+    return 10
+
+
+def _compare(a: Any, b: Any) -> int:
+    if type(a) is type(b) and type(a) in _SCALAR_TYPES:
+        return (a > b) - (a < b)
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if rank_a == 8:
+        for item_a, item_b in zip(a, b, strict=False):
+            result = _compare(item_a, item_b)
+            if result:
+                return result
+        return _compare(len(a), len(b))
+    if rank_a in (0, 9, 10):
+        a, b = repr(a), repr(b)
+    return (a > b) - (a < b)
+
+
+def _matches(data: dict, field_path: str, op: str, operand: Any) -> bool:
+    exists, value = _get_field(data, field_path)
+    if not exists:
+        return False
+    if op == "==":
+        return _compare(value, operand) == 0
+    if op == "!=":
+        return value is not None and _compare(value, operand) != 0
+    if op in ("<", "<=", ">", ">="):
+        if _type_rank(value) != _type_rank(operand):
+            return False
+        result = _compare(value, operand)
+        return {"<": result < 0, "<=": result <= 0, ">": result > 0, ">=": result >= 0}[
+            op
+        ]
+    if op == "in":
+        return any(_compare(value, item) == 0 for item in operand)
+    if op == "not-in":
+        return value is not None and all(_compare(value, item) != 0 for item in operand)
+    if op == "array_contains":
+        return isinstance(value, list) and any(
+            _compare(item, operand) == 0 for item in value
+        )
+    if op == "array_contains_any":
+        return isinstance(value, list) and any(
+            _compare(item, candidate) == 0 for item in value for candidate in operand
+        )
+    raise InvalidArgument(f"Unsupported filter operator: {op}")
+
+
+class InMemoryFirestore:
+    """Async Firestore stand-in that keeps every collection in memory.
+
+    It implements the subset of the ``firestore_async`` client the app uses:
+    document get/set/create/update/delete, collection ``add``, queries with
+    ``where``/``order_by``/``start_after``/``offset``/``limit``/``select``,
+    ``count()`` aggregations, ``stream()``, ``get_all`` and write batches, including
+    ``DELETE_FIELD``, ``SERVER_TIMESTAMP`` and ``Increment`` values.
+
+    Every call that would be a round trip to Firestore sleeps for
+    ``latency`` seconds, so benchmarks can model the network cost.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self._collections: dict[str, dict[str, dict[str, Any]]] = {}
+        self.round_trips = 0
+        self.documents_read = 0
+        self.documents_written = 0
+
+    def collection(self, *path: str) -> "InMemoryCollection":
+        """Return the collection at a slash-joined path."""
+        return InMemoryCollection(self, "/".join(path))
+
+    def document(self, *path: str) -> "InMemoryDocument":
+        """Return the document at a slash-joined path."""
+        collection_path, document_id = "/".join(path).rsplit("/", 1)
+        return InMemoryDocument(self, collection_path, document_id)
+
+    def batch(self) -> "InMemoryWriteBatch":
+        """Start a write batch."""
+        return InMemoryWriteBatch(self)
+
+    def close(self) -> None:
+        """Do nothing; there is no connection to close."""
+
+    async def get_all(
+        self,
+        references: Iterable["InMemoryDocument"],
+        field_paths: Iterable[str] | None = None,
+    ) -> AsyncIterator["InMemorySnapshot"]:
+        """Read several documents in one round trip, in the order given."""
+        references = list(references)
+        await self._round_trip()
+        for reference in references:
+            data = self._documents(reference._collection_path).get(reference.id)
+            self.documents_read += 1
+            if data is not None and field_paths is not None:
+                data = _project(data, field_paths)
+            yield InMemorySnapshot(reference, copy.deepcopy(data))
+
+    def stats(self) -> dict[str, int]:
+        """Round trips and document operations so far."""
+        return {
+            "documents": sum(len(docs) for docs in self._collections.values()),
+            "round_trips": self.round_trips,
+            "documents_read": self.documents_read,
+            "documents_written": self.documents_written,
+        }
+
+    async def _round_trip(self) -> None:
+        self.round_trips += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+    def _documents(self, collection_path: str) -> dict[str, dict[str, Any]]:
+        return self._collections.setdefault(collection_path, {})
+
+    def _check(self, reference: "InMemoryDocument", option: str) -> None:
+        exists = reference.id in self._documents(reference._collection_path)
+        if option == "update" and not exists:
+            raise NotFound(f"No document to update: {reference.path}")
+        if option == "create" and exists:
+            raise AlreadyExists(f"Document already exists: {reference.path}")
+
+    def _write(
+        self,
+        reference: "InMemoryDocument",
+        option: str,
+        data: dict[str, Any] | None = None,
+        merge: bool | list[str] = False,
+    ) -> None:
+        documents = self._documents(reference._collection_path)
+        if option == "delete":
+            documents.pop(reference.id, None)
+            return
+
+        current = documents.get(reference.id)
+        if option == "update" or merge:
+            document = copy.deepcopy(current) if current is not None else {}
+        else:
+            document = {}
+
+        if option == "update":
+            for field_path, value in data.items():
+                _set_field(document, field_path, value)
+        elif isinstance(merge, list):
+            for field_path in merge:
+                exists, value = _get_field(data, field_path)
+                _set_field(
+                    document, field_path, value if exists else transforms.DELETE_FIELD
+                )
+        else:
+            _merge(document, data)
+        documents[reference.id] = document
+        self.documents_written += 1
+
+
+class InMemorySnapshot:
+    """Read-only view of a document at the time it was read."""
+
+    def __init__(
+        self, reference: "InMemoryDocument", data: dict[str, Any] | None
+    ) -> None:
+        self.reference = reference
+        self._data = data
+
+    @property
+    def id(self) -> str:
+        """Return the document ID."""
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        """Return whether the document existed when read."""
+        return self._data is not None
+
+    def to_dict(self) -> dict[str, Any] | None:
+        """Return a copy of the document data, or None if it did not exist."""
+        return copy.deepcopy(self._data)
+
+    def get(self, field_path: str) -> Any:
+        """Return the value at a dotted field path, raising KeyError if missing."""
+        exists, value = _get_field(self._data or {}, field_path)
+        if not exists:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class InMemoryDocument:
+    """Reference to a document, like ``AsyncDocumentReference``."""
+
+    def __init__(
+        self, client: InMemoryFirestore, collection_path: str, document_id: str
+    ) -> None:
+        self._client = client
+        self._collection_path = collection_path
+        self.id = document_id
+
+    @property
+    def path(self) -> str:
+        """Return the slash-separated path of the document."""
+        return f"{self._collection_path}/{self.id}"
+
+    @property
+    def parent(self) -> "InMemoryCollection":
+        """Return the collection holding the document."""
+        return InMemoryCollection(self._client, self._collection_path)
+
+    def collection(self, collection_id: str) -> "InMemoryCollection":
+        """Return a subcollection of the document."""
+        return InMemoryCollection(self._client, f"{self.path}/{collection_id}")
+
+    async def get(self, field_paths: Iterable[str] | None = None) -> InMemorySnapshot:
+        """Read the document, or only ``field_paths`` of it."""
+        await self._client._round_trip()
+        data = self._client._documents(self._collection_path).get(self.id)
+        self._client.documents_read += 1
+        if data is not None and field_paths is not None:
+            data = _project(data, field_paths)
+        return InMemorySnapshot(self, copy.deepcopy(data))
+
+    async def set(
+        self, document_data: dict[str, Any], merge: bool | list[str] = False
+    ) -> None:
+        """Write the document, merging into it if ``merge`` is set."""
+        await self._client._round_trip()
+        self._client._write(self, "set", document_data, merge)
+
+    async def create(self, document_data: dict[str, Any]) -> None:
+        """Write the document, raising ``AlreadyExists`` if it exists."""
+        await self._client._round_trip()
+        self._client._check(self, "create")
+        self._client._write(self, "set", document_data)
+
+    async def update(self, field_updates: dict[str, Any]) -> None:
+        """Update fields of the document, raising ``NotFound`` if it is missing."""
+        await self._client._round_trip()
+        self._client._check(self, "update")
+        self._client._write(self, "update", field_updates)
+
+    async def delete(self) -> None:
+        """Delete the document if it exists."""
+        await self._client._round_trip()
+        self._client._write(self, "delete")
+
+
+def _project(data: dict[str, Any], field_paths: Iterable[str]) -> dict[str, Any]:
+    projected: dict[str, Any] = {}
+    for field_path in field_paths:
+        exists, value = _get_field(data, field_path)
+        if exists:
+            _set_field(projected, field_path, value)
+    return projected
+
+
+class InMemoryQuery:
+    """Immutable query over one collection, like ``AsyncQuery``."""
+
+    def __init__(self, client: InMemoryFirestore, collection_path: str) -> None:
+        self._client = client
+        self._collection_path = collection_path
+        self._filters: tuple[tuple[str, str, Any], ...] = ()
+        self._orders: tuple[tuple[str, str], ...] = ()
+        self._start: tuple[Any, bool] | None = None
+        self._offset = 0
+        self._limit: int | None = None
+        self._projection: tuple[str, ...] | None = None
+
+    def _copy(self, **changes: Any) -> "InMemoryQuery":
+        query = InMemoryQuery(self._client, self._collection_path)
+        query.__dict__.update(self.__dict__)
+        query.__dict__.update({f"_{name}": value for name, value in changes.items()})
+        return query
+
+    def where(
+        self,
+        field_path: str | None = None,
+        op_string: str | None = None,
+        value: Any = None,
+        *,
+        filter: Any = None,  # noqa: A002
+    ) -> "InMemoryQuery":
+        """Return the query narrowed by a field filter."""
+        if filter is not None:
+            field_path, op_string, value = (
+                filter.field_path,
+                filter.op_string,
+                filter.value,
+            )
+        return self._copy(filters=(*self._filters, (field_path, op_string, value)))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> "InMemoryQuery":
+        """Return the query ordered by one more field."""
+        return self._copy(orders=(*self._orders, (field_path, direction)))
+
+    def limit(self, count: int) -> "InMemoryQuery":
+        """Return the query capped at ``count`` results."""
+        return self._copy(limit=count)
+
+    def offset(self, num_to_skip: int) -> "InMemoryQuery":
+        """Return the query skipping its first ``num_to_skip`` results."""
+        return self._copy(offset=num_to_skip)
+
+    def select(self, field_paths: Iterable[str]) -> "InMemoryQuery":
+        """Return the query reading only ``field_paths``."""
+        return self._copy(projection=tuple(field_paths))
+
+    def start_after(self, document_fields_or_snapshot: Any) -> "InMemoryQuery":
+        """Return the query starting after a cursor."""
+        return self._copy(start=(document_fields_or_snapshot, False))
+
+    def start_at(self, document_fields_or_snapshot: Any) -> "InMemoryQuery":
+        """Return the query starting at a cursor."""
+        return self._copy(start=(document_fields_or_snapshot, True))
+
+    def count(self, alias: str | None = None) -> "InMemoryAggregationQuery":
+        """Return an aggregation counting the query results."""
+        return InMemoryAggregationQuery(self, alias or "count")
+
+    def _effective_orders(self) -> list[tuple[str, str]]:
+        orders = list(self._orders)
+        if all(field_path != DOCUMENT_ID for field_path, _ in orders):
+            # Firestore breaks ties by document ID in the last direction used
+            orders.append((DOCUMENT_ID, orders[-1][1] if orders else ASCENDING))
+        return orders
+
+    @staticmethod
+    def _sort_values(
+        orders: list[tuple[str, str]], document_id: str, data: dict[str, Any]
+    ) -> list[Any]:
+        return [
+            document_id
+            if field_path == DOCUMENT_ID
+            else _get_field(data, field_path)[1]
+            for field_path, _ in orders
+        ]
+
+    def _cursor_values(self, orders: list[tuple[str, str]]) -> list[Any]:
+        cursor, _ = self._start
+        if isinstance(cursor, InMemorySnapshot):
+            return self._sort_values(orders, cursor.id, cursor._data or {})
+        if isinstance(cursor, dict):
+            values = []
+            for field_path, _ in orders:
+                if field_path not in cursor:
+                    break
+                values.append(cursor[field_path])
+        else:
+            values = list(cursor)
+        return [
+            value.rsplit("/", 1)[-1]
+            if field_path == DOCUMENT_ID and isinstance(value, str)
+            else value
+            for (field_path, _), value in zip(orders, values, strict=False)
+        ]
+
+    def _run(self) -> list[tuple[str, dict[str, Any]]]:
+        documents = self._client._documents(self._collection_path).items()
+        filters = list(self._filters)
+        # Cheap pass for equality on top-level scalar fields, e.g. user_id
+        for field_path, op, operand in self._filters:
+            if op == "==" and "." not in field_path and type(operand) in _SCALAR_TYPES:
+                filters.remove((field_path, op, operand))
+                documents = [
+                    (document_id, data)
+                    for document_id, data in documents
+                    if type(data.get(field_path)) is type(operand)
+                    and data[field_path] == operand
+                ]
+        documents = [
+            (document_id, data)
+            for document_id, data in documents
+            if all(_matches(data, *condition) for condition in filters)
+        ]
+        # Documents missing an ordered field are left out, as in Firestore
+        documents = [
+            (document_id, data)
+            for document_id, data in documents
+            if all(
+                field_path == DOCUMENT_ID or _get_field(data, field_path)[0]
+                for field_path, _ in self._orders
+            )
+        ]
+
+        orders = self._effective_orders()
+
+        def compare_values(values_a: list[Any], values_b: list[Any]) -> int:
+            for (_, direction), a, b in zip(orders, values_a, values_b, strict=False):
+                result = _compare(a, b)
+                if result:
+                    return -result if direction == DESCENDING else result
+            return 0
+
+        keyed = [
+            (self._sort_values(orders, document_id, data), document_id, data)
+            for document_id, data in documents
+        ]
+        keyed.sort(key=functools.cmp_to_key(lambda a, b: compare_values(a[0], b[0])))
+
+        if self._start is not None:
+            cursor = self._cursor_values(orders)
+            inclusive = self._start[1]
+            keyed = [
+                item
+                for item in keyed
+                if (
+                    compare_values(item[0][: len(cursor)], cursor) >= 0
+                    if inclusive
+                    else compare_values(item[0][: len(cursor)], cursor) > 0
+                )
+            ]
+
+        results = [(document_id, data) for _, document_id, data in keyed][
+            self._offset :
+        ]
+        if self._limit is not None:
+            results = results[: self._limit]
+        return results
+
+    def _snapshot(self, document_id: str, data: dict[str, Any]) -> InMemorySnapshot:
+        if self._projection is not None:
+            data = _project(data, self._projection)
+        reference = InMemoryDocument(self._client, self._collection_path, document_id)
+        return InMemorySnapshot(reference, copy.deepcopy(data))
+
+    async def get(self) -> list[InMemorySnapshot]:
+        """Run the query in one round trip."""
+        await self._client._round_trip()
+        results = self._run()
+        self._client.documents_read += len(results)
+        return [self._snapshot(document_id, data) for document_id, data in results]
+
+    async def stream(self) -> AsyncIterator[InMemorySnapshot]:
+        """Run the query and yield its results."""
+        await self._client._round_trip()
+        for document_id, data in self._run():
+            self._client.documents_read += 1
+            yield self._snapshot(document_id, data)
+
+
+class InMemoryCollection(InMemoryQuery):
+    """Reference to a collection, like ``AsyncCollectionReference``."""
+
+    @property
+    def id(self) -> str:
+        """Return the collection ID."""
+        return self._collection_path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: str | None = None) -> InMemoryDocument:
+        """Return a document of the collection, with a new ID if none is given."""
+        return InMemoryDocument(
+            self._client, self._collection_path, document_id or _auto_id()
+        )
+
+    async def add(
+        self, document_data: dict[str, Any], document_id: str | None = None
+    ) -> tuple[datetime, InMemoryDocument]:
+        """Create a document with a new ID unless one is given."""
+        reference = self.document(document_id)
+        await reference.create(document_data)
+        return datetime.now(UTC), reference
+
+
+class InMemoryAggregationQuery:
+    """``count()`` over a query, like ``AsyncAggregationQuery``."""
+
+    def __init__(self, query: InMemoryQuery, alias: str) -> None:
+        self._query = query
+        self._alias = alias
+
+    async def get(self) -> list[list[AggregationResult]]:
+        """Run the count in one round trip."""
+        await self._query._client._round_trip()
+        return [[AggregationResult(alias=self._alias, value=len(self._query._run()))]]
+
+
+class InMemoryWriteBatch:
+    """Atomic group of writes, like ``AsyncWriteBatch``."""
+
+    def __init__(self, client: InMemoryFirestore) -> None:
+        self._client = client
+        self._writes: list[
+            tuple[InMemoryDocument, str, dict[str, Any] | None, Any]
+        ] = []
+
+    def __len__(self) -> int:
+        """Return the number of queued writes."""
+        return len(self._writes)
+
+    def set(
+        self,
+        reference: InMemoryDocument,
+        document_data: dict[str, Any],
+        merge: bool | list[str] = False,
+    ) -> None:
+        """Queue a set of a document."""
+        self._writes.append((reference, "set", document_data, merge))
+
+    def create(
+        self, reference: InMemoryDocument, document_data: dict[str, Any]
+    ) -> None:
+        """Queue the creation of a document."""
+        self._writes.append((reference, "create", document_data, False))
+
+    def update(
+        self, reference: InMemoryDocument, field_updates: dict[str, Any]
+    ) -> None:
+        """Queue an update of a document."""
+        self._writes.append((reference, "update", field_updates, False))
+
+    def delete(self, reference: InMemoryDocument) -> None:
+        """Queue the deletion of a document."""
+        self._writes.append((reference, "delete", None, False))
+
+    async def commit(self) -> list:
+        """Apply the queued writes in one round trip, all or none."""
+        if len(self._writes) > FIRESTORE_BATCH_LIMIT:
+            raise InvalidArgument(
+                f"maximum {FIRESTORE_BATCH_LIMIT} writes allowed per request"
+            )
+        await self._client._round_trip()
+        # Check every precondition first so a failing batch writes nothing
+        for reference, option, _, _ in self._writes:
+            self._client._check(reference, option)
+        for reference, option, data, merge in self._writes:
+            self._client._write(
+                reference, "set" if option == "create" else option, data, merge
+            )
+        writes, self._writes = self._writes, []
+        return [None] * len(writes)
@@ -0,0 +1,412 @@
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from collections.abc import AsyncIterator
+from typing import Any
+
+import httpx
+from openai import InternalServerError, NotFoundError
+from openai.types import Batch, BatchRequestCounts, FileObject
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+FAKE_OPENAI_URL = "https://fake-openai.local/v1/chat/completions"
+FAKE_OPENAI_FILES_URL = "https://fake-openai.local/v1/files"
+FAKE_OPENAI_BATCHES_URL = "https://fake-openai.local/v1/batches"
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z'-]+")
+_STOPWORDS = frozenset(
+    """
+    a about after all also an and any are as at be because been but by can
+    could did do does for from had has have he her his how i if in into is it
+    its just more most my no not of on one or our out she so some than that
+    the their them then there these they this to too up us was we were what
+    when which who will with would you your
+""".split()
+)
+_POSITIVE = frozenset(
+    """
+    amazing best better excellent enjoy enjoyed fantastic glad good great
+    happy like love loved nice perfect pleased recommend wonderful
+""".split()
+)
+_NEGATIVE = frozenset(
+    """
+    angry awful bad broken disappointed hate hated horrible poor problem
+    sad slow terrible unhappy useless worse worst wrong
+""".split()
+)
+
+
+def fake_analysis(text: str) -> dict[str, Any]:
+    """Deterministic summary, sentiment and keywords of a text."""
+    words = [word.lower() for word in _WORD.findall(text)]
+    score = sum(word in _POSITIVE for word in words) - sum(
+        word in _NEGATIVE for word in words
+    )
+    sentiment = "positive" if score > 0 else "negative" if score < 0 else "neutral"
+    counts = Counter(word for word in words if len(word) > 3 and word not in _STOPWORDS)
+    first_sentence = re.split(r"(?<=[.!?])\s+", text.strip(), maxsplit=1)[0]
+    return {
+        "summary": first_sentence[:200] or "Empty text",
+        "sentiment": sentiment,
+        "keywords": [word for word, _ in counts.most_common(5)] or ["text"],
+    }
+
+
+# Share of the latency spent before the first streamed token
+FIRST_TOKEN_SHARE = 0.2
+STREAM_CHUNK_CHARS = 8
+
+
+class _FakeStream:
+    """Async iterator of ``ChatCompletionChunk`` pieces of one answer."""
+
+    def __init__(
+        self, completion: ChatCompletion, duration: float, include_usage: bool
+    ) -> None:
+        self._completion = completion
+        self._duration = duration
+        self._include_usage = include_usage
+
+    def _chunk(
+        self,
+        delta: dict[str, Any],
+        finish_reason: str | None = None,
+        usage: dict[str, Any] | None = None,
+    ) -> ChatCompletionChunk:
+        completion = self._completion
+        # Like the API, the usage chunk comes last and has no choices
+        choices = (
+            []
+            if usage is not None
+            else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        )
+        return ChatCompletionChunk.model_validate(
+            {
+                "id": completion.id,
+                "object": "chat.completion.chunk",
+                "created": completion.created,
+                "model": completion.model,
+                "choices": choices,
+                "usage": usage,
+            }
+        )
+
+    async def __aiter__(self) -> AsyncIterator[ChatCompletionChunk]:
+        content = self._completion.choices[0].message.content or ""
+        pieces = [
+            content[start : start + STREAM_CHUNK_CHARS]
+            for start in range(0, len(content), STREAM_CHUNK_CHARS)
+        ]
+        delay = self._duration / max(len(pieces), 1)
+        yield self._chunk({"role": "assistant", "content": ""})
+        for piece in pieces:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield self._chunk({"content": piece})
+        yield self._chunk({}, finish_reason="stop")
+        if self._include_usage:
+            yield self._chunk({}, usage=self._completion.usage.model_dump())
+
+    async def close(self) -> None:
+        pass
+
+
+class _FakeCompletions:
+    def __init__(self, client: "FakeAsyncOpenAI") -> None:
+        self._client = client
+
+    async def create(
+        self,
+        model: str,
+        messages: list[dict[str, Any]],
+        stream: bool = False,
+        **kwargs: Any,
+    ) -> ChatCompletion | _FakeStream:
+        client = self._client
+        client.calls += 1
+        delay = client.latency + client.latency_jitter * client._random.random()
+        # A stream answers once the first token is ready and spreads the rest
+        wait = delay * FIRST_TOKEN_SHARE if stream else delay
+        if wait > 0:
+            await asyncio.sleep(wait)
+        if client.error_rate and client._random.random() < client.error_rate:
+            client.errors += 1
+            raise InternalServerError(
+                "Fake upstream error",
+                response=httpx.Response(
+                    500, request=httpx.Request("POST", FAKE_OPENAI_URL)
+                ),
+                body=None,
+            )
+
+        completion = self._answer(model, messages)
+        if stream:
+            include_usage = bool(
+                (kwargs.get("stream_options") or {}).get("include_usage")
+            )
+            return _FakeStream(completion, delay - wait, include_usage)
+        return completion
+
+    @staticmethod
+    def _answer(model: str, messages: list[dict[str, Any]]) -> ChatCompletion:
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        user_text = next(
+            (
+                message["content"]
+                for message in reversed(messages)
+                if message.get("role") == "user"
+            ),
+            prompt,
+        )
+        content = json.dumps(fake_analysis(str(user_text)))
+        # Roughly four characters per token
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        return ChatCompletion.model_validate(
+            {
+                "id": f"chatcmpl-fake-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+        )
+
+
+class _FakeChat:
+    def __init__(self, client: "FakeAsyncOpenAI") -> None:
+        self.completions = _FakeCompletions(client)
+
+
+def _not_found(url: str, message: str) -> NotFoundError:
+    return NotFoundError(
+        message,
+        response=httpx.Response(404, request=httpx.Request("GET", url)),
+        body=None,
+    )
+
+
+class _FakeFileContent:
+    """Downloaded file, like the SDK's ``HttpxBinaryResponseContent``."""
+
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode()
+
+    def read(self) -> bytes:
+        return self.content
+
+
+class _FakeFiles:
+    def __init__(self, client: "FakeAsyncOpenAI") -> None:
+        self._client = client
+
+    def _store(self, filename: str, content: bytes, purpose: str) -> FileObject:
+        file = FileObject.model_validate(
+            {
+                "id": f"file-fake-{uuid.uuid4().hex}",
+                "object": "file",
+                "bytes": len(content),
+                "created_at": int(time.time()),
+                "filename": filename,
+                "purpose": purpose,
+                "status": "processed",
+            }
+        )
+        self._client._files[file.id] = (file, content)
+        return file
+
+    async def create(self, file: Any, purpose: str, **kwargs: Any) -> FileObject:
+        filename = "upload.jsonl"
+        if isinstance(file, tuple):
+            filename, file = file[0], file[1]
+        if hasattr(file, "read"):
+            file = file.read()
+        if isinstance(file, str):
+            file = file.encode()
+        return self._store(filename, bytes(file), purpose)
+
+    async def content(self, file_id: str) -> _FakeFileContent:
+        stored = self._client._files.get(file_id)
+        if stored is None:
+            raise _not_found(
+                f"{FAKE_OPENAI_FILES_URL}/{file_id}", f"No such file: {file_id}"
+            )
+        return _FakeFileContent(stored[1])
+
+
+class _FakeBatches:
+    """Batch jobs that finish ``batch_latency`` seconds after they are created.
+
+    A batch is run when it is first retrieved after that: each request is
+    answered like a chat completion, and fails with probability
+    ``error_rate`` into the batch's error file.
+    """
+
+    def __init__(self, client: "FakeAsyncOpenAI") -> None:
+        self._client = client
+        self._batches: dict[str, Batch] = {}
+
+    async def create(
+        self,
+        completion_window: str,
+        endpoint: str,
+        input_file_id: str,
+        metadata: dict[str, str] | None = None,
+        **kwargs: Any,
+    ) -> Batch:
+        if input_file_id not in self._client._files:
+            raise _not_found(FAKE_OPENAI_BATCHES_URL, f"No such file: {input_file_id}")
+        now = int(time.time())
+        batch = Batch.model_validate(
+            {
+                "id": f"batch_fake_{uuid.uuid4().hex}",
+                "object": "batch",
+                "endpoint": endpoint,
+                "input_file_id": input_file_id,
+                "completion_window": completion_window,
+                "status": "in_progress",
+                "created_at": now,
+                "in_progress_at": now,
+                "metadata": metadata,
+            }
+        )
+        self._batches[batch.id] = batch
+        return batch.model_copy()
+
+    async def retrieve(self, batch_id: str) -> Batch:
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            raise _not_found(
+                f"{FAKE_OPENAI_BATCHES_URL}/{batch_id}", f"No such batch: {batch_id}"
+            )
+        if batch.status == "in_progress" and (
+            time.time() >= batch.created_at + self._client.batch_latency
+        ):
+            self._run(batch)
+        return batch.model_copy()
+
+    async def cancel(self, batch_id: str) -> Batch:
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            raise _not_found(
+                f"{FAKE_OPENAI_BATCHES_URL}/{batch_id}", f"No such batch: {batch_id}"
+            )
+        if batch.status == "in_progress":
+            batch.status = "cancelled"
+            batch.cancelled_at = int(time.time())
+        return batch.model_copy()
+
+    def _run(self, batch: Batch) -> None:
+        client = self._client
+        _, content = client._files[batch.input_file_id]
+        outputs: list[bytes] = []
+        errors: list[bytes] = []
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            body = request.get("body") or {}
+            client.calls += 1
+            line_id = f"batch_req_fake_{uuid.uuid4().hex}"
+            if client.error_rate and client._random.random() < client.error_rate:
+                client.errors += 1
+                response = {
+                    "status_code": 500,
+                    "request_id": line_id,
+                    "body": {
+                        "error": {
+                            "message": "Fake upstream error",
+                            "type": "server_error",
+                        }
+                    },
+                }
+                target = errors
+            else:
+                completion = _FakeCompletions._answer(
+                    body.get("model", ""), body.get("messages", [])
+                )
+                response = {
+                    "status_code": 200,
+                    "request_id": line_id,
+                    "body": completion.model_dump(mode="json"),
+                }
+                target = outputs
+            target.append(
+                json.dumps(
+                    {
+                        "id": line_id,
+                        "custom_id": request.get("custom_id"),
+                        "response": response,
+                        "error": None,
+                    }
+                ).encode()
+            )
+        if outputs:
+            batch.output_file_id = client.files._store(
+                f"{batch.id}_output.jsonl", b"\n".join(outputs) + b"\n", "batch_output"
+            ).id
+        if errors:
+            batch.error_file_id = client.files._store(
+                f"{batch.id}_error.jsonl", b"\n".join(errors) + b"\n", "batch_output"
+            ).id
+        batch.status = "completed"
+        batch.completed_at = int(time.time())
+        batch.request_counts = BatchRequestCounts(
+            total=len(outputs) + len(errors), completed=len(outputs), failed=len(errors)
+        )
+
+
+class FakeAsyncOpenAI:
+    """Stand-in for ``AsyncOpenAI`` chat completions and batch jobs.
+
+    Each call sleeps for ``latency`` seconds plus up to ``latency_jitter``
+    more, fails with a 500 ``InternalServerError`` with probability
+    ``error_rate``, and otherwise answers with a JSON analysis of the last
+    user message. With ``stream=True`` the answer arrives in small chunks,
+    the first after a fifth of the latency. Files and batches are kept in
+    memory, and a batch completes ``batch_latency`` seconds after it is
+    created.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        batch_latency: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.batch_latency = batch_latency
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)  # noqa: S311
+        self._files: dict[str, tuple[FileObject, bytes]] = {}
+        self.chat = _FakeChat(self)
+        self.files = _FakeFiles(self)
+        self.batches = _FakeBatches(self)
+
+    async def close(self) -> None:
+        """Do nothing; there is no connection to close."""
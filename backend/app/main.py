@@ -1,16 +1,69 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from .firebase import initialize_firebase
+from .config import Settings
+from .firebase import get_firestore_client, initialize_firebase
+from .jobs import get_job_queue
+from .middleware.request_context import RequestContextMiddleware
+from .ratelimit import get_rate_limiter
 from .routes.v1_routes import v1_router
-from .utils.responses import success_response
-from .middleware.auth import authorize_token
-from .middleware.log_request_metadata import log_request_metadata
+from .services.openai_client import close_openai_client
+from .services.status_writer import close_status_writer
+from .utils.metrics import JOB_QUEUE_DEPTH, render_metrics
+from .utils.responses import FastJSONResponse, success_response
+from .utils.structured_logging import configure_logging
+from .utils.token_verification import refresh_public_certs
+
+configure_logging(Settings())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Application startup and shutdown hooks."""
+    settings = Settings()
+    cert_refresher = None
+    if settings.FIRESTORE_BACKEND != "memory":
+        cert_refresher = asyncio.create_task(
+            refresh_public_certs(settings.FIREBASE_CERT_REFRESH_SECONDS)
+        )
+    worker = None
+    worker_task = None
+    if settings.RUN_EMBEDDED_WORKER:
+        from .services.bulk_analysis import BulkSubmitter
+        from .worker import Worker, build_dead_letter_handler, build_job_handlers
+
+        db = get_firestore_client()
+        queue = get_job_queue()
+        queue.dead_letter_handler = build_dead_letter_handler(db)
+        worker = Worker.from_settings(settings, queue, build_job_handlers(db, queue))
+        bulk_submitter = BulkSubmitter.from_settings(settings, db, queue)
+        worker_task = asyncio.gather(worker.run(), bulk_submitter.run())
+
+    yield
+
+    if worker is not None:
+        worker.stop()
+        bulk_submitter.stop()
+        await worker_task
+    if cert_refresher is not None:
+        cert_refresher.cancel()
+    await close_status_writer()
+    await get_job_queue().close()
+    await get_rate_limiter().close()
+    await close_openai_client()
+
 
 app = FastAPI(
     title="Kai Backend API",
     description="Backend API for Kai application",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # Configure CORS
@@ -21,7 +74,6 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-# app.add_middleware(authorize_token, exclude_patterns=["/health", "/docs"])
 
 
 # Add HTTP middleware
@@ -30,27 +82,35 @@ app.add_middleware(
 initialize_firebase()
 
 
-
-@app.get('/')
-def root():
-    """Root endpoint - API health check"""
+@app.get("/")
+def root() -> Response:
+    """Root endpoint - API health check."""
     return success_response(
         data={"status": "healthy", "service": "kai-backend"},
         message="Kai Backend API is running",
-        status_code=200
+        status_code=200,
     )
 
 
-@app.get('/health')
-def health_check():
-    """Health check endpoint"""
+@app.get("/health")
+def health_check() -> Response:
+    """Health check endpoint."""
     return success_response(
-        data={"status": "healthy"},
-        message="Service is healthy",
-        status_code=200
+        data={"status": "healthy"}, message="Service is healthy", status_code=200
     )
 
 
-app.middleware("http")(authorize_token)
-app.middleware("http")(log_request_metadata)
-app.include_router(v1_router)
\ No newline at end of file
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Prometheus metrics endpoint."""
+    try:
+        JOB_QUEUE_DEPTH.set(await get_job_queue().depth())
+    except Exception as e:
+        logging.warning(f"Failed to read job queue depth: {e}")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+# Outermost middleware: request logging, X-Request-ID and authentication
+app.add_middleware(RequestContextMiddleware)
+app.include_router(v1_router)
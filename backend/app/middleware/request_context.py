@@ -0,0 +1,173 @@
+import logging
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import URL, Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.metrics import observe_request, span
+from app.utils.responses import unauthorized_response
+from app.utils.structured_logging import ACCESS_LOGGER, request_id_var
+from app.utils.token_verification import verify_firebase_token
+
+AUTH_EXCLUDED_PATHS = ("/health", "/metrics", "/", "/docs", "/openapi.json")
+LOG_EXCLUDED_PATHS = ("/health", "/metrics")
+
+TokenVerifier = Callable[[str], Awaitable[dict[str, Any] | None]]
+
+access_logger = logging.getLogger(ACCESS_LOGGER)
+
+
+def _route_template(scope: Scope) -> str | None:
+    """Return the matched route path, e.g. ``/v1/user/analyze/{document_id}``.
+
+    Rebuilt from the request path and ``path_params`` so metric labels stay
+    bounded no matter how routers are nested.
+    """
+    if "route" not in scope:
+        return None
+    path_params = scope.get("path_params")
+    if not path_params:
+        return scope["path"]
+    names = {str(value): name for name, value in path_params.items()}
+    return "/".join(
+        f"{{{names[segment]}}}" if segment in names else segment
+        for segment in scope["path"].split("/")
+    )
+
+
+class RequestContextMiddleware:
+    """Pure ASGI middleware for request logging, request IDs and auth.
+
+    Replaces the ``authorize_token`` and ``log_request_metadata`` http
+    middlewares without the per-layer task and body streaming overhead of
+    ``BaseHTTPMiddleware``, so streaming responses pass through untouched.
+
+    For every request outside ``log_excluded_paths`` it sets the request ID
+    logging context, logs the request metadata and duration to the
+    ``kai.access`` logger (sampled), records the duration by route template and
+    status code, and adds an ``X-Request-ID`` response header.
+    Requests outside ``auth_excluded_paths`` (and all OPTIONS requests)
+    need a valid ``Authorization: Bearer <token>`` header; the decoded
+    user is stored as ``request.state.user``.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        auth_excluded_paths: tuple[str, ...] = AUTH_EXCLUDED_PATHS,
+        log_excluded_paths: tuple[str, ...] = LOG_EXCLUDED_PATHS,
+        token_verifier: TokenVerifier = verify_firebase_token,
+    ) -> None:
+        self.app = app
+        self.auth_excluded_paths = frozenset(auth_excluded_paths)
+        self.log_excluded_paths = frozenset(log_excluded_paths)
+        self.token_verifier = token_verifier
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle one ASGI connection; non-HTTP scopes pass straight through."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["path"] in self.log_excluded_paths:
+            await self._authorize(scope, receive, send)
+            return
+
+        request_id = str(uuid.uuid4())
+        context_token = request_id_var.set(request_id)
+        if access_logger.isEnabledFor(logging.DEBUG):
+            access_logger.debug(
+                "Starting http request %s %s", scope["method"], scope["path"]
+            )
+
+        status_code = None
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        start_time = time.perf_counter()
+        try:
+            await self._authorize(scope, receive, send_with_request_id)
+        finally:
+            duration = time.perf_counter() - start_time
+            observe_request(
+                scope["method"], _route_template(scope), status_code or 500, duration
+            )
+            level = (
+                logging.WARNING
+                if status_code is None or status_code >= 500
+                else logging.INFO
+            )
+            if access_logger.isEnabledFor(level):
+                client = scope.get("client")
+                access_logger.log(
+                    level,
+                    "HTTP request complete %s %s %s in %.1fms",
+                    scope["method"],
+                    scope["path"],
+                    status_code,
+                    duration * 1000,
+                    extra={
+                        "client": client[0] if client else None,
+                        "url": str(URL(scope=scope)),
+                        "method": scope["method"],
+                        "status_code": status_code,
+                        "request_duration": duration,
+                    },
+                )
+            request_id_var.reset(context_token)
+
+    async def _authorize(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["path"] in self.auth_excluded_paths or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        authorization = Headers(scope=scope).get("authorization")
+        if not authorization or not authorization.startswith("Bearer "):
+            response = unauthorized_response(message="Invalid authorization header")
+            await response(scope, receive, send)
+            return
+        token = authorization.split("Bearer ")[1]
+        if not token:
+            response = unauthorized_response(message="Invalid authorization header")
+            await response(scope, receive, send)
+            return
+
+        try:
+            with span("auth"):
+                decoded_token = await self.token_verifier(token)
+        except Exception as e:
+            logging.error(
+                "Authentication failed",
+                extra={"error": str(e), "path": scope["path"]},
+                exc_info=True,
+            )
+            response = JSONResponse(
+                content={"detail": "Authentication failed"}, status_code=500
+            )
+            await response(scope, receive, send)
+            return
+
+        if not decoded_token:
+            response = unauthorized_response("Invalid or expired token")
+            await response(scope, receive, send)
+            return
+
+        # Add user info to request state
+        scope.setdefault("state", {})["user"] = {
+            "user_id": decoded_token["uid"],
+            "name": decoded_token.get("name"),
+            "email": decoded_token.get("email"),
+            "email_verified": decoded_token.get("email_verified", False),
+            # Custom claim used for model routing
+            "tier": decoded_token.get("tier"),
+        }
+        await self.app(scope, receive, send)
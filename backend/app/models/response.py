@@ -3,7 +3,7 @@ from typing import Generic, TypeVar
 from pydantic import BaseModel, Field
 
 # Generic type for response data
-T = TypeVar('T')
+T = TypeVar("T")
 
 
 class ResponseBase(BaseModel, Generic[T]):
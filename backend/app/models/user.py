@@ -1,47 +1,179 @@
-from pydantic import BaseModel, Field, validator
-from enum import Enum
-from typing import Optional
 from datetime import datetime
+from enum import Enum
+
+from pydantic import BaseModel, Field, field_validator
 
 
 class UserProfile(BaseModel):
+    """Profile of a signed-in user."""
+
     uid: str
     full_name: str
     email: str
 
 
+class AnalysisMode(Enum):
+    """How a text is analyzed.
+
+    ``local`` answers in process without calling the model, ``model``
+    queues a model analysis, and ``local-then-refine`` stores a local
+    result right away and replaces it once the model analysis is done.
+    """
+
+    local = "local"
+    model = "model"
+    local_then_refine = "local-then-refine"
+
+
+class AnalysisPriority(Enum):
+    """How urgently a model analysis is needed.
+
+    ``interactive`` analyses are queued for the worker pool right away;
+    ``bulk`` ones are collected into OpenAI Batch API jobs, which are
+    cheaper and leave the live rate limits alone but may take hours.
+    """
+
+    interactive = "interactive"
+    bulk = "bulk"
+
+
+class ExportFormat(Enum):
+    """Format of an analysis history export."""
+
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+# Long texts are analyzed in parallel chunks, so latency stays roughly flat
+ANALYZE_TEXT_MAX_CHARS = 100000
+
+
 class AnalyzeBody(BaseModel):
     """Request body for text analysis."""
 
-    text: str = Field(min_length=1, max_length=10000, description="Text to analyze")
+    text: str = Field(
+        min_length=1, max_length=ANALYZE_TEXT_MAX_CHARS, description="Text to analyze"
+    )
+    analysis_mode: AnalysisMode | None = Field(
+        default=None, description="Analysis mode; defaults to the ANALYSIS_MODE setting"
+    )
+    priority: AnalysisPriority = Field(
+        default=AnalysisPriority.interactive,
+        description="Priority of the model analysis",
+    )
 
-    @validator('text')
-    def validate_text(cls, v):
+    @field_validator("text")
+    @classmethod
+    def validate_text(cls, v: str) -> str:
+        """Strip the text and reject one too short to analyze."""
         if not v.strip():
-            raise ValueError('Text cannot be empty')
+            raise ValueError("Text cannot be empty")
         if len(v.strip()) < 3:
-            raise ValueError('Text too short for meaningful analysis')
+            raise ValueError("Text too short for meaningful analysis")
         return v.strip()
 
 
+ANALYZE_BATCH_MAX_ITEMS = 100
+
+
+class AnalyzeBatchBody(BaseModel):
+    """Request body for analyzing several texts at once.
+
+    Texts are validated one by one against ``AnalyzeBody`` so a bad item
+    does not reject the whole batch.
+    """
+
+    texts: list[str] = Field(
+        min_length=1, max_length=ANALYZE_BATCH_MAX_ITEMS, description="Texts to analyze"
+    )
+    analysis_mode: AnalysisMode | None = Field(
+        default=None,
+        description="Analysis mode of every text; defaults to ANALYSIS_MODE",
+    )
+    priority: AnalysisPriority = Field(
+        default=AnalysisPriority.interactive,
+        description="Priority of every model analysis",
+    )
+
+
 class RequestStatus(Enum):
     """Status of analysis requests."""
 
-    completed = 'completed'
-    processing = 'processing'
-    pending = 'pending'
-    failed = 'failed'
+    completed = "completed"
+    processing = "processing"
+    pending = "pending"
+    failed = "failed"
 
 
 class UserAnalyzeRequest(BaseModel):
     """User analysis request model for Firestore storage."""
 
-    id: Optional[str] = Field(default=None, description="Document ID")
+    id: str | None = Field(default=None, description="Document ID")
     user_id: str = Field(description="Firebase user ID")
     text: str = Field(description="Text to analyze")
-    status: RequestStatus = Field(default=RequestStatus.pending, description="Request status")
-    result: Optional[dict] = Field(default=None, description="Analysis result")
-    error_message: Optional[str] = Field(default=None, description="Error message if failed")
-    created_at: datetime = Field(default_factory=datetime.utcnow, description="Request creation timestamp")
-    updated_at: datetime = Field(default_factory=datetime.utcnow, description="Last update timestamp")
-    completed_at: Optional[datetime] = Field(default=None, description="Completion timestamp")
+    text_preview: str | None = Field(
+        default=None, description="Start of the text for lists"
+    )
+    status: RequestStatus = Field(
+        default=RequestStatus.pending, description="Request status"
+    )
+    result: dict | None = Field(default=None, description="Analysis result")
+    result_source: str | None = Field(
+        default=None, description="Where the result came from: 'local' or 'model'"
+    )
+    priority: AnalysisPriority | None = Field(
+        default=None, description="Set to 'bulk' for analyses run as OpenAI batch jobs"
+    )
+    batch_id: str | None = Field(
+        default=None, description="OpenAI batch of a bulk analysis"
+    )
+    model: str | None = Field(
+        default=None, description="Model that produced the result"
+    )
+    model_route: str | None = Field(
+        default=None, description="Routing rule that picked it"
+    )
+    model_latency_ms: int | None = Field(default=None, description="Analysis wall time")
+    usage: dict | None = Field(default=None, description="Model calls and token counts")
+    error_message: str | None = Field(
+        default=None, description="Error message if failed"
+    )
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow, description="Request creation timestamp"
+    )
+    updated_at: datetime = Field(
+        default_factory=datetime.utcnow, description="Last update timestamp"
+    )
+    completed_at: datetime | None = Field(
+        default=None, description="Completion timestamp"
+    )
+
+
+# Fields of analysis requests that ``fields=`` can select; the ID is always returned
+ANALYZE_REQUEST_FIELDS = frozenset(UserAnalyzeRequest.model_fields) - {"id"} | {
+    "cache_hit",
+    "partial_result",
+}
+# Largest page of the analysis list; larger limits are clamped to it
+LIST_MAX_LIMIT = 100
+# Slim list items: what a list shows, without the full text and result
+DEFAULT_LIST_FIELDS = (
+    "status",
+    "text_preview",
+    "result_source",
+    "error_message",
+    "created_at",
+    "updated_at",
+    "completed_at",
+)
+# Exported by default: each request's text and result
+DEFAULT_EXPORT_FIELDS = (
+    "status",
+    "text",
+    "result",
+    "result_source",
+    "error_message",
+    "model",
+    "created_at",
+    "completed_at",
+)
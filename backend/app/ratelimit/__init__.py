@@ -0,0 +1,21 @@
+from app.config import Settings
+from app.ratelimit.base import RateLimiter, TokenBucket
+from app.ratelimit.memory import InMemoryRateLimiter
+from app.ratelimit.sqlite import SQLiteRateLimiter
+
+settings = Settings()
+_rate_limiter = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the rate limiter singleton for the configured backend."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        backend = settings.RATE_LIMIT_BACKEND
+        if backend == "memory":
+            _rate_limiter = InMemoryRateLimiter()
+        elif backend == "sqlite":
+            _rate_limiter = SQLiteRateLimiter(path=settings.RATE_LIMIT_SQLITE_PATH)
+        else:
+            raise ValueError(f"Unknown rate limit backend: {backend}")
+    return _rate_limiter
@@ -0,0 +1,34 @@
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from typing import NamedTuple
+
+
+class TokenBucket(NamedTuple):
+    """A token bucket: refills at ``rate`` tokens per second up to ``capacity``."""
+
+    key: str
+    rate: float
+    capacity: float
+
+
+class RateLimiter(ABC):
+    """Interface for token-bucket rate limiter stores.
+
+    Buckets start full. Implementations keep bucket state either in process
+    memory or in a store shared by several API processes.
+    """
+
+    @abstractmethod
+    async def acquire(self, buckets: Sequence[TokenBucket], cost: float = 1.0) -> float:
+        """Take ``cost`` tokens from every bucket, or from none of them.
+
+        A cost above a bucket's capacity is capped at the capacity, so a
+        full bucket always admits it.
+
+        Returns:
+            0 if the tokens were taken, otherwise the seconds until all
+            buckets will have enough
+        """
+
+    async def close(self) -> None:  # noqa: B027
+        """Release any resources held by the limiter."""
@@ -0,0 +1,46 @@
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
+
+from app.ratelimit.base import RateLimiter, TokenBucket
+
+
+class InMemoryRateLimiter(RateLimiter):
+    """Token buckets kept in process memory.
+
+    Limits apply per API process. Buckets are kept in least recently used
+    order, and once more than ``max_buckets`` are tracked the least
+    recently used ones are forgotten, in constant time per acquire. A
+    missing bucket is treated as full, which the bucket untouched for
+    longest most likely is again.
+    """
+
+    def __init__(self, max_buckets: int = 100000) -> None:
+        self.max_buckets = max_buckets
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def _tokens(self, bucket: TokenBucket, now: float) -> float:
+        state = self._buckets.get(bucket.key)
+        if state is None:
+            return bucket.capacity
+        tokens, updated_at = state
+        return min(bucket.capacity, tokens + (now - updated_at) * bucket.rate)
+
+    async def acquire(self, buckets: Sequence[TokenBucket], cost: float = 1.0) -> float:
+        """Take ``cost`` tokens from every bucket, or from none of them."""
+        now = time.monotonic()
+        levels = [self._tokens(bucket, now) for bucket in buckets]
+        retry_after = 0.0
+        for bucket, tokens in zip(buckets, levels, strict=True):
+            needed = min(cost, bucket.capacity)
+            if tokens < needed:
+                retry_after = max(retry_after, (needed - tokens) / bucket.rate)
+        if retry_after > 0:
+            return retry_after
+
+        for bucket, tokens in zip(buckets, levels, strict=True):
+            self._buckets[bucket.key] = (tokens - min(cost, bucket.capacity), now)
+            self._buckets.move_to_end(bucket.key)
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return 0.0
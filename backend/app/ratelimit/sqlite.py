@@ -0,0 +1,113 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections.abc import Sequence
+
+from app.ratelimit.base import RateLimiter, TokenBucket
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    full_at REAL NOT NULL DEFAULT 0
+);
+"""
+
+# Created after the full_at column migration for databases that predate it
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS rate_limit_buckets_full_at ON rate_limit_buckets (full_at);
+"""
+
+
+class SQLiteRateLimiter(RateLimiter):
+    """Token buckets shared through a local SQLite database.
+
+    Every API process on the host that points at the same file shares
+    the same limits. Blocking SQLite calls run in a thread so they never
+    stall the event loop.
+
+    Each row records when its bucket will have refilled. At most every
+    ``prune_interval`` seconds, an acquire deletes the rows of buckets
+    that are full again; a missing bucket counts as full, so this changes
+    no limit and keeps the table to the keys used recently.
+    """
+
+    def __init__(self, path: str, prune_interval: float = 60.0) -> None:
+        self.path = path
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {
+            row[1]
+            for row in self._conn.execute("PRAGMA table_info(rate_limit_buckets)")
+        }
+        if "full_at" not in columns:
+            # Existing rows are pruned on the first pass and start full again
+            self._conn.execute(
+                "ALTER TABLE rate_limit_buckets ADD COLUMN full_at REAL NOT NULL DEFAULT 0"
+            )
+        self._conn.executescript(_INDEXES)
+
+    def _acquire(self, buckets: Sequence[TokenBucket], cost: float) -> float:
+        with self._lock:
+            # Wall-clock time, since several processes share the state
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                levels = []
+                for bucket in buckets:
+                    row = self._conn.execute(
+                        "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?",
+                        (bucket.key,),
+                    ).fetchone()
+                    if row is None:
+                        levels.append(bucket.capacity)
+                    else:
+                        tokens, updated_at = row
+                        elapsed = max(now - updated_at, 0.0)
+                        levels.append(
+                            min(bucket.capacity, tokens + elapsed * bucket.rate)
+                        )
+
+                retry_after = 0.0
+                for bucket, tokens in zip(buckets, levels, strict=True):
+                    needed = min(cost, bucket.capacity)
+                    if tokens < needed:
+                        retry_after = max(retry_after, (needed - tokens) / bucket.rate)
+                if retry_after == 0:
+                    rows = []
+                    for bucket, tokens in zip(buckets, levels, strict=True):
+                        left = tokens - min(cost, bucket.capacity)
+                        full_at = now + (bucket.capacity - left) / bucket.rate
+                        rows.append((bucket.key, left, now, full_at))
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO rate_limit_buckets "
+                        "(key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)",
+                        rows,
+                    )
+                if now >= self._next_prune:
+                    self._conn.execute(
+                        "DELETE FROM rate_limit_buckets WHERE full_at <= ?", (now,)
+                    )
+                    self._next_prune = now + self.prune_interval
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return retry_after
+
+    async def acquire(self, buckets: Sequence[TokenBucket], cost: float = 1.0) -> float:
+        """Take ``cost`` tokens from every bucket, or from none of them."""
+        return await asyncio.to_thread(self._acquire, buckets, cost)
+
+    async def close(self) -> None:
+        """Close the database connection."""
+        await asyncio.to_thread(self._conn.close)
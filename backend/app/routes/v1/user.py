@@ -1,18 +1,122 @@
+import asyncio
 import logging
-from datetime import datetime
-from typing import Optional
+from collections.abc import Awaitable, Callable
+from typing import Annotated
 
-from fastapi import APIRouter, BackgroundTasks, Request, status
+from fastapi import APIRouter, Header, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from google.cloud.firestore_v1 import AsyncClient
+from pydantic import BaseModel, ValidationError
 
-from app.dependencies import DbDependency
+from app.config import Settings
+from app.dependencies import DbDependency, JobQueueDependency
+from app.jobs import JobQueueFullError
 from app.models.response import SuccessResponse
-from app.models.user import AnalyzeBody, RequestStatus
-from app.services.analyze_text import request_text_analyze
-from app.utils.responses import handle_exception, success_response
+from app.models.user import (
+    ANALYZE_REQUEST_FIELDS,
+    DEFAULT_EXPORT_FIELDS,
+    DEFAULT_LIST_FIELDS,
+    LIST_MAX_LIMIT,
+    AnalysisMode,
+    AnalysisPriority,
+    AnalyzeBatchBody,
+    AnalyzeBody,
+    ExportFormat,
+    RequestStatus,
+)
+from app.services.admission import get_admission_controller
+from app.services.analysis_export import EXPORT_MEDIA_TYPES, export_user_requests
+from app.services.analysis_requests import fill_text_previews, submit_analysis_requests
+from app.services.analysis_stats import get_user_stats
+from app.services.idempotency import (
+    IdempotencyKeyInProgressError,
+    IdempotencyKeyReusedError,
+    get_idempotency_store,
+    request_fingerprint,
+)
+from app.services.list_cache import get_list_cache
+from app.services.status_events import (
+    TERMINAL_STATUSES,
+    get_status_broker,
+    stream_status_events,
+)
+from app.utils.metrics import span
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.responses import (
+    error_response,
+    etag_matches,
+    handle_exception,
+    not_found_response,
+    not_modified_response,
+    success_response,
+    too_many_requests_response,
+)
 from app.utils.run_functions_concurrently import run_functions_concurrently
 
-
 router = APIRouter(prefix="/user", tags=["Auth"])
+settings = Settings()
+
+
+def parse_fields(
+    fields: str | None, default: tuple[str, ...] | None = None
+) -> list[str] | None:
+    """Field paths selected by a comma-separated ``fields`` query parameter.
+
+    ``*`` selects whole documents (None), and no parameter selects
+    ``default``.
+
+    Raises:
+        ValueError: If a field is not a field of analysis requests
+    """
+    if fields is None:
+        return list(default) if default is not None else None
+    if fields.strip() == "*":
+        return None
+    selected = []
+    for field in fields.split(","):
+        field = field.strip()
+        if not field or field == "id" or field in selected:
+            continue
+        if field not in ANALYZE_REQUEST_FIELDS:
+            raise ValueError(f"Unknown field: {field}")
+        selected.append(field)
+    return selected
+
+
+def default_analysis_mode() -> AnalysisMode:
+    """Analysis mode of requests that do not choose one."""
+    return AnalysisMode(settings.ANALYSIS_MODE)
+
+
+IdempotencyKeyHeader = Annotated[str | None, Header(min_length=1, max_length=255)]
+
+
+async def run_idempotent(
+    request: Request,
+    db: AsyncClient,
+    idempotency_key: str | None,
+    body: BaseModel,
+    submit: Callable[[], Awaitable[Response]],
+) -> Response:
+    """Run a submission once per ``Idempotency-Key`` and replay it for retries.
+
+    Without a key the submission just runs. A key reused with a different
+    body gets a 422, and one whose first request is still running after
+    ``IDEMPOTENCY_WAIT_SECONDS`` a 409.
+    """
+    if idempotency_key is None:
+        return await submit()
+    fingerprint = request_fingerprint(request.url.path, body.model_dump_json().encode())
+    try:
+        return await get_idempotency_store(db).run(
+            request.state.user["user_id"], idempotency_key, fingerprint, submit
+        )
+    except IdempotencyKeyReusedError as e:
+        return error_response(
+            message=str(e), status_code=status.HTTP_422_UNPROCESSABLE_CONTENT
+        )
+    except IdempotencyKeyInProgressError as e:
+        return error_response(message=str(e), status_code=status.HTTP_409_CONFLICT)
 
 
 @router.get(
@@ -24,7 +128,7 @@ router = APIRouter(prefix="/user", tags=["Auth"])
         201: {"description": "User created successfully"},
         400: {"description": "Bad request - Invalid input or user already exists"},
         422: {"description": "Validation error"},
-        500: {"description": "Internal server error"}
+        500: {"description": "Internal server error"},
     },
 )
 def get_user_profile(request: Request) -> SuccessResponse[dict]:
@@ -42,13 +146,9 @@ def get_user_profile(request: Request) -> SuccessResponse[dict]:
     try:
         user = request.state.user
         return success_response(
-            data={
-                "uid": user['user_id'],
-                "name": user['name'],
-                "email": user['email']
-            },
+            data={"uid": user["user_id"], "name": user["name"], "email": user["email"]},
             message="User created successfully",
-            status_code=status.HTTP_200_OK
+            status_code=status.HTTP_200_OK,
         )
     except Exception as e:
         return handle_exception(e)
@@ -62,36 +162,147 @@ def get_user_profile(request: Request) -> SuccessResponse[dict]:
     responses={
         201: {"description": "User created successfully"},
         400: {"description": "Bad request - Invalid input or user already exists"},
-        422: {"description": "Validation error"},
-        500: {"description": "Internal server error"}
+        409: {"description": "Idempotency-Key still in use by the first request"},
+        422: {
+            "description": "Validation error, or Idempotency-Key reused with another body"
+        },
+        429: {"description": "Rate limit exceeded; see Retry-After"},
+        500: {"description": "Internal server error"},
+        503: {"description": "Analysis queue is full"},
     },
 )
 async def analyze_text(
     request: Request,
     analyze_body: AnalyzeBody,
     db: DbDependency,
-    background_tasks: BackgroundTasks
-):
+    job_queue: JobQueueDependency,
+    idempotency_key: IdempotencyKeyHeader = None,
+) -> Response:
+    """Create an analysis request for one text.
+
+    Retries sent with the same ``Idempotency-Key`` get the first response
+    back without creating another request.
+    """
     user = request.state.user
-    doc_ref = await db.collection('analyze_request').add({
-        "user_id": user['user_id'],
-        "text": analyze_body.text,
-        "status": RequestStatus.pending.value,
-        "created_at": datetime.utcnow().isoformat()
-    })
-    # # Get the document data
-    text_to_analyze = analyze_body.text
-    document_id = doc_ref[1].id
-    background_tasks.add_task(request_text_analyze, document_id, text_to_analyze, db)
-    return success_response(
-        data={
-            "document_id": document_id,
-            'text': analyze_body.text,
-            'status': RequestStatus.pending.value
+
+    async def submit() -> Response:
+        retry_after = await get_admission_controller().admit(
+            user["user_id"], bulk=analyze_body.priority is AnalysisPriority.bulk
+        )
+        if retry_after:
+            return too_many_requests_response(retry_after)
+        try:
+            (item,) = await submit_analysis_requests(
+                db,
+                job_queue,
+                user["user_id"],
+                [analyze_body.text],
+                analyze_body.analysis_mode or default_analysis_mode(),
+                user.get("tier"),
+                analyze_body.priority,
+            )
+        except JobQueueFullError:
+            return error_response(
+                message="Analysis queue is full, please retry later",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        if item["cache_hit"]:
+            message = "Analysis request completed from cache"
+        elif item["status"] == RequestStatus.completed.value:
+            message = "Analysis request completed locally"
+        else:
+            message = "Analysis request created successfully"
+        return success_response(
+            data={**item, "text": analyze_body.text},
+            message=message,
+            status_code=status.HTTP_200_OK,
+        )
+
+    return await run_idempotent(request, db, idempotency_key, analyze_body, submit)
+
+
+@router.post(
+    "/analyze/batch",
+    response_model=SuccessResponse[dict],
+    status_code=status.HTTP_200_OK,
+    description="Submit several texts for analysis",
+    responses={
+        200: {"description": "Batch accepted; see per-item results"},
+        409: {"description": "Idempotency-Key still in use by the first request"},
+        422: {
+            "description": "Validation error, or Idempotency-Key reused with another body"
         },
-        message="Analysis request created successfully",
-        status_code=status.HTTP_200_OK
-    )
+        429: {"description": "Rate limit exceeded; see Retry-After"},
+        500: {"description": "Internal server error"},
+        503: {"description": "Analysis queue is full"},
+    },
+)
+async def analyze_text_batch(
+    request: Request,
+    batch_body: AnalyzeBatchBody,
+    db: DbDependency,
+    job_queue: JobQueueDependency,
+    idempotency_key: IdempotencyKeyHeader = None,
+) -> Response:
+    """Create analysis requests for up to ``ANALYZE_BATCH_MAX_ITEMS`` texts.
+
+    Items that fail validation are reported with their index and error;
+    the valid ones are created with one batched write and queued. Each
+    valid text counts against the user's rate limit. Retries sent with the
+    same ``Idempotency-Key`` get the first response back.
+    """
+    user = request.state.user
+    items: list[dict | None] = [None] * len(batch_body.texts)
+    valid_indexes = []
+    valid_texts = []
+    for index, text in enumerate(batch_body.texts):
+        try:
+            valid_texts.append(AnalyzeBody(text=text).text)
+            valid_indexes.append(index)
+        except ValidationError as e:
+            items[index] = {
+                "index": index,
+                "error": "; ".join(error["msg"] for error in e.errors()),
+            }
+
+    async def submit() -> Response:
+        if valid_texts:
+            retry_after = await get_admission_controller().admit(
+                user["user_id"],
+                len(valid_texts),
+                bulk=batch_body.priority is AnalysisPriority.bulk,
+            )
+            if retry_after:
+                return too_many_requests_response(retry_after)
+            try:
+                submitted = await submit_analysis_requests(
+                    db,
+                    job_queue,
+                    user["user_id"],
+                    valid_texts,
+                    batch_body.analysis_mode or default_analysis_mode(),
+                    user.get("tier"),
+                    batch_body.priority,
+                )
+            except JobQueueFullError:
+                return error_response(
+                    message="Analysis queue is full, please retry later",
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                )
+            for index, item in zip(valid_indexes, submitted, strict=True):
+                items[index] = {"index": index, **item}
+
+        return success_response(
+            data={
+                "items": items,
+                "accepted": len(valid_texts),
+                "rejected": len(items) - len(valid_texts),
+            },
+            message="Batch analysis requests created successfully",
+            status_code=status.HTTP_200_OK,
+        )
+
+    return await run_idempotent(request, db, idempotency_key, batch_body, submit)
 
 
 @router.get(
@@ -101,71 +312,348 @@ async def analyze_text(
     description="Get user's analysis requests",
     responses={
         200: {"description": "Analysis requests retrieved successfully"},
+        304: {"description": "Not modified since the ETag in If-None-Match"},
         400: {"description": "Bad request - Invalid parameters"},
         422: {"description": "Validation error"},
-        500: {"description": "Internal server error"}
+        500: {"description": "Internal server error"},
     },
 )
 async def get_user_analyze_requests(
     request: Request,
     db: DbDependency,
-    limit: Optional[int] = 50,
-    offset: Optional[int] = 0
-):
-    """Get user's analysis requests with pagination."""
+    limit: int = 50,
+    cursor: str | None = None,
+    offset: int | None = None,
+    include_total: bool = False,
+    fields: str | None = None,
+) -> Response:
+    """Get user's analysis requests with cursor pagination.
+
+    Pass the ``next_cursor`` of a page as ``cursor`` to fetch the next one.
+    ``limit`` is clamped to between 1 and ``LIST_MAX_LIMIT``.
+    ``offset`` is still accepted for older clients; it scans every skipped
+    document, so offset pages always include the total for compatibility.
+    The total comes from the user's stats counters, not a count query.
+
+    Items hold ``DEFAULT_LIST_FIELDS``, with a ``text_preview`` instead of
+    the full text and no result. Requests created before previews were
+    stored get one made from their text. ``fields`` picks other fields (comma
+    separated, ``*`` for all); only those are read from Firestore. Full
+    documents are served by ``GET /analyze/{id}``.
+
+    Pages are cached per user for ``LIST_CACHE_TTL_SECONDS`` and carry an
+    ``ETag``; a request whose ``If-None-Match`` still matches gets an empty
+    ``304``, without any Firestore reads while the page is cached.
+    """
     try:
         user = request.state.user
-        user_id = user['user_id']
-        
-        # Query user's analysis requests
-        query = db.collection('analyze_request').where('user_id', '==', user_id)
-        query = query.order_by('created_at', direction='DESCENDING')
-        query = query.limit(limit).offset(offset)
-        
-        # count total items
-        total_count_query = db.collection('analyze_request').where('user_id', '==', user_id).count()
-        
-        result = await run_functions_concurrently(
-            [
-                total_count_query.get(),
-                query.get()
-            ],
+        user_id = user["user_id"]
+        limit = min(max(limit, 1), LIST_MAX_LIMIT)
+        offset_mode = offset is not None and cursor is None
+        projection = parse_fields(fields, DEFAULT_LIST_FIELDS)
+        if projection is not None and "created_at" not in projection:
+            # Next cursors are built from it
+            projection.append("created_at")
+
+        list_cache = get_list_cache()
+        params = (
+            limit,
+            cursor,
+            offset if offset_mode else None,
+            include_total,
+            tuple(projection) if projection is not None else None,
         )
-        
-        if not result:
-            return success_response(
-                data={
-                    'requests': [],
-                    'total': 0,
-                    'limit': limit,
-                    'offset': offset
-                },
-                message="Analysis requests retrieved successfully",
-                status_code=status.HTTP_200_OK
+        page = list_cache.get(user_id, params)
+        if page is None:
+            version = list_cache.version
+
+            # Query user's analysis requests, newest first with the ID as tie-breaker
+            user_requests = db.collection("analyze_request").where(
+                "user_id", "==", user_id
             )
+            query = user_requests.order_by("created_at", direction="DESCENDING")
+            query = query.order_by("__name__", direction="DESCENDING")
+            if cursor:
+                created_at, document_id = decode_cursor(cursor)
+                query = query.start_after(
+                    {"created_at": created_at, "__name__": document_id}
+                )
+            elif offset_mode:
+                query = query.offset(offset)
+            query = query.limit(limit)
+            if projection is not None:
+                query = query.select(projection)
+
+            coroutines = [query.get()]
+            if offset_mode or include_total:
+                coroutines.append(get_user_stats(db, user_id))
+            with span("firestore_query"):
+                result = await run_functions_concurrently(coroutines)
+
+            docs = list(result[0])
+            total_count = result[1]["total"] if len(result) > 1 else None
+
+            # Convert documents to list of dictionaries
+            requests = []
+            for doc in docs:
+                doc_data = doc.to_dict()
+                doc_data["id"] = doc.id  # Add document ID
+                requests.append(doc_data)
+            if projection is None or "text_preview" in projection:
+                await fill_text_previews(db, requests)
+
+            next_cursor = None
+            if len(docs) == limit:
+                last = requests[-1]
+                next_cursor = encode_cursor(last["created_at"], last["id"])
+
+            data = {
+                "requests": requests,
+                "total": total_count,
+                "limit": limit,
+                "next_cursor": next_cursor,
+            }
+            if offset_mode:
+                data["offset"] = offset
+            page = list_cache.set(user_id, params, data, version)
+
+        if etag_matches(request.headers.get("if-none-match"), page.etag):
+            return not_modified_response(page.etag)
+        response = success_response(
+            data=page.data,
+            message="Analysis requests retrieved successfully",
+            status_code=status.HTTP_200_OK,
+        )
+        response.headers["ETag"] = page.etag
+        # Let clients keep the page but revalidate it on every poll
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    except Exception as e:
+        logging.exception("Error getting analysis requests: %s", e)
+        return handle_exception(e)
+
 
-        total_count_result = list(result[0])
-        total_count = total_count_result[0][0].value
-        docs = list(result[1])
-        
-        # Convert documents to list of dictionaries
-        requests = []
-        for doc in docs:
-            doc_data = doc.to_dict()
-            doc_data['id'] = doc.id  # Add document ID
-            requests.append(doc_data)
-        
+@router.get(
+    "/analyze/stats",
+    response_model=SuccessResponse[dict],
+    status_code=status.HTTP_200_OK,
+    description="Get the user's analysis totals by status and sentiment",
+    responses={
+        200: {"description": "Analysis stats retrieved successfully"},
+        500: {"description": "Internal server error"},
+    },
+)
+async def get_user_analyze_stats(request: Request, db: DbDependency) -> Response:
+    """Get the user's analysis totals by status and the sentiment histogram.
+
+    Read from a few counter documents kept up to date on every write, so
+    the cost does not grow with the number of requests. ``in_progress``
+    covers pending and processing requests.
+    """
+    try:
+        user = request.state.user
+        with span("firestore_query"):
+            stats = await get_user_stats(db, user["user_id"])
         return success_response(
-            data={
-                'requests': requests,
-                'total': total_count,
-                'limit': limit,
-                'offset': offset
+            data=stats,
+            message="Analysis stats retrieved successfully",
+            status_code=status.HTTP_200_OK,
+        )
+    except Exception as e:
+        logging.exception("Error getting analysis stats: %s", e)
+        return handle_exception(e)
+
+
+@router.get(
+    "/analyze/export",
+    status_code=status.HTTP_200_OK,
+    description="Download the user's whole analysis history as NDJSON or CSV",
+    responses={
+        200: {
+            "description": "Streamed export",
+            "content": {"application/x-ndjson": {}, "text/csv": {}},
+        },
+        422: {"description": "Validation error"},
+        500: {"description": "Internal server error"},
+    },
+)
+async def export_user_analyze_requests(
+    request: Request,
+    db: DbDependency,
+    format: ExportFormat = ExportFormat.ndjson,  # noqa: A002
+    fields: str | None = None,
+) -> Response:
+    """Stream every analysis request of the user, newest first.
+
+    NDJSON has one request object per line; CSV has a header row and one
+    row per request. Items hold ``DEFAULT_EXPORT_FIELDS`` unless ``fields``
+    picks others (``*`` for all). Bytes are sent as soon as the first
+    documents are read, and memory use does not grow with the history.
+    """
+    try:
+        user = request.state.user
+        projection = parse_fields(fields, DEFAULT_EXPORT_FIELDS)
+        if projection is not None and "created_at" not in projection:
+            # Pages resume after it
+            projection.append("created_at")
+        return StreamingResponse(
+            export_user_requests(db, user["user_id"], format, projection),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={
+                "Content-Disposition": f'attachment; filename="analyses.{format.value}"',
+                "Cache-Control": "no-store",
+                "X-Accel-Buffering": "no",
             },
-            message="Analysis requests retrieved successfully",
-            status_code=status.HTTP_200_OK
         )
-        
     except Exception as e:
-        logging.error(f"Error getting analysis requests: {e}")
+        logging.exception("Error exporting analysis requests: %s", e)
+        return handle_exception(e)
+
+
+@router.get(
+    "/analyze/{document_id}/events",
+    status_code=status.HTTP_200_OK,
+    description="Stream status changes of an analysis request (Server-Sent Events)",
+    responses={
+        200: {"description": "Event stream", "content": {"text/event-stream": {}}},
+        404: {"description": "Analysis request not found"},
+        500: {"description": "Internal server error"},
+    },
+)
+async def stream_analyze_status(
+    request: Request, document_id: str, db: DbDependency
+) -> Response:
+    """Stream status events until the analysis completes or fails.
+
+    The first event carries the current status; each later event is sent
+    as soon as the status changes.
+    """
+    try:
+        user = request.state.user
+        subscription = await get_status_broker().subscribe(
+            document_id, db, user["user_id"]
+        )
+        if subscription is None:
+            return not_found_response("Analysis request")
+        return StreamingResponse(
+            stream_status_events(
+                subscription, settings.STATUS_EVENTS_HEARTBEAT_SECONDS
+            ),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    except Exception as e:
+        logging.exception("Error streaming analysis status: %s", e)
+        return handle_exception(e)
+
+
+@router.get(
+    "/analyze/{document_id}/status",
+    response_model=SuccessResponse[dict],
+    status_code=status.HTTP_200_OK,
+    description="Long-poll the status of an analysis request",
+    responses={
+        200: {"description": "Current analysis status"},
+        404: {"description": "Analysis request not found"},
+        422: {"description": "Validation error"},
+        500: {"description": "Internal server error"},
+    },
+)
+async def poll_analyze_status(
+    request: Request,
+    document_id: str,
+    db: DbDependency,
+    since: RequestStatus | None = None,
+    timeout: Annotated[float, Query(ge=0, le=60)] = 25,
+) -> Response:
+    """Return the analysis status once it differs from ``since``.
+
+    Without ``since`` the current status is returned immediately. Otherwise
+    the call waits up to ``timeout`` seconds for a transition and then
+    returns the latest status, changed or not.
+    """
+    try:
+        user = request.state.user
+        subscription = await get_status_broker().subscribe(
+            document_id, db, user["user_id"]
+        )
+        if subscription is None:
+            return not_found_response("Analysis request")
+        try:
+            event = await subscription.get()
+            deadline = asyncio.get_running_loop().time() + timeout
+            while (
+                since is not None
+                and event.get("status") == since.value
+                and event.get("status") not in TERMINAL_STATUSES
+            ):
+                remaining = deadline - asyncio.get_running_loop().time()
+                next_event = (
+                    await subscription.get(timeout=remaining) if remaining > 0 else None
+                )
+                if next_event is None:
+                    break
+                event = next_event
+        finally:
+            subscription.close()
+
+        return success_response(
+            data={key: value for key, value in event.items() if key != "user_id"},
+            message="Analysis status retrieved successfully",
+            status_code=status.HTTP_200_OK,
+        )
+    except Exception as e:
+        logging.exception("Error polling analysis status: %s", e)
+        return handle_exception(e)
+
+
+@router.get(
+    "/analyze/{document_id}",
+    response_model=SuccessResponse[dict],
+    status_code=status.HTTP_200_OK,
+    description="Get one analysis request",
+    responses={
+        200: {"description": "Analysis request retrieved successfully"},
+        404: {"description": "Analysis request not found"},
+        422: {"description": "Validation error"},
+        500: {"description": "Internal server error"},
+    },
+)
+async def get_user_analyze_request(
+    request: Request, document_id: str, db: DbDependency, fields: str | None = None
+) -> Response:
+    """Get a whole analysis request, or the ``fields`` picked from it.
+
+    Registered after the other ``/analyze/...`` routes so their fixed
+    paths are not taken for document IDs.
+    """
+    try:
+        user = request.state.user
+        projection = parse_fields(fields)
+        field_paths = None
+        if projection is not None:
+            # Ownership is checked on it
+            field_paths = list({*projection, "user_id"})
+        with span("firestore_query"):
+            doc = (
+                await db.collection("analyze_request")
+                .document(document_id)
+                .get(field_paths)
+            )
+        doc_data = doc.to_dict() if doc.exists else None
+        if not doc_data or doc_data.get("user_id") != user["user_id"]:
+            return not_found_response("Analysis request")
+        if projection is not None and "user_id" not in projection:
+            del doc_data["user_id"]
+        doc_data["id"] = doc.id
+        if projection is None or "text_preview" in projection:
+            await fill_text_previews(db, [doc_data])
+        return success_response(
+            data=doc_data,
+            message="Analysis request retrieved successfully",
+            status_code=status.HTTP_200_OK,
+        )
+    except Exception as e:
+        logging.exception("Error getting analysis request: %s", e)
         return handle_exception(e)
@@ -0,0 +1,90 @@
+import logging
+
+from app.config import Settings
+from app.ratelimit import RateLimiter, TokenBucket, get_rate_limiter
+from app.utils.metrics import ADMISSION_REJECTED
+
+settings = Settings()
+_admission_controller = None
+
+GLOBAL_BUCKET_KEY = "global"
+
+
+class AdmissionController:
+    """Per-user and global token-bucket limits on analysis submissions.
+
+    Each submitted text costs one token from the user's bucket and from
+    the shared global bucket, so one user cannot take all the model
+    capacity. Set ``global_rate`` to 0 to only limit per user. Bulk
+    submissions run in OpenAI batch jobs, not on the live capacity, so
+    they draw on a separate per-user bulk bucket and skip the global one.
+    """
+
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        user_rate: float,
+        user_burst: float,
+        global_rate: float,
+        global_burst: float,
+        bulk_rate: float,
+        bulk_burst: float,
+        enabled: bool = True,
+    ) -> None:
+        self.limiter = limiter
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.bulk_rate = bulk_rate
+        self.bulk_burst = bulk_burst
+        self.enabled = enabled
+
+    async def admit(self, user_id: str, cost: int = 1, bulk: bool = False) -> float:
+        """Take ``cost`` submissions from the user's and the global budget.
+
+        Args:
+            user_id: Submitting user
+            cost: Number of texts submitted
+            bulk: Take them from the user's bulk budget instead
+
+        Returns:
+            0 if the submission is admitted, otherwise the seconds to wait
+            before retrying
+        """
+        if not self.enabled:
+            return 0.0
+        if bulk:
+            buckets = [TokenBucket(f"bulk:{user_id}", self.bulk_rate, self.bulk_burst)]
+        else:
+            buckets = [TokenBucket(f"user:{user_id}", self.user_rate, self.user_burst)]
+        if self.global_rate > 0 and not bulk:
+            buckets.append(
+                TokenBucket(GLOBAL_BUCKET_KEY, self.global_rate, self.global_burst)
+            )
+        try:
+            retry_after = await self.limiter.acquire(buckets, cost)
+        except Exception as e:
+            # Fail open: a broken limiter store must not take submissions down
+            logging.warning("Rate limiter failed, admitting request: %s", e)
+            return 0.0
+        if retry_after > 0:
+            ADMISSION_REJECTED.inc()
+        return retry_after
+
+
+def get_admission_controller() -> AdmissionController:
+    """Get the process-wide admission controller singleton."""
+    global _admission_controller
+    if _admission_controller is None:
+        _admission_controller = AdmissionController(
+            limiter=get_rate_limiter(),
+            user_rate=settings.RATE_LIMIT_USER_PER_MINUTE / 60,
+            user_burst=settings.RATE_LIMIT_USER_BURST,
+            global_rate=settings.RATE_LIMIT_GLOBAL_PER_SECOND,
+            global_burst=settings.RATE_LIMIT_GLOBAL_BURST,
+            bulk_rate=settings.RATE_LIMIT_BULK_PER_MINUTE / 60,
+            bulk_burst=settings.RATE_LIMIT_BULK_BURST,
+            enabled=settings.RATE_LIMIT_ENABLED,
+        )
+    return _admission_controller
@@ -0,0 +1,124 @@
+import csv
+import io
+from collections.abc import AsyncIterator
+from typing import Any
+
+from google.cloud.firestore_v1 import AsyncClient
+
+from app.config import Settings
+from app.models.user import ANALYZE_REQUEST_FIELDS, ExportFormat
+from app.utils.metrics import EXPORTED_DOCUMENTS
+from app.utils.responses import json_bytes
+
+settings = Settings()
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv; charset=utf-8",
+}
+
+
+async def stream_user_requests(
+    db: AsyncClient, user_id: str, projection: list[str] | None, page_size: int
+) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+    """Yield ``(document ID, fields)`` of every request of a user, newest first.
+
+    Documents are read with ``stream()`` one page of ``page_size`` at a
+    time, each page resuming after the last document of the previous one.
+    No page is held in memory, and no query runs long enough to hit
+    Firestore's query deadline however long the history is.
+    """
+    base = (
+        db.collection("analyze_request")
+        .where("user_id", "==", user_id)
+        .order_by("created_at", direction="DESCENDING")
+        .order_by("__name__", direction="DESCENDING")
+    )
+    if projection is not None:
+        base = base.select(projection)
+    last: tuple[Any, str] | None = None
+    while True:
+        query = base
+        if last is not None:
+            query = query.start_after({"created_at": last[0], "__name__": last[1]})
+        count = 0
+        async for snapshot in query.limit(page_size).stream():
+            data = snapshot.to_dict()
+            count += 1
+            last = (data.get("created_at"), snapshot.id)
+            yield snapshot.id, data
+        if count < page_size:
+            return
+
+
+def _csv_cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, dict | list):
+        return json_bytes(value).decode()
+    return value
+
+
+async def export_user_requests(
+    db: AsyncClient,
+    user_id: str,
+    export_format: ExportFormat,
+    projection: list[str] | None,
+    page_size: int | None = None,
+    flush_bytes: int | None = None,
+) -> AsyncIterator[bytes]:
+    """Yield a user's analysis history as NDJSON lines or CSV rows.
+
+    Output is flushed every ``flush_bytes``, and right after the first
+    document (and the CSV header) so the download starts at once. The
+    generator only reads on when the response has sent what it yielded,
+    so a slow client holds back the Firestore reads instead of filling
+    memory.
+
+    Args:
+        db: Firestore client
+        user_id: Owner of the requests
+        export_format: NDJSON with one request object per line, or CSV
+        projection: Fields to export; every field if None. CSV columns
+            are ``id`` and these fields, with nested values as JSON
+        page_size: Documents per Firestore query
+        flush_bytes: Output buffered before it is sent
+    """
+    page_size = page_size or settings.EXPORT_PAGE_SIZE
+    flush_bytes = flush_bytes or settings.EXPORT_FLUSH_BYTES
+    buffer = io.StringIO() if export_format is ExportFormat.csv else None
+    writer = None
+    if buffer is not None:
+        columns = (
+            projection if projection is not None else sorted(ANALYZE_REQUEST_FIELDS)
+        )
+        writer = csv.writer(buffer)
+        writer.writerow(["id", *columns])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    chunk = bytearray()
+    exported = 0
+    try:
+        async for document_id, data in stream_user_requests(
+            db, user_id, projection, page_size
+        ):
+            if writer is not None:
+                writer.writerow(
+                    [document_id, *(_csv_cell(data.get(c)) for c in columns)]
+                )
+                chunk += buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+            else:
+                chunk += json_bytes({"id": document_id, **data})
+                chunk += b"\n"
+            exported += 1
+            if exported == 1 or len(chunk) >= flush_bytes:
+                yield bytes(chunk)
+                chunk.clear()
+        if chunk:
+            yield bytes(chunk)
+    finally:
+        EXPORTED_DOCUMENTS.labels(export_format.value).inc(exported)
@@ -0,0 +1,258 @@
+import asyncio
+from collections import Counter
+from datetime import datetime
+from typing import Any
+
+from google.cloud.firestore_v1 import AsyncClient
+
+from app.config import Settings
+from app.jobs import JobQueue, JobQueueFullError
+from app.models.user import AnalysisMode, AnalysisPriority, RequestStatus
+from app.services.analysis_stats import created_delta, stats_writes, status_delta
+from app.services.analyze_text import ANALYZE_TEXT_JOB, analysis_cache_key
+from app.services.bulk_analysis import BULK_ANALYZE_JOB
+from app.services.chunking import estimate_tokens
+from app.services.list_cache import get_list_cache
+from app.services.local_analysis import analyze_locally
+from app.services.model_router import get_model_router
+from app.services.result_cache import get_result_cache
+from app.utils.firestore import commit_in_batches
+from app.utils.metrics import span
+
+settings = Settings()
+
+# Above this many characters local analysis runs off the event loop
+LOCAL_ANALYSIS_INLINE_CHARS = 20000
+# Characters of a text stored as its ``text_preview`` for list pages
+TEXT_PREVIEW_CHARS = 200
+
+
+def text_preview(text: str) -> str:
+    """Start of a text for list pages, cut at a word boundary."""
+    if len(text) <= TEXT_PREVIEW_CHARS:
+        return text
+    cut = text.rfind(" ", 0, TEXT_PREVIEW_CHARS)
+    if cut <= 0:
+        cut = TEXT_PREVIEW_CHARS
+    return text[:cut].rstrip() + "…"
+
+
+async def fill_text_previews(db: AsyncClient, requests: list[dict[str, Any]]) -> None:
+    """Add the ``text_preview`` of requests created before it was stored.
+
+    Such requests get it from their ``text``: the one they were read with,
+    or otherwise their texts read together in one round trip. Requests are
+    ``(document ID as 'id', fields)`` dicts and are updated in place.
+    """
+    legacy = [request for request in requests if request.get("text_preview") is None]
+    unread = [request["id"] for request in legacy if "text" not in request]
+    texts = {}
+    if unread:
+        collection = db.collection("analyze_request")
+        with span("firestore_query"):
+            texts = {
+                snapshot.id: snapshot.to_dict().get("text")
+                async for snapshot in db.get_all(
+                    [collection.document(document_id) for document_id in unread],
+                    field_paths=["text"],
+                )
+                if snapshot.exists
+            }
+    for request in legacy:
+        text = request["text"] if "text" in request else texts.get(request["id"])
+        if text:
+            request["text_preview"] = text_preview(text)
+
+
+async def analyze_texts_locally(texts: list[str]) -> list[dict[str, Any]]:
+    """Local analysis results of several texts."""
+    with span("local_analysis"):
+        if sum(len(text) for text in texts) <= LOCAL_ANALYSIS_INLINE_CHARS:
+            return [analyze_locally(text) for text in texts]
+        return await asyncio.to_thread(
+            lambda: [analyze_locally(text) for text in texts]
+        )
+
+
+async def submit_analysis_requests(
+    db: AsyncClient,
+    job_queue: JobQueue,
+    user_id: str,
+    texts: list[str],
+    mode: AnalysisMode = AnalysisMode.model,
+    tier: str | None = None,
+    priority: AnalysisPriority = AnalysisPriority.interactive,
+) -> list[dict[str, Any]]:
+    """Create analysis requests for validated texts and queue their analyses.
+
+    All documents are created with one batched write. Texts in the result
+    cache for the model they would be routed to now (``ANALYSIS_MODEL``
+    in bulk) are completed immediately. In ``local`` mode the rest are
+    completed with a local result; otherwise they are queued together, and
+    in ``local-then-refine`` mode they carry a local result until the model
+    result replaces it. ``bulk`` priority queues them for the next OpenAI
+    batch job instead of the worker pool. The user's stats are updated in
+    the same writes.
+
+    Args:
+        db: Firestore client
+        job_queue: Queue that analysis jobs are added to
+        user_id: Owner of the requests
+        texts: Normalized texts, as returned by ``AnalyzeBody.validate_text``
+        mode: How the texts that are not cached are analyzed
+        tier: User tier the model router picks the model by
+        priority: Whether the model analyses run interactively or in bulk
+
+    Returns:
+        One item per text with its ``document_id``, ``status``, ``cache_hit``
+        flag and, when there is one yet, the ``result`` and ``result_source``
+
+    Raises:
+        JobQueueFullError: If the queue cannot take the uncached texts
+    """
+    now = datetime.utcnow().isoformat()
+    if priority is AnalysisPriority.bulk:
+        models = [settings.ANALYSIS_MODEL] * len(texts)
+    else:
+        router = get_model_router()
+        models = [
+            (await router.route(estimate_tokens(text), tier, counted=False)).model
+            for text in texts
+        ]
+    cache = get_result_cache(db)
+    with span("result_cache"):
+        cached_results = await asyncio.gather(
+            *(
+                cache.get(analysis_cache_key(text, model))
+                for text, model in zip(texts, models, strict=True)
+            )
+        )
+    uncached = [
+        text
+        for text, result in zip(texts, cached_results, strict=True)
+        if result is None
+    ]
+    job_type = (
+        BULK_ANALYZE_JOB if priority is AnalysisPriority.bulk else ANALYZE_TEXT_JOB
+    )
+    if uncached and mode is not AnalysisMode.local:
+        with span("job_queue"):
+            depth = await job_queue.depth(job_type)
+        if depth + len(uncached) > job_queue.max_depth_of(job_type):
+            raise JobQueueFullError("Analysis queue is full")
+    local_results = iter(())
+    if uncached and mode is not AnalysisMode.model:
+        local_results = iter(await analyze_texts_locally(uncached))
+
+    collection = db.collection("analyze_request")
+    writes = []
+    items = []
+    jobs = []
+    delta = Counter()
+    for text, model, cached_result in zip(texts, models, cached_results, strict=True):
+        doc_ref = collection.document()
+        data = {
+            "user_id": user_id,
+            "text": text,
+            "text_preview": text_preview(text),
+            "status": RequestStatus.pending.value,
+            "created_at": now,
+        }
+        item = {"document_id": doc_ref.id, "status": RequestStatus.pending.value}
+        if cached_result is not None:
+            data.update(
+                {
+                    "status": RequestStatus.completed.value,
+                    "result": cached_result,
+                    "result_source": "model",
+                    "cache_hit": True,
+                    "model": model,
+                    "updated_at": now,
+                    "completed_at": now,
+                }
+            )
+            item.update(
+                {
+                    "status": RequestStatus.completed.value,
+                    "result": cached_result,
+                    "result_source": "model",
+                    "cache_hit": True,
+                }
+            )
+        elif mode is AnalysisMode.local:
+            local_result = next(local_results)
+            data.update(
+                {
+                    "status": RequestStatus.completed.value,
+                    "result": local_result,
+                    "result_source": "local",
+                    "cache_hit": False,
+                    "updated_at": now,
+                    "completed_at": now,
+                }
+            )
+            item.update(
+                {
+                    "status": RequestStatus.completed.value,
+                    "result": local_result,
+                    "result_source": "local",
+                    "cache_hit": False,
+                }
+            )
+        else:
+            job = {"document_id": doc_ref.id, "text": text}
+            if tier:
+                job["tier"] = tier
+            item["cache_hit"] = False
+            if priority is AnalysisPriority.bulk:
+                data["priority"] = priority.value
+                item["priority"] = priority.value
+            if mode is AnalysisMode.local_then_refine:
+                local_result = next(local_results)
+                data.update({"result": local_result, "result_source": "local"})
+                item.update({"result": local_result, "result_source": "local"})
+                job["refine"] = True
+            jobs.append(job)
+        writes.append((doc_ref, data))
+        items.append(item)
+        delta.update(created_delta(data))
+    writes.extend(stats_writes(db, {user_id: delta}))
+
+    with span("firestore_write"):
+        await commit_in_batches(db, writes)
+    get_list_cache().invalidate_user(user_id)
+
+    if jobs:
+        try:
+            with span("job_queue"):
+                await job_queue.enqueue_many(job_type, jobs, tenant=user_id)
+        except JobQueueFullError as e:
+            # Another submission took the remaining capacity after the check
+            failed = {
+                "status": RequestStatus.failed.value,
+                "error_message": str(e),
+                "updated_at": datetime.utcnow().isoformat(),
+            }
+            await commit_in_batches(
+                db,
+                [
+                    *(
+                        (collection.document(job["document_id"]), failed)
+                        for job in jobs
+                    ),
+                    *stats_writes(
+                        db,
+                        {
+                            user_id: Counter(
+                                {
+                                    key: count * len(jobs)
+                                    for key, count in status_delta(failed).items()
+                                }
+                            )
+                        },
+                    ),
+                ],
+            )
+            get_list_cache().invalidate_documents(job["document_id"] for job in jobs)
+            raise
+    return items
@@ -0,0 +1,235 @@
+"""Per-user analysis counters kept up to date on every write.
+
+Each user has an ``analyze_stats/{user_id}`` document whose ``shards``
+subcollection holds ``ANALYSIS_STATS_SHARDS`` counter documents. Writes
+add ``Increment`` transforms to a random shard, in the same batch as the
+analysis request write they count, so no single document takes every
+update of a busy user. Reads sum the shards.
+
+Counted are requests created (``total``), requests in each final status
+(``status.completed``, ``status.failed``) and the sentiment of completed
+results (``sentiment.*``). Requests not final yet are ``in_progress``.
+
+Status writes are counted against the status the request has when they
+are committed, read in the same flush, so only real changes move the
+counters: a job delivered twice or a retried write-back counts once.
+Two processes writing the same request at the same moment can still
+both count it.
+"""
+
+import asyncio
+import random
+from collections import Counter, defaultdict
+from collections.abc import Iterable, Mapping
+from datetime import datetime
+from typing import Any
+
+from google.cloud.firestore_v1 import (
+    AsyncClient,
+    AsyncCollectionReference,
+    AsyncQuery,
+    DocumentSnapshot,
+)
+from google.cloud.firestore_v1.transforms import Increment
+
+from app.config import Settings
+from app.models.user import RequestStatus
+
+settings = Settings()
+
+STATS_COLLECTION = "analyze_stats"
+SHARDS_COLLECTION = "shards"
+# Shard holding the counts of requests created before the counters existed
+BACKFILL_SHARD = "backfill"
+FINAL_STATUSES = (RequestStatus.completed.value, RequestStatus.failed.value)
+SENTIMENTS = ("positive", "negative", "neutral")
+
+# Fields of a request its counters are derived from
+COUNTED_FIELD_PATHS = ("status", "result.sentiment")
+
+# Users whose counters are known to cover their whole history
+_backfilled: set[str] = set()
+
+
+def status_delta(fields: Mapping[str, Any]) -> Counter:
+    """Counters a request holding ``fields`` adds to, besides ``total``."""
+    delta: Counter = Counter()
+    status = fields.get("status")
+    if status not in FINAL_STATUSES:
+        return delta
+    delta[f"status.{status}"] += 1
+    result = fields.get("result")
+    if status == RequestStatus.completed.value and isinstance(result, dict):
+        sentiment = result.get("sentiment")
+        if sentiment in SENTIMENTS:
+            delta[f"sentiment.{sentiment}"] += 1
+    return delta
+
+
+def created_delta(fields: Mapping[str, Any]) -> Counter:
+    """Counter changes of creating a request with ``fields``."""
+    return Counter({"total": 1}) + status_delta(fields)
+
+
+def change_delta(previous: Mapping[str, Any], fields: Mapping[str, Any]) -> Counter:
+    """Counter changes of writing ``fields`` to a request holding ``previous``.
+
+    Counts can go down, e.g. when a completed request is picked up again.
+    """
+    delta = status_delta({**previous, **fields})
+    delta.subtract(status_delta(previous))
+    return delta
+
+
+async def change_deltas(
+    db: AsyncClient, writes: Iterable[tuple[Any, str | None, Mapping[str, Any]]]
+) -> dict[str, Counter]:
+    """Per-user counter changes of status writes to existing requests.
+
+    Args:
+        db: Firestore client
+        writes: ``(document reference, user ID, fields)`` of each write;
+            only those naming a user and setting ``status`` are counted
+
+    The current fields of the counted requests are read in one round trip.
+    """
+    counted = [
+        (doc_ref, user_id, fields)
+        for doc_ref, user_id, fields in writes
+        if user_id and "status" in fields
+    ]
+    if not counted:
+        return {}
+    previous = {}
+    snapshots = db.get_all(
+        [doc_ref for doc_ref, _, _ in counted], field_paths=list(COUNTED_FIELD_PATHS)
+    )
+    async for snapshot in snapshots:
+        if snapshot.exists:
+            previous[snapshot.id] = snapshot.to_dict()
+    return merge_deltas(
+        (user_id, change_delta(previous[doc_ref.id], fields))
+        for doc_ref, user_id, fields in counted
+        if doc_ref.id in previous
+    )
+
+
+def stats_shards(db: AsyncClient, user_id: str) -> AsyncCollectionReference:
+    """Return the collection of a user's counter shards."""
+    return (
+        db.collection(STATS_COLLECTION).document(user_id).collection(SHARDS_COLLECTION)
+    )
+
+
+def stats_writes(
+    db: AsyncClient, deltas: Mapping[str, Counter]
+) -> list[tuple[Any, dict[str, Any]]]:
+    """``(shard reference, fields)`` merge writes applying per-user counter changes."""
+    writes = []
+    now = datetime.utcnow().isoformat()
+    for user_id, delta in deltas.items():
+        changes = {path: amount for path, amount in delta.items() if amount}
+        if not user_id or not changes:
+            continue
+        fields: dict[str, Any] = {"updated_at": now}
+        for path, amount in changes.items():
+            *parents, name = path.split(".")
+            target = fields
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[name] = Increment(amount)
+        shard = str(random.randrange(settings.ANALYSIS_STATS_SHARDS))  # noqa: S311
+        writes.append((stats_shards(db, user_id).document(shard), fields))
+    return writes
+
+
+def merge_deltas(deltas: Iterable[tuple[str | None, Counter]]) -> dict[str, Counter]:
+    """Sum counter changes per user."""
+    merged: dict[str, Counter] = defaultdict(Counter)
+    for user_id, delta in deltas:
+        if user_id and delta:
+            merged[user_id].update(delta)
+    return merged
+
+
+def _sum_shards(snapshots: Iterable[DocumentSnapshot]) -> Counter:
+    counts: Counter = Counter()
+    for snapshot in snapshots:
+        data = snapshot.to_dict() or {}
+        counts["total"] += data.get("total", 0)
+        for group in ("status", "sentiment"):
+            for name, value in (data.get(group) or {}).items():
+                counts[f"{group}.{name}"] += value
+    return counts
+
+
+async def _count(query: AsyncQuery) -> int:
+    result = await query.count().get()
+    return result[0][0].value
+
+
+async def backfill_user_stats(db: AsyncClient, user_id: str) -> None:
+    """Count a user's requests from before the counters existed, once.
+
+    The difference between a full count and what the shards already hold
+    goes into the ``backfill`` shard. Requests written while the counts
+    run can be off by one each; the stats document records when it ran.
+    """
+    stats_ref = db.collection(STATS_COLLECTION).document(user_id)
+    if (await stats_ref.get(["backfilled_at"])).exists:
+        _backfilled.add(user_id)
+        return
+    requests = db.collection("analyze_request").where("user_id", "==", user_id)
+    completed = requests.where("status", "==", RequestStatus.completed.value)
+    total, *counts = await asyncio.gather(
+        _count(requests),
+        *(_count(requests.where("status", "==", status)) for status in FINAL_STATUSES),
+        *(_count(completed.where("result.sentiment", "==", s)) for s in SENTIMENTS),
+    )
+    full = Counter({"total": total})
+    for status, count in zip(
+        FINAL_STATUSES, counts[: len(FINAL_STATUSES)], strict=True
+    ):
+        full[f"status.{status}"] = count
+    for sentiment, count in zip(SENTIMENTS, counts[len(FINAL_STATUSES) :], strict=True):
+        full[f"sentiment.{sentiment}"] = count
+
+    shards = [
+        snapshot
+        for snapshot in await stats_shards(db, user_id).get()
+        if snapshot.id != BACKFILL_SHARD
+    ]
+    counted = _sum_shards(shards)
+    base: dict[str, Any] = {"total": full["total"] - counted["total"]}
+    for path, value in full.items():
+        if "." in path:
+            group, name = path.split(".")
+            base.setdefault(group, {})[name] = value - counted[path]
+    now = datetime.utcnow().isoformat()
+    batch = db.batch()
+    batch.set(
+        stats_shards(db, user_id).document(BACKFILL_SHARD), {**base, "updated_at": now}
+    )
+    batch.set(stats_ref, {"user_id": user_id, "backfilled_at": now}, merge=True)
+    await batch.commit()
+    _backfilled.add(user_id)
+
+
+async def get_user_stats(db: AsyncClient, user_id: str) -> dict[str, Any]:
+    """Return a user's request totals by status and result sentiment."""
+    if user_id not in _backfilled:
+        await backfill_user_stats(db, user_id)
+    counts = _sum_shards(await stats_shards(db, user_id).get())
+    total = max(counts["total"], 0)
+    by_status = {
+        status: max(counts[f"status.{status}"], 0) for status in FINAL_STATUSES
+    }
+    by_status["in_progress"] = max(total - sum(by_status.values()), 0)
+    return {
+        "total": total,
+        "by_status": by_status,
+        "sentiment": {
+            sentiment: max(counts[f"sentiment.{sentiment}"], 0)
+            for sentiment in SENTIMENTS
+        },
+    }
@@ -1,13 +1,70 @@
+import asyncio
 import json
 import logging
+import time
+from collections.abc import Awaitable, Callable
 from datetime import datetime
+from typing import Any
 
-import openai
+from google.cloud.firestore_v1 import AsyncClient
+from openai.types import CompletionUsage
 
 from app.config import Settings
+from app.jobs import JobDeferredError
 from app.models.user import RequestStatus
+from app.services.chunking import (
+    estimate_tokens,
+    merge_keywords,
+    merge_sentiment,
+    split_into_chunks,
+)
+from app.services.model_router import ModelRoute, get_model_router
+from app.services.openai_client import get_model_call_policy, get_openai_client
+from app.services.result_cache import ResultCache, get_result_cache, result_cache_key
+from app.services.status_events import get_status_broker, status_event
+from app.services.status_writer import get_status_writer
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.metrics import MODEL_TIME_TO_FIRST_TOKEN, observe_model_usage
+from app.utils.partial_json import parse_partial_json
 
-openai.api_key = Settings().OPENAI_API_KEY
+settings = Settings()
+
+ANALYZE_TEXT_JOB = "analyze_text"
+# Bump when the prompt or result schema changes to invalidate cached results
+PROMPT_VERSION = "1"
+ANALYSIS_FIELDS = ["summary", "sentiment", "keywords"]
+# Fields of a streaming result shown before the model is done
+PARTIAL_FIELDS = ("summary", "keywords")
+ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "text_analysis",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "summary": {"type": "string"},
+                "sentiment": {
+                    "type": "string",
+                    "enum": ["positive", "negative", "neutral"],
+                },
+                "keywords": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ANALYSIS_FIELDS,
+        },
+    },
+}
+
+SUMMARY_REDUCE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "summary_reduction",
+        "schema": {
+            "type": "object",
+            "properties": {"summary": {"type": "string"}},
+            "required": ["summary"],
+        },
+    },
+}
 
 
 def validate_custom_json(data: dict, required_fields: list) -> bool:
@@ -15,103 +72,507 @@ def validate_custom_json(data: dict, required_fields: list) -> bool:
     # Check if it's a dict
     if not isinstance(data, dict):
         return False
-    
+
     # Check required fields
     missing_fields = [field for field in required_fields if field not in data]
     if missing_fields:
         return False
-    
+
     # Check for empty values
     null_fields = [field for field in required_fields if not data.get(field)]
     if null_fields:
         return False
-    
+
     return True
 
 
-async def request_text_analyze(request_id: str, text_to_analyze: str, db):
-    """Background task to analyze text and update status."""
+async def update_request_status(
+    db: AsyncClient,
+    request_id: str,
+    fields: dict,
+    durable: bool = False,
+    user_id: str | None = None,
+) -> None:
+    """Write status fields to an analysis request and notify its watchers.
+
+    Writes go through the batching status writer. Pass ``durable=True`` for
+    terminal states so the write is committed before the job is acked, and
+    the request's ``user_id`` so a status change updates the user's counters.
+    """
+    await get_status_writer(db).write(
+        request_id, fields, durable=durable, user_id=user_id
+    )
+    get_status_broker().publish(request_id, status_event(request_id, fields))
+
+
+class PartialResultPublisher:
+    """Throttled partial results of a streaming analysis.
+
+    Partial ``summary`` and ``keywords`` go to status subscribers at most
+    every ``publish_interval`` seconds and into the document at most every
+    ``write_interval`` seconds, through the non-durable status writer.
+    """
+
+    def __init__(
+        self,
+        db: AsyncClient,
+        request_id: str,
+        publish_interval: float,
+        write_interval: float,
+    ) -> None:
+        self.db = db
+        self.request_id = request_id
+        self.publish_interval = publish_interval
+        self.write_interval = write_interval
+        self.published = False
+        self._last_publish = float("-inf")
+        self._last_write = float("-inf")
+        self._last_partial: dict[str, Any] | None = None
+
+    async def update(self, output: str) -> None:
+        """Take the model output received so far."""
+        now = time.monotonic()
+        if now - self._last_publish < self.publish_interval:
+            return
+        parsed = parse_partial_json(output)
+        if not isinstance(parsed, dict):
+            return
+        partial = {
+            field: parsed[field] for field in PARTIAL_FIELDS if parsed.get(field)
+        }
+        if not partial or partial == self._last_partial:
+            return
+        self._last_publish = now
+        self._last_partial = partial
+        self.published = True
+        fields = {"partial_result": partial}
+        get_status_broker().publish(
+            self.request_id, status_event(self.request_id, fields)
+        )
+        if now - self._last_write >= self.write_interval:
+            self._last_write = now
+            await get_status_writer(self.db).write(self.request_id, fields)
+
+    def cleared_fields(self) -> dict[str, Any]:
+        """Fields that drop the partial result once a final status is written."""
+        return {"partial_result": None} if self.published else {}
+
+
+def analysis_messages(text_to_analyze: str) -> list[dict[str, str]]:
+    """Chat messages asking for the analysis of a text."""
+    return [
+        {
+            "role": "system",
+            "content": "Extract summary and sentiment and keywords from text",
+        },
+        {"role": "user", "content": f"{text_to_analyze}"},
+    ]
+
+
+class ModelRun:
+    """Model chosen for one analysis and what its model calls cost.
+
+    Recorded with the result so routing can be tuned from data.
+    """
+
+    def __init__(self, route: ModelRoute) -> None:
+        self.model = route.model
+        self.route = route.reason
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._started = time.perf_counter()
+
+    def record(self, usage: CompletionUsage | None, latency: float) -> None:
+        """Count one completed model call."""
+        self.calls += 1
+        observe_model_usage(self.model, usage)
+        get_model_router().observe_latency(self.model, latency)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+
+    def fields(self) -> dict[str, Any]:
+        """Document fields describing the run."""
+        return {
+            "model": self.model,
+            "model_route": self.route,
+            "model_latency_ms": round((time.perf_counter() - self._started) * 1000),
+            "usage": {
+                "model_calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": self.prompt_tokens + self.completion_tokens,
+            },
+        }
+
+
+async def stream_model_output(
+    text_to_analyze: str,
+    model: str,
+    on_output: Callable[[str], Awaitable[None]] | None = None,
+) -> tuple[str, Any]:
+    """Stream one model analysis.
+
+    Returns:
+        The complete output and the usage reported with the last chunk
+    """
+    started = time.perf_counter()
+    stream = await get_openai_client().chat.completions.create(
+        model=model,
+        messages=analysis_messages(text_to_analyze),
+        response_format=ANALYSIS_RESPONSE_FORMAT,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    parts: list[str] = []
+    usage = None
+    async for chunk in stream:
+        if chunk.usage is not None:
+            usage = chunk.usage
+        content = chunk.choices[0].delta.content if chunk.choices else None
+        if not content:
+            continue
+        if not parts:
+            MODEL_TIME_TO_FIRST_TOKEN.labels(model).observe(
+                time.perf_counter() - started
+            )
+        parts.append(content)
+        if on_output is not None:
+            await on_output("".join(parts))
+    return "".join(parts), usage
+
+
+async def run_model_analysis(
+    text_to_analyze: str,
+    run: ModelRun,
+    on_output: Callable[[str], Awaitable[None]] | None = None,
+) -> dict:
+    """Ask the run's model for a summary, sentiment and keywords of a text.
+
+    With ``ANALYSIS_STREAMING`` the output is streamed and ``on_output`` is
+    called with the output received so far after every chunk.
+
+    Returns:
+        The parsed result, or a fallback result with ``parse_error`` set
+        when the model output is not valid JSON
+    """
+    # The policy bounds concurrent calls per process and retries transient errors
+    policy = get_model_call_policy()
+    started = time.perf_counter()
+    if settings.ANALYSIS_STREAMING:
+        result_string, usage = await policy.call(
+            lambda: stream_model_output(text_to_analyze, run.model, on_output),
+            run.model,
+        )
+    else:
+        response = await policy.call(
+            lambda: get_openai_client().chat.completions.create(
+                model=run.model,
+                messages=analysis_messages(text_to_analyze),
+                response_format=ANALYSIS_RESPONSE_FORMAT,
+            ),
+            run.model,
+        )
+        result_string, usage = response.choices[0].message.content, response.usage
+    run.record(usage, time.perf_counter() - started)
+    return parse_model_output(result_string)
+
+
+def parse_model_output(result_string: str) -> dict:
+    """Parse the JSON output of an analysis model call.
+
+    Returns:
+        The parsed result, or a fallback result with ``parse_error`` set
+        when the output is not valid JSON
+    """
+    logging.debug("Raw result: %s", result_string)
+
+    # Parse JSON result
     try:
-        logging.info(f'Starting analysis for request ID: {request_id}')
-        
-        # Update status to processing
-        doc_ref = db.collection('analyze_request').document(request_id)
-        await doc_ref.update({
-            'status': RequestStatus.processing.value,
-            'updated_at': datetime.utcnow().isoformat()
-        })
-        logging.info(f'Updated status to processing for request: {request_id}')
-        
-        # Perform analysis
-        response = openai.chat.completions.create(
-            model="gpt-4o",
+        return json.loads(result_string)
+    except json.JSONDecodeError as e:
+        logging.info("Failed to parse JSON result: %s", e)
+        # Fallback to string result
+        return {
+            "summary": "Analysis completed",
+            "sentiment": "neutral",
+            "keywords": [],
+            "raw_result": result_string,
+            "parse_error": str(e),
+        }
+
+
+async def reduce_summaries(summaries: list[str], run: ModelRun) -> str:
+    """Combine the summaries of consecutive chunks into one summary."""
+    started = time.perf_counter()
+    response = await get_model_call_policy().call(
+        lambda: get_openai_client().chat.completions.create(
+            model=run.model,
             messages=[
-                {"role": "system", "content": "Extract summary and sentiment and keywords from text"},
-                {"role": "user", "content": f"{text_to_analyze}"}
+                {
+                    "role": "system",
+                    "content": (
+                        "Combine these summaries of consecutive parts of one text "
+                        "into a single summary of the whole text"
+                    ),
+                },
+                {"role": "user", "content": "\n\n".join(summaries)},
             ],
-            response_format={
-                "type": "json_schema",
-                "json_schema": {
-                    "name": "text_analysis",
-                    "schema": {
-                        "type": "object",
-                        "properties": {
-                            "summary": {"type": "string"},
-                            "sentiment": {"type": "string", "enum": ["positive", "negative", "neutral"]},
-                            "keywords": {
-                                "type": "array",
-                                "items": {"type": "string"}
-                            },
-                        },
-                        "required": ["summary", "sentiment", "keywords"]
-                    }
-                }
-            }
+            response_format=SUMMARY_REDUCE_FORMAT,
+        ),
+        run.model,
+    )
+    run.record(response.usage, time.perf_counter() - started)
+    result_string = response.choices[0].message.content
+    try:
+        summary = json.loads(result_string).get("summary")
+    except (json.JSONDecodeError, AttributeError) as e:
+        logging.info("Failed to parse summary reduction: %s", e)
+        summary = None
+    return summary or " ".join(summaries)
+
+
+def first_error(errors: BaseExceptionGroup) -> BaseException:
+    """Pick the failure of a task group to handle like that of a single call.
+
+    A ``CircuitOpenError`` wins over other errors, so the job is deferred
+    instead of using up an attempt.
+    """
+    error: BaseException = errors.subgroup(CircuitOpenError) or errors
+    while isinstance(error, BaseExceptionGroup):
+        error = error.exceptions[0]
+    return error
+
+
+async def run_chunked_analysis(
+    text_to_analyze: str,
+    cache: ResultCache,
+    run: ModelRun,
+    on_output: Callable[[str], Awaitable[None]] | None = None,
+) -> dict:
+    """Analyze a text, in parallel chunks if it is long.
+
+    Texts within ``ANALYSIS_CHUNK_TOKENS`` take a single model call. Longer
+    ones are split on sentence boundaries, up to ``ANALYSIS_CHUNK_CONCURRENCY``
+    chunks are analyzed at once, and the chunk results are merged:
+    keywords by rank, sentiment weighted by chunk length, and summaries by
+    one more model call. Chunk results go through the result cache, so a
+    retry only redoes the chunks that failed. Partial output is only
+    reported for single-call analyses.
+    """
+    chunks = split_into_chunks(text_to_analyze, settings.ANALYSIS_CHUNK_TOKENS)
+    if len(chunks) == 1:
+        return await run_model_analysis(text_to_analyze, run, on_output)
+
+    semaphore = asyncio.Semaphore(settings.ANALYSIS_CHUNK_CONCURRENCY)
+
+    async def analyze_chunk(chunk: str) -> dict:
+        async with semaphore:
+            result, _ = await cache.get_or_compute(
+                analysis_cache_key(chunk, run.model),
+                lambda: run_model_analysis(chunk, run),
+                cacheable=is_valid_result,
+            )
+            return result
+
+    # A failed chunk cancels the others; the job is retried as a whole
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(analyze_chunk(chunk)) for chunk in chunks]
+    except ExceptionGroup as errors:
+        raise first_error(errors) from errors
+    results = [task.result() for task in tasks]
+
+    valid = [
+        (result, float(len(chunk)))
+        for result, chunk in zip(results, chunks, strict=True)
+        if is_valid_result(result)
+    ]
+    if not valid:
+        return results[0]
+    valid_results = [result for result, _ in valid]
+    weights = [weight for _, weight in valid]
+    return {
+        "summary": await reduce_summaries(
+            [result["summary"] for result in valid_results], run
+        ),
+        "sentiment": merge_sentiment(valid_results, weights),
+        "keywords": merge_keywords(valid_results, weights),
+    }
+
+
+def is_valid_result(result_json: dict) -> bool:
+    """Whether a model result has every analysis field filled in."""
+    return validate_custom_json(result_json, ANALYSIS_FIELDS)
+
+
+def analysis_cache_key(text_to_analyze: str, model: str) -> str:
+    """Return the result cache key of a text analyzed by ``model``.
+
+    The key covers the normalized text and the current prompt version.
+    """
+    return result_cache_key(text_to_analyze, model, PROMPT_VERSION)
+
+
+async def request_text_analyze(
+    request_id: str,
+    text_to_analyze: str,
+    db: AsyncClient,
+    is_last_attempt: bool = True,
+    refine: bool = False,
+    tier: str | None = None,
+    user_id: str | None = None,
+) -> None:
+    """Background task to analyze text and update status.
+
+    Texts the routed model has analyzed before are answered from the
+    result cache, and concurrent identical analyses share one model call.
+    Long texts are analyzed in parallel chunks. The model is picked by the model router from the text
+    size, the user's ``tier`` and the current load, and stored with the
+    result along with its latency and token usage. With
+    ``ANALYSIS_STREAMING`` the request's ``partial_result`` follows the
+    model output until the final result is written.
+
+    When ``is_last_attempt`` is False, a failure puts the request back to
+    pending and re-raises so the job queue can retry it. While the model's
+    circuit breaker is open the request goes back to pending and
+    ``JobDeferredError`` is raised, whatever the attempt.
+
+    With ``refine`` the request already holds a local result: a valid model
+    result replaces it, and if the model fails for good the request is
+    completed with the local result instead of failing.
+
+    Status changes are counted in the stats of ``user_id``, when given.
+    """
+    partials = PartialResultPublisher(
+        db,
+        request_id,
+        settings.STREAM_PARTIAL_PUBLISH_INTERVAL_SECONDS,
+        settings.STREAM_PARTIAL_WRITE_INTERVAL_SECONDS,
+    )
+    try:
+        logging.info("Starting analysis for request ID: %s", request_id)
+
+        # Update status to processing
+        await update_request_status(
+            db,
+            request_id,
+            {
+                "status": RequestStatus.processing.value,
+                "updated_at": datetime.utcnow().isoformat(),
+            },
+            user_id=user_id,
+        )
+        logging.debug("Updated status to processing for request: %s", request_id)
+
+        # Perform analysis
+        cache = get_result_cache(db)
+        run = ModelRun(
+            await get_model_router().route(estimate_tokens(text_to_analyze), tier)
         )
-        
-        result_string = response.choices[0].message.content
-        logging.info(f'Analysis completed for request: {request_id}')
-        logging.info(f'Raw result: {result_string}')
+        result_json, cache_hit = await cache.get_or_compute(
+            analysis_cache_key(text_to_analyze, run.model),
+            lambda: run_chunked_analysis(text_to_analyze, cache, run, partials.update),
+            cacheable=is_valid_result,
+        )
+        logging.info(
+            "Analysis completed for request: %s, cache_hit: %s", request_id, cache_hit
+        )
+
+        is_valid = is_valid_result(result_json)
         status = RequestStatus.completed.value
-        
-        # Parse JSON result
-        try:
-            result_json = json.loads(result_string)
-            is_valid = validate_custom_json(result_json, ["summary", "sentiment", "keywords"])
-            if not is_valid:
-                status = RequestStatus.failed.value
-            logging.info(f'Parsed JSON result: {result_json}, is_valid: {is_valid}')
-        except json.JSONDecodeError as e:
-            logging.info(f'Failed to parse JSON result: {e}')
-            # Fallback to string result
-            result_json = {
-                "summary": "Analysis completed",
-                "sentiment": "neutral",
-                "keywords": [],
-                "raw_result": result_string,
-                "parse_error": str(e)
-            }
-        
+        if not is_valid and "parse_error" not in result_json and not refine:
+            status = RequestStatus.failed.value
+        logging.debug("Parsed JSON result: %s, is_valid: %s", result_json, is_valid)
+
         # Update status to completed with JSON result
-        await doc_ref.update({
-            'status': status,
-            'result': result_json,  # Store as JSON object
-            'updated_at': datetime.utcnow().isoformat(),
-            'completed_at': datetime.utcnow().isoformat()
-        })
-        logging.info(f'Updated status to completed for request: {request_id}')
-        
+        now = datetime.utcnow().isoformat()
+        fields = {
+            "status": status,
+            # Clears the error of an earlier failed attempt
+            "error_message": None,
+            "updated_at": now,
+            "completed_at": now,
+            **partials.cleared_fields(),
+        }
+        if is_valid or not refine:
+            # A refined request keeps its local result over an unusable one
+            fields.update(
+                {
+                    "result": result_json,  # Store as JSON object
+                    "result_source": "model",
+                    "cache_hit": cache_hit,
+                    "model": run.model,
+                }
+            )
+            if run.calls:
+                fields.update(run.fields())
+        await update_request_status(
+            db, request_id, fields, durable=True, user_id=user_id
+        )
+        logging.debug("Updated status to completed for request: %s", request_id)
+
+    except CircuitOpenError as e:
+        logging.warning("Deferring analysis for request %s: %s", request_id, e)
+        await update_request_status(
+            db,
+            request_id,
+            {
+                "status": RequestStatus.pending.value,
+                "updated_at": datetime.utcnow().isoformat(),
+                **partials.cleared_fields(),
+            },
+            durable=True,
+            user_id=user_id,
+        )
+        raise JobDeferredError(e.retry_after, str(e)) from e
+
     except Exception as e:
-        logging.error(f'Error analyzing text for request {request_id}: {e}')
-        
-        # Update status to error
+        # Timeouts carry no message of their own
+        error_message = str(e) or type(e).__name__
+        logging.error(
+            "Error analyzing text for request %s: %s", request_id, error_message
+        )
+
+        if not is_last_attempt:
+            # Hand the request back to the queue for another attempt
+            await update_request_status(
+                db,
+                request_id,
+                {
+                    "status": RequestStatus.pending.value,
+                    "error_message": error_message,
+                    "updated_at": datetime.utcnow().isoformat(),
+                    **partials.cleared_fields(),
+                },
+                durable=True,
+                user_id=user_id,
+            )
+            raise
+
+        # Update status to error, or settle for the local result
         try:
-            doc_ref = db.collection('analyze_request').document(request_id)
-            await doc_ref.update({
-                'status': RequestStatus.failed.value,
-                'error_message': str(e),
-                'updated_at': datetime.utcnow().isoformat()
-            })
-            logging.info(f'Updated status to error for request: {request_id}')
+            now = datetime.utcnow().isoformat()
+            fields = {
+                "status": RequestStatus.failed.value,
+                "error_message": error_message,
+                "updated_at": now,
+                **partials.cleared_fields(),
+            }
+            if refine:
+                fields.update(
+                    {"status": RequestStatus.completed.value, "completed_at": now}
+                )
+            await update_request_status(
+                db, request_id, fields, durable=True, user_id=user_id
+            )
+            logging.info(
+                "Updated status to %s for request: %s", fields["status"], request_id
+            )
         except Exception as update_error:
-            logging.error(f'Failed to update error status for request {request_id}: {update_error}')
+            logging.error(
+                "Failed to update error status for request %s: %s",
+                request_id,
+                update_error,
+            )
@@ -0,0 +1,614 @@
+"""Offline bulk analyses through the OpenAI Batch API.
+
+Analyses submitted with ``priority=bulk`` are queued as
+``bulk_analyze_text`` jobs, which worker slots do not claim. The
+``BulkSubmitter`` claims them every ``BULK_COLLECT_INTERVAL_SECONDS``,
+writes them to one JSONL batch file, starts a batch job for it and queues
+a ``bulk_poll`` job. That job checks the batch every
+``BULK_POLL_INTERVAL_SECONDS`` and, once it has finished, writes every
+result back to its ``analyze_request`` document with batched writes.
+Requests the batch could not answer are queued again as bulk jobs for a
+later batch, and fail once ``BULK_MAX_BATCHES`` batches have not answered
+them. They never fall back to the interactive queue, so a failed batch
+cannot flood live work.
+"""
+
+import asyncio
+import logging
+import random
+import uuid
+from collections import defaultdict
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any
+
+import orjson
+from google.cloud.firestore_v1 import DELETE_FIELD, AsyncClient
+from openai.types.chat import ChatCompletion
+
+from app.config import Settings
+from app.jobs import Job, JobDeferredError, JobQueue, JobQueueFullError
+from app.models.user import RequestStatus
+from app.services.analysis_stats import change_deltas, stats_writes
+from app.services.analyze_text import (
+    ANALYSIS_RESPONSE_FORMAT,
+    analysis_cache_key,
+    analysis_messages,
+    is_valid_result,
+    parse_model_output,
+)
+from app.services.list_cache import get_list_cache
+from app.services.openai_client import get_openai_client
+from app.services.result_cache import get_result_cache
+from app.services.status_events import get_status_broker, status_event
+from app.utils.firestore import commit_in_batches
+from app.utils.metrics import BULK_BATCHES, BULK_ITEMS, observe_model_usage
+
+settings = Settings()
+
+BULK_ANALYZE_JOB = "bulk_analyze_text"
+BULK_POLL_JOB = "bulk_poll"
+BATCH_ENDPOINT = "/v1/chat/completions"
+# Batch statuses after which nothing changes any more
+FINISHED_BATCH_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+BULK_MODEL_ROUTE = "bulk"
+
+
+def batch_request_line(document_id: str, text_to_analyze: str, model: str) -> bytes:
+    """One JSONL line of a batch file, identified by its request's document ID."""
+    return (
+        orjson.dumps(
+            {
+                "custom_id": document_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": {
+                    "model": model,
+                    "messages": analysis_messages(text_to_analyze),
+                    "response_format": ANALYSIS_RESPONSE_FORMAT,
+                },
+            }
+        )
+        + b"\n"
+    )
+
+
+async def write_bulk_statuses(
+    db: AsyncClient,
+    updates: dict[str, dict[str, Any]],
+    user_ids: Mapping[str, str] | None = None,
+) -> None:
+    """Commit status fields of many requests at once and notify their watchers.
+
+    Status changes of requests whose owner is in ``user_ids`` (by document
+    ID) are counted in the owners' stats.
+    """
+    if not updates:
+        return
+    collection = db.collection("analyze_request")
+    writes = [
+        (collection.document(document_id), fields)
+        for document_id, fields in updates.items()
+    ]
+    if user_ids:
+        deltas = await change_deltas(
+            db,
+            [(doc_ref, user_ids.get(doc_ref.id), fields) for doc_ref, fields in writes],
+        )
+        writes.extend(stats_writes(db, deltas))
+    await commit_in_batches(db, writes)
+    get_list_cache().invalidate_documents(updates)
+    broker = get_status_broker()
+    for document_id, fields in updates.items():
+        broker.publish(document_id, status_event(document_id, fields))
+
+
+def settled_fields(error_message: str, refine: bool) -> dict[str, Any]:
+    """Fields of a request whose analysis failed for good.
+
+    A refined request is completed with its local result instead.
+    """
+    now = datetime.utcnow().isoformat()
+    fields = {
+        "status": RequestStatus.failed.value,
+        "error_message": error_message,
+        "updated_at": now,
+    }
+    if refine:
+        fields.update({"status": RequestStatus.completed.value, "completed_at": now})
+    return fields
+
+
+class BulkSubmitter:
+    """Collect queued bulk analyses into OpenAI batch jobs.
+
+    Every ``collect_interval`` seconds, up to ``max_items`` bulk jobs and
+    ``max_bytes`` of batch file are claimed (fairly across tenants, like
+    any claim), uploaded as one batch file and started as one batch job.
+    The claimed jobs are acked once their requests are recorded in the
+    batch and its ``bulk_poll`` job is queued; if either step fails they
+    are retried with backoff.
+    """
+
+    def __init__(
+        self,
+        db: AsyncClient,
+        queue: JobQueue,
+        model: str,
+        collect_interval: float,
+        max_items: int,
+        max_bytes: int,
+        poll_interval: float,
+        completion_window: str,
+        visibility_timeout: float,
+        retry_base_delay: float,
+        retry_max_delay: float,
+    ) -> None:
+        self.db = db
+        self.queue = queue
+        self.model = model
+        self.collect_interval = collect_interval
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.visibility_timeout = visibility_timeout
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._stopping = asyncio.Event()
+
+    @classmethod
+    def from_settings(
+        cls, settings: Settings, db: AsyncClient, queue: JobQueue
+    ) -> "BulkSubmitter":
+        """Create a bulk submitter configured from application settings."""
+        return cls(
+            db=db,
+            queue=queue,
+            model=settings.ANALYSIS_MODEL,
+            collect_interval=settings.BULK_COLLECT_INTERVAL_SECONDS,
+            max_items=settings.BULK_BATCH_MAX_ITEMS,
+            max_bytes=settings.BULK_BATCH_MAX_BYTES,
+            poll_interval=settings.BULK_POLL_INTERVAL_SECONDS,
+            completion_window=settings.BULK_COMPLETION_WINDOW,
+            visibility_timeout=settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+            retry_base_delay=settings.JOB_RETRY_BASE_DELAY_SECONDS,
+            retry_max_delay=settings.JOB_RETRY_MAX_DELAY_SECONDS,
+        )
+
+    def stop(self) -> None:
+        """Stop collecting; unclaimed bulk jobs stay queued."""
+        self._stopping.set()
+
+    async def run(self) -> None:
+        """Submit a batch every ``collect_interval`` seconds until stopped."""
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), timeout=self.collect_interval
+                )
+            except TimeoutError:
+                pass
+            if self._stopping.is_set():
+                return
+            try:
+                while await self.submit_once() == self.max_items:
+                    # A full batch may have left more behind
+                    pass
+            except Exception as e:
+                logging.error("Failed to submit bulk batch: %s", e)
+
+    async def _claim(self) -> tuple[list[Job], list[bytes]]:
+        jobs: list[Job] = []
+        lines: list[bytes] = []
+        size = 0
+        while len(jobs) < self.max_items:
+            job = await self.queue.claim(self.visibility_timeout, (BULK_ANALYZE_JOB,))
+            if job is None:
+                break
+            line = batch_request_line(
+                job.payload["document_id"], job.payload["text"], self.model
+            )
+            if jobs and size + len(line) > self.max_bytes:
+                # Left for the next batch
+                await self.queue.defer(job, 0)
+                break
+            jobs.append(job)
+            lines.append(line)
+            size += len(line)
+        return jobs, lines
+
+    async def submit_once(self) -> int:
+        """Submit the bulk jobs queued so far as one batch.
+
+        The requests are set ``processing`` in the new batch before its
+        ``bulk_poll`` job is queued, so a job released after a failure
+        between the two is recognised by ``_resume_submitted`` and is not
+        uploaded (and billed) a second time.
+
+        Returns:
+            The number of analyses claimed
+        """
+        claimed, lines = await self._claim()
+        if not claimed:
+            return 0
+        jobs = await self._resume_submitted(claimed)
+        if not jobs:
+            return len(claimed)
+        lines_by_job = dict(zip((job.id for job in claimed), lines, strict=True))
+        client = get_openai_client()
+        try:
+            batch_file = await client.files.create(
+                file=(
+                    f"bulk-{uuid.uuid4().hex}.jsonl",
+                    b"".join(lines_by_job[job.id] for job in jobs),
+                ),
+                purpose="batch",
+            )
+            batch = await client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window=self.completion_window,
+                metadata={"source": "kai-bulk"},
+            )
+            now = datetime.utcnow().isoformat()
+            await write_bulk_statuses(
+                self.db,
+                {
+                    job.payload["document_id"]: {
+                        "status": RequestStatus.processing.value,
+                        "batch_id": batch.id,
+                        "updated_at": now,
+                    }
+                    for job in jobs
+                },
+                {job.payload["document_id"]: job.tenant for job in jobs},
+            )
+        except Exception as e:
+            await self._release(jobs, str(e) or type(e).__name__)
+            raise
+
+        await self._queue_poll(batch.id, jobs)
+        BULK_BATCHES.labels("submitted").inc()
+        BULK_ITEMS.labels("submitted").inc(len(jobs))
+        logging.info("Submitted bulk batch %s with %s analyses", batch.id, len(jobs))
+        return len(claimed)
+
+    async def _resume_submitted(self, jobs: list[Job]) -> list[Job]:
+        """Queue the poll of claimed jobs whose batch was already started.
+
+        Requests already ``processing`` in a batch were submitted by an
+        attempt that failed to queue the batch's ``bulk_poll`` job; that job
+        is queued now instead of submitting them again.
+
+        Returns:
+            The jobs still to submit
+        """
+        collection = self.db.collection("analyze_request")
+        batch_ids = {}
+        async for snapshot in self.db.get_all(
+            [collection.document(job.payload["document_id"]) for job in jobs],
+            field_paths=["status", "batch_id"],
+        ):
+            data = snapshot.to_dict() if snapshot.exists else None
+            if (
+                data
+                and data.get("status") == RequestStatus.processing.value
+                and data.get("batch_id")
+            ):
+                batch_ids[snapshot.id] = data["batch_id"]
+
+        submitted: dict[str, list[Job]] = defaultdict(list)
+        for job in jobs:
+            batch_id = batch_ids.get(job.payload["document_id"])
+            if batch_id:
+                submitted[batch_id].append(job)
+        for batch_id, batch_jobs in submitted.items():
+            await self._queue_poll(batch_id, batch_jobs)
+            logging.info(
+                "Resumed bulk batch %s with %s analyses", batch_id, len(batch_jobs)
+            )
+        return [job for job in jobs if job.payload["document_id"] not in batch_ids]
+
+    async def _queue_poll(self, batch_id: str, jobs: list[Job]) -> None:
+        """Queue the ``bulk_poll`` job of a started batch and ack its jobs.
+
+        If it cannot be queued the jobs are retried with backoff; their
+        requests stay ``processing`` in the batch for the retry to resume.
+        """
+        items = [
+            {
+                "document_id": job.payload["document_id"],
+                "cache_key": analysis_cache_key(job.payload["text"], self.model),
+                "refine": job.payload.get("refine", False),
+                "user_id": job.tenant,
+                "batches": job.payload.get("batches", 0) + 1,
+            }
+            for job in jobs
+        ]
+        try:
+            await self.queue.enqueue(
+                BULK_POLL_JOB,
+                {"batch_id": batch_id, "items": items},
+                delay=self.poll_interval,
+            )
+        except Exception as e:
+            await self._release(jobs, str(e) or type(e).__name__)
+            raise
+        for job in jobs:
+            await self.queue.ack(job)
+
+    async def _release(self, jobs: list[Job], error_message: str) -> None:
+        """Retry the jobs of a batch that could not be submitted.
+
+        Jobs out of attempts are failed instead.
+        """
+        exhausted = {}
+        user_ids = {}
+        for job in jobs:
+            delay = self.retry_base_delay * 2 ** (job.attempts - 1)
+            delay = random.uniform(0, min(delay, self.retry_max_delay))  # noqa: S311
+            if not await self.queue.retry(job, delay, error_message):
+                exhausted[job.payload["document_id"]] = settled_fields(
+                    error_message, job.payload.get("refine", False)
+                )
+                user_ids[job.payload["document_id"]] = job.tenant
+        await write_bulk_statuses(self.db, exhausted, user_ids)
+        BULK_ITEMS.labels("failed").inc(len(exhausted))
+
+
+def _read_batch_file(content: str) -> dict[str, dict[str, Any]]:
+    lines = {}
+    for line in content.splitlines():
+        if line.strip():
+            output = orjson.loads(line)
+            lines[output["custom_id"]] = output
+    return lines
+
+
+async def requeue_bulk(
+    db: AsyncClient, queue: JobQueue, items: list[dict[str, Any]], error_message: str
+) -> None:
+    """Queue bulk analyses the batch did not answer for a later batch.
+
+    The jobs go back on the bulk queue, within its own depth limit. Items
+    that have already been in ``BULK_MAX_BATCHES`` batches fail instead.
+    Each tenant's jobs are queued before their requests are set back to
+    ``pending`` and detached from the batch, so a failure part-way leaves
+    the remaining requests ``processing`` in the batch for a retry.
+    """
+    exhausted = [
+        item for item in items if item.get("batches", 1) >= settings.BULK_MAX_BATCHES
+    ]
+    if exhausted:
+        await write_bulk_statuses(
+            db,
+            {
+                item["document_id"]: settled_fields(
+                    error_message, item.get("refine", False)
+                )
+                for item in exhausted
+            },
+            {item["document_id"]: item.get("user_id", "") for item in exhausted},
+        )
+        BULK_ITEMS.labels("failed").inc(len(exhausted))
+        items = [
+            item for item in items if item.get("batches", 1) < settings.BULK_MAX_BATCHES
+        ]
+
+    collection = db.collection("analyze_request")
+    snapshots = await asyncio.gather(
+        *(
+            collection.document(item["document_id"]).get(["user_id", "text"])
+            for item in items
+        )
+    )
+    by_tenant: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    for item, snapshot in zip(items, snapshots, strict=True):
+        data = snapshot.to_dict() if snapshot.exists else None
+        if not data or not data.get("text"):
+            continue
+        job = {
+            "document_id": item["document_id"],
+            "text": data["text"],
+            "batches": item.get("batches", 1),
+        }
+        if item.get("refine"):
+            job["refine"] = True
+        by_tenant[data.get("user_id", "")].append(job)
+
+    now = datetime.utcnow().isoformat()
+    for tenant, jobs in by_tenant.items():
+        await queue.enqueue_many(BULK_ANALYZE_JOB, jobs, tenant=tenant)
+        await write_bulk_statuses(
+            db,
+            {
+                job["document_id"]: {
+                    "status": RequestStatus.pending.value,
+                    "batch_id": DELETE_FIELD,
+                    "error_message": error_message,
+                    "updated_at": now,
+                }
+                for job in jobs
+            },
+            {job["document_id"]: tenant for job in jobs},
+        )
+        BULK_ITEMS.labels("requeued").inc(len(jobs))
+
+
+async def _unsettled_items(
+    db: AsyncClient, batch_id: str, items: list[dict[str, Any]]
+) -> list[dict[str, Any]]:
+    """Items of a batch whose requests are still ``processing`` in it."""
+    collection = db.collection("analyze_request")
+    states = {
+        snapshot.id: snapshot.to_dict()
+        async for snapshot in db.get_all(
+            [collection.document(item["document_id"]) for item in items],
+            field_paths=["status", "batch_id"],
+        )
+        if snapshot.exists
+    }
+    return [
+        item
+        for item in items
+        if states.get(item["document_id"], {}).get("status")
+        == RequestStatus.processing.value
+        and states[item["document_id"]].get("batch_id") == batch_id
+    ]
+
+
+async def _requeue_or_settle(
+    db: AsyncClient,
+    queue: JobQueue,
+    job: Job,
+    items: list[dict[str, Any]],
+    error_message: str,
+) -> None:
+    """Requeue items for a later batch; on the last attempt settle those refused."""
+    try:
+        await requeue_bulk(db, queue, items, error_message)
+    except JobQueueFullError as e:
+        if not job.is_last_attempt:
+            raise
+        await settle_bulk_items(
+            db, job.payload["batch_id"], items, f"{error_message}; {e}"
+        )
+
+
+async def settle_bulk_items(
+    db: AsyncClient, batch_id: str, items: list[dict[str, Any]], error_message: str
+) -> None:
+    """Fail the items whose requests are still ``processing`` in a batch."""
+    items = await _unsettled_items(db, batch_id, items)
+    await write_bulk_statuses(
+        db,
+        {
+            item["document_id"]: settled_fields(
+                error_message, item.get("refine", False)
+            )
+            for item in items
+        },
+        {item["document_id"]: item.get("user_id", "") for item in items},
+    )
+    BULK_ITEMS.labels("failed").inc(len(items))
+
+
+async def poll_bulk_batch(db: AsyncClient, queue: JobQueue, job: Job) -> None:
+    """Check a bulk batch and write its results back once it has finished.
+
+    Raises ``JobDeferredError`` while the batch is still running. Results
+    are stored like those of interactive analyses, with ``model_route``
+    ``bulk`` and the ``batch_id``, and go into the result cache. Requests
+    that failed in the batch, or that a failed, expired or cancelled batch
+    never ran, are queued again for a later batch, as are all of them if
+    the batch cannot be checked on the job's last attempt; if the bulk
+    queue is full on the last attempt they fail instead.
+
+    Only requests still ``processing`` in this batch are handled, and the
+    unanswered ones are requeued before any result is written, so a retry
+    after a failure part-way resumes where the failed attempt stopped.
+    """
+    batch_id = job.payload["batch_id"]
+    items = job.payload["items"]
+    client = get_openai_client()
+    try:
+        batch = await client.batches.retrieve(batch_id)
+    except Exception as e:
+        if job.is_last_attempt:
+            await _requeue_or_settle(
+                db,
+                queue,
+                job,
+                await _unsettled_items(db, batch_id, items),
+                f"Bulk batch {batch_id} could not be checked: {e}",
+            )
+        raise
+    if batch.status not in FINISHED_BATCH_STATUSES:
+        raise JobDeferredError(
+            settings.BULK_POLL_INTERVAL_SECONDS,
+            f"Bulk batch {batch_id} is {batch.status}",
+        )
+
+    outputs: dict[str, dict[str, Any]] = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if file_id:
+            content = await client.files.content(file_id)
+            outputs.update(_read_batch_file(content.text))
+
+    items = await _unsettled_items(db, batch_id, items)
+    responses = {
+        item["document_id"]: (outputs.get(item["document_id"]) or {}).get("response")
+        or {}
+        for item in items
+    }
+    unanswered = [
+        item
+        for item in items
+        if responses[item["document_id"]].get("status_code") != 200
+    ]
+    if unanswered:
+        await _requeue_or_settle(
+            db,
+            queue,
+            job,
+            unanswered,
+            f"Bulk batch {batch_id} did not answer ({batch.status})",
+        )
+
+    cache = get_result_cache(db)
+    now = datetime.utcnow().isoformat()
+    updates = {}
+    for item in items:
+        document_id = item["document_id"]
+        response = responses[document_id]
+        if response.get("status_code") != 200:
+            continue
+        completion = ChatCompletion.model_validate(response["body"])
+        observe_model_usage(completion.model, completion.usage)
+        result_json = parse_model_output(completion.choices[0].message.content)
+        is_valid = is_valid_result(result_json)
+        refine = item.get("refine", False)
+        status = RequestStatus.completed.value
+        if not is_valid and "parse_error" not in result_json and not refine:
+            status = RequestStatus.failed.value
+        fields = {
+            "status": status,
+            "error_message": None,
+            "updated_at": now,
+            "completed_at": now,
+        }
+        if is_valid or not refine:
+            # A refined request keeps its local result over an unusable one
+            usage = completion.usage
+            fields.update(
+                {
+                    "result": result_json,
+                    "result_source": "model",
+                    "cache_hit": False,
+                    "model": completion.model,
+                    "model_route": BULK_MODEL_ROUTE,
+                    "usage": {
+                        "model_calls": 1,
+                        "prompt_tokens": usage.prompt_tokens if usage else 0,
+                        "completion_tokens": usage.completion_tokens if usage else 0,
+                        "total_tokens": usage.total_tokens if usage else 0,
+                    },
+                }
+            )
+        if is_valid:
+            await cache.set(item["cache_key"], result_json)
+        updates[document_id] = fields
+
+    await write_bulk_statuses(
+        db, updates, {item["document_id"]: item.get("user_id", "") for item in items}
+    )
+    BULK_ITEMS.labels("completed").inc(len(updates))
+    BULK_BATCHES.labels(batch.status).inc()
+    logging.info(
+        "Bulk batch %s %s: %s written back, %s requeued",
+        batch_id,
+        batch.status,
+        len(updates),
+        len(unanswered),
+    )
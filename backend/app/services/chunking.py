@@ -0,0 +1,91 @@
+"""Splitting long texts for parallel analysis and merging the partial results."""
+
+import re
+from collections import defaultdict
+from typing import Any
+
+# Roughly four characters per token for English text
+CHARS_PER_TOKEN = 4
+MAX_MERGED_KEYWORDS = 10
+SENTIMENT_SCORES = {"positive": 1.0, "neutral": 0.0, "negative": -1.0}
+# Length-weighted sentiment beyond this is no longer neutral
+SENTIMENT_THRESHOLD = 0.25
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _split_long_sentence(sentence: str, max_chars: int) -> list[str]:
+    pieces = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+
+def split_into_chunks(text: str, max_tokens: int) -> list[str]:
+    """Split a text on sentence boundaries into chunks of at most ``max_tokens``.
+
+    Sentences longer than the budget on their own are split on whitespace.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return [text]
+    chunks: list[str] = []
+    current: list[str] = []
+    current_chars = 0
+    for sentence in _SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        for piece in _split_long_sentence(sentence, max_chars):
+            if current and current_chars + len(piece) + 1 > max_chars:
+                chunks.append(" ".join(current))
+                current, current_chars = [], 0
+            current.append(piece)
+            current_chars += len(piece) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def merge_keywords(results: list[dict[str, Any]], weights: list[float]) -> list[str]:
+    """Keywords of all chunks ranked by chunk weight and rank, deduped ignoring case."""
+    scores: dict[str, float] = defaultdict(float)
+    spelling: dict[str, str] = {}
+    for result, weight in zip(results, weights, strict=True):
+        for rank, keyword in enumerate(result.get("keywords") or []):
+            key = str(keyword).strip().lower()
+            if not key:
+                continue
+            # Earlier keywords of a chunk matter more
+            scores[key] += weight / (rank + 1)
+            spelling.setdefault(key, str(keyword).strip())
+    ranked = sorted(scores, key=scores.__getitem__, reverse=True)
+    return [spelling[key] for key in ranked[:MAX_MERGED_KEYWORDS]]
+
+
+def merge_sentiment(results: list[dict[str, Any]], weights: list[float]) -> str:
+    """Sentiment of the whole text, weighting each chunk by its length."""
+    total = sum(weights) or 1.0
+    score = (
+        sum(
+            SENTIMENT_SCORES.get(result.get("sentiment"), 0.0) * weight
+            for result, weight in zip(results, weights, strict=True)
+        )
+        / total
+    )
+    if score > SENTIMENT_THRESHOLD:
+        return "positive"
+    if score < -SENTIMENT_THRESHOLD:
+        return "negative"
+    return "neutral"
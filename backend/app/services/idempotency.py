@@ -0,0 +1,276 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from fastapi.responses import Response
+from google.api_core.exceptions import AlreadyExists
+from google.cloud.firestore_v1 import AsyncClient, AsyncDocumentReference
+
+from app.config import Settings
+from app.utils.metrics import IDEMPOTENT_REQUESTS
+from app.utils.ttl_cache import TTLCache
+
+settings = Settings()
+_idempotency_store = None
+
+# How often a duplicate checks on a first request running in another process
+PENDING_POLL_INTERVAL = 0.25
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class IdempotencyKeyReusedError(Exception):
+    """Raised when a key is sent again with a different request."""
+
+
+class IdempotencyKeyInProgressError(Exception):
+    """Raised when the first request with a key is still running after the wait."""
+
+
+def request_fingerprint(path: str, body: bytes) -> str:
+    """Hash identifying the request an idempotency key was first used with."""
+    digest = hashlib.sha256()
+    digest.update(path.encode())
+    digest.update(b"\0")
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class FirestoreIdempotencyStore:
+    """Persistent idempotency tier stored in a Firestore collection.
+
+    A key is reserved by creating its document, so only one process runs
+    the first request. The reservation expires after ``lease`` seconds in
+    case that process dies; the stored response after ``ttl``.
+    """
+
+    def __init__(
+        self, db: AsyncClient, collection: str, ttl: float, lease: float
+    ) -> None:
+        self.db = db
+        self.collection = collection
+        self.ttl = ttl
+        self.lease = lease
+
+    def _document(self, user_id: str, key: str) -> AsyncDocumentReference:
+        document_id = hashlib.sha256(f"{user_id}\0{key}".encode()).hexdigest()
+        return self.db.collection(self.collection).document(document_id)
+
+    async def get(self, user_id: str, key: str) -> dict[str, Any] | None:
+        """Return the live record of a key: reserved, or completed with a response."""
+        snapshot = await self._document(user_id, key).get()
+        if not snapshot.exists:
+            return None
+        data = snapshot.to_dict()
+        if data.get("expires_at", 0) <= time.time():
+            return None
+        return data
+
+    async def reserve(self, user_id: str, key: str, fingerprint: str) -> bool:
+        """Reserve a key for a first request.
+
+        Returns:
+            False if another request holds the key
+        """
+        reservation = {
+            "user_id": user_id,
+            "fingerprint": fingerprint,
+            "expires_at": time.time() + self.lease,
+        }
+        doc_ref = self._document(user_id, key)
+        try:
+            await doc_ref.create(reservation)
+            return True
+        except AlreadyExists:
+            if await self.get(user_id, key) is not None:
+                return False
+        # Expired; take it over
+        await doc_ref.set(reservation)
+        return True
+
+    async def complete(self, user_id: str, key: str, record: dict[str, Any]) -> None:
+        """Replace the reservation of a key with the finished response."""
+        await self._document(user_id, key).set(
+            {**record, "user_id": user_id, "expires_at": time.time() + self.ttl}
+        )
+
+    async def release(self, user_id: str, key: str) -> None:
+        """Drop the reservation of a key so a retry can run again."""
+        await self._document(user_id, key).delete()
+
+
+class IdempotencyStore:
+    """Responses of submissions sent with an ``Idempotency-Key``.
+
+    The first successful response for a (user, key) pair is kept for
+    ``ttl`` seconds in an in-memory LRU of ``max_keys`` keys and the
+    optional persistent tier, and replayed for later requests with the
+    same key. Duplicates arriving while the first request runs wait for it,
+    for at most ``wait`` seconds. Responses other than 2xx are not kept,
+    so a failed first request can be retried with the same key.
+    """
+
+    def __init__(
+        self,
+        max_keys: int,
+        ttl: float,
+        wait: float,
+        persistent: FirestoreIdempotencyStore | None = None,
+    ) -> None:
+        self.memory: TTLCache[dict[str, Any]] = TTLCache(max_size=max_keys, ttl=ttl)
+        self.wait = wait
+        self.persistent = persistent
+        self._in_flight: dict[tuple[str, str], asyncio.Future] = {}
+
+    async def run(
+        self,
+        user_id: str,
+        key: str,
+        fingerprint: str,
+        handler: Callable[[], Awaitable[Response]],
+    ) -> Response:
+        """Run ``handler`` once for a key and replay its response afterwards.
+
+        Args:
+            user_id: Owner of the key
+            key: ``Idempotency-Key`` header value
+            fingerprint: ``request_fingerprint`` of the request
+            handler: Coroutine factory producing the response
+
+        Raises:
+            IdempotencyKeyReusedError: If the key was used with another request
+            IdempotencyKeyInProgressError: If the first request outlasted the wait
+        """
+        cache_key = (user_id, key)
+        deadline = time.monotonic() + self.wait
+        while True:
+            record = self.memory.get(cache_key)
+            if record is not None:
+                return self._replay(record, fingerprint)
+            future = self._in_flight.get(cache_key)
+            if future is None:
+                break
+            IDEMPOTENT_REQUESTS.labels("waited").inc()
+            try:
+                await asyncio.wait_for(
+                    asyncio.shield(future), deadline - time.monotonic()
+                )
+            except TimeoutError as e:
+                IDEMPOTENT_REQUESTS.labels("in_progress").inc()
+                raise IdempotencyKeyInProgressError(
+                    "A request with this Idempotency-Key is still being processed"
+                ) from e
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            # Replay the stored response, or run it ourselves if none was kept
+
+        # Registered before any await so in-process duplicates wait on it
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[cache_key] = future
+        try:
+            if self.persistent is not None:
+                record = await self._reserve(user_id, key, fingerprint, deadline)
+                if record is not None:
+                    self.memory.set(cache_key, record)
+                    return self._replay(record, fingerprint)
+            IDEMPOTENT_REQUESTS.labels("new").inc()
+            try:
+                response = await handler()
+            except Exception:
+                if self.persistent is not None:
+                    await self._settle(user_id, key, None)
+                raise
+            record = None
+            if 200 <= response.status_code < 300:
+                record = {
+                    "fingerprint": fingerprint,
+                    "status_code": response.status_code,
+                    "media_type": response.media_type,
+                    "body": bytes(response.body),
+                }
+                self.memory.set(cache_key, record)
+            if self.persistent is not None:
+                await self._settle(user_id, key, record)
+            return response
+        finally:
+            self._in_flight.pop(cache_key, None)
+            future.set_result(None)
+
+    async def _reserve(
+        self, user_id: str, key: str, fingerprint: str, deadline: float
+    ) -> dict[str, Any] | None:
+        """Reserve a key in the persistent tier, or wait for its response there."""
+        while True:
+            record = await self.persistent.get(user_id, key)
+            if record is not None and "body" in record:
+                return record
+            if record is not None and record.get("fingerprint") != fingerprint:
+                IDEMPOTENT_REQUESTS.labels("reused").inc()
+                raise IdempotencyKeyReusedError(
+                    "Idempotency-Key was already used with a different request"
+                )
+            if record is None and await self.persistent.reserve(
+                user_id, key, fingerprint
+            ):
+                return None
+            if time.monotonic() >= deadline:
+                IDEMPOTENT_REQUESTS.labels("in_progress").inc()
+                raise IdempotencyKeyInProgressError(
+                    "A request with this Idempotency-Key is still being processed"
+                )
+            IDEMPOTENT_REQUESTS.labels("waited").inc()
+            await asyncio.sleep(PENDING_POLL_INTERVAL)
+
+    async def _settle(
+        self, user_id: str, key: str, record: dict[str, Any] | None
+    ) -> None:
+        try:
+            if record is not None:
+                await self.persistent.complete(user_id, key, record)
+            else:
+                await self.persistent.release(user_id, key)
+        except Exception as e:
+            logging.warning("Idempotency store write failed: %s", e)
+
+    @staticmethod
+    def _replay(record: dict[str, Any], fingerprint: str) -> Response:
+        if record["fingerprint"] != fingerprint:
+            IDEMPOTENT_REQUESTS.labels("reused").inc()
+            raise IdempotencyKeyReusedError(
+                "Idempotency-Key was already used with a different request"
+            )
+        IDEMPOTENT_REQUESTS.labels("replayed").inc()
+        return Response(
+            content=record["body"],
+            status_code=record["status_code"],
+            media_type=record.get("media_type"),
+            headers={REPLAYED_HEADER: "true"},
+        )
+
+
+def get_idempotency_store(db: AsyncClient) -> IdempotencyStore:
+    """Get the process-wide idempotency store singleton.
+
+    Args:
+        db: Firestore client for the persistent tier, if it is enabled
+    """
+    global _idempotency_store
+    if _idempotency_store is None:
+        persistent = None
+        if settings.IDEMPOTENCY_PERSISTENT:
+            persistent = FirestoreIdempotencyStore(
+                db,
+                collection=settings.IDEMPOTENCY_COLLECTION,
+                ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+                lease=settings.IDEMPOTENCY_LEASE_SECONDS,
+            )
+        _idempotency_store = IdempotencyStore(
+            max_keys=settings.IDEMPOTENCY_MAX_KEYS,
+            ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+            wait=settings.IDEMPOTENCY_WAIT_SECONDS,
+            persistent=persistent,
+        )
+    return _idempotency_store
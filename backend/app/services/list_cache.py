@@ -0,0 +1,170 @@
+import time
+from collections import OrderedDict, deque
+from collections.abc import Hashable, Iterable
+from typing import Any, NamedTuple
+
+from app.config import Settings
+from app.utils.metrics import LIST_CACHE_LOOKUPS
+from app.utils.responses import compute_etag
+
+settings = Settings()
+_list_cache = None
+
+# Invalidations remembered for pages whose query overlapped them
+INVALIDATION_HISTORY = 4096
+
+
+class CachedPage(NamedTuple):
+    """A cached analysis list response and its ETag."""
+
+    data: dict[str, Any]
+    etag: str
+    expires_at: float
+    document_ids: frozenset[str]
+
+
+class AnalysisListCache:
+    """Short-lived per-user cache of analysis list pages.
+
+    Pages are keyed by user and query parameters, live for at most ``ttl``
+    seconds, and the least recently used are dropped beyond ``max_pages``.
+    A submission drops every page of its user; a committed status update
+    drops the pages that list the document.
+
+    A page is only stored if nothing it could show was invalidated while
+    its query ran, so a slow read cannot put back what a write just
+    dropped. Writes made in another process (a separate ``kai-worker``)
+    are not seen here, and ``ttl`` bounds how stale those pages can get.
+    """
+
+    def __init__(self, max_pages: int, ttl: float) -> None:
+        self.max_pages = max_pages
+        self.ttl = ttl
+        self._pages: OrderedDict[tuple[str, Hashable], CachedPage] = OrderedDict()
+        self._keys_by_user: dict[str, set[tuple[str, Hashable]]] = {}
+        self._keys_by_document: dict[str, set[tuple[str, Hashable]]] = {}
+        self._version = 0
+        self._invalidations: deque[tuple[int, str | None, str | None]] = deque(
+            maxlen=INVALIDATION_HISTORY
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Whether pages are cached at all."""
+        return self.ttl > 0 and self.max_pages > 0
+
+    @property
+    def version(self) -> int:
+        """Invalidation counter to pass to ``set`` for a query started now."""
+        return self._version
+
+    def get(self, user_id: str, params: Hashable) -> CachedPage | None:
+        """Return a fresh cached page, or None on a miss."""
+        key = (user_id, params)
+        page = self._pages.get(key)
+        if page is not None and page.expires_at <= time.monotonic():
+            self._drop(key)
+            page = None
+        if page is None:
+            LIST_CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        self._pages.move_to_end(key)
+        LIST_CACHE_LOOKUPS.labels("hit").inc()
+        return page
+
+    def set(
+        self, user_id: str, params: Hashable, data: dict[str, Any], version: int
+    ) -> CachedPage:
+        """Cache a page read by a query that started at ``version``.
+
+        Returns:
+            The page with its ETag, whether or not it could be cached
+        """
+        document_ids = frozenset(
+            request["id"] for request in data.get("requests", ()) if "id" in request
+        )
+        page = CachedPage(
+            data, compute_etag(data), time.monotonic() + self.ttl, document_ids
+        )
+        if not self.enabled or self._invalidated_since(version, user_id, document_ids):
+            return page
+        key = (user_id, params)
+        self._drop(key)
+        self._pages[key] = page
+        self._keys_by_user.setdefault(user_id, set()).add(key)
+        for document_id in document_ids:
+            self._keys_by_document.setdefault(document_id, set()).add(key)
+        while len(self._pages) > self.max_pages:
+            self._drop(next(iter(self._pages)))
+        return page
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Drop every page of a user, after a write that adds documents."""
+        self._record(user_id, None)
+        for key in list(self._keys_by_user.get(user_id, ())):
+            self._drop(key)
+
+    def invalidate_documents(self, document_ids: Iterable[str]) -> None:
+        """Drop the pages listing any of these documents, after they changed."""
+        for document_id in document_ids:
+            self._record(None, document_id)
+            for key in list(self._keys_by_document.get(document_id, ())):
+                self._drop(key)
+
+    def clear(self) -> None:
+        """Drop all pages."""
+        self._pages.clear()
+        self._keys_by_user.clear()
+        self._keys_by_document.clear()
+
+    def __len__(self) -> int:
+        """Return the number of cached pages."""
+        return len(self._pages)
+
+    def _record(self, user_id: str | None, document_id: str | None) -> None:
+        self._version += 1
+        self._invalidations.append((self._version, user_id, document_id))
+
+    def _invalidated_since(
+        self, version: int, user_id: str, document_ids: frozenset[str]
+    ) -> bool:
+        if self._version == version:
+            return False
+        if not self._invalidations or self._invalidations[0][0] > version + 1:
+            # Too many invalidations since to tell
+            return True
+        for invalidated_at, invalidated_user, document_id in reversed(
+            self._invalidations
+        ):
+            if invalidated_at <= version:
+                break
+            if invalidated_user == user_id or document_id in document_ids:
+                return True
+        return False
+
+    def _drop(self, key: tuple[str, Hashable]) -> None:
+        page = self._pages.pop(key, None)
+        if page is None:
+            return
+        user_keys = self._keys_by_user.get(key[0])
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[key[0]]
+        for document_id in page.document_ids:
+            document_keys = self._keys_by_document.get(document_id)
+            if document_keys is not None:
+                document_keys.discard(key)
+                if not document_keys:
+                    del self._keys_by_document[document_id]
+
+
+def get_list_cache() -> AnalysisListCache:
+    """Get the process-wide analysis list cache singleton."""
+    global _list_cache
+    if _list_cache is None:
+        _list_cache = AnalysisListCache(
+            max_pages=settings.LIST_CACHE_MAX_PAGES,
+            ttl=settings.LIST_CACHE_TTL_SECONDS,
+        )
+    return _list_cache
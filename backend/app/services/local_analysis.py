@@ -0,0 +1,219 @@
+"""Summary, sentiment and keywords computed in process, without a model call.
+
+Keywords are scored RAKE-style: candidate phrases are the runs of content
+words between stopwords and punctuation, and each word scores its degree
+over its frequency. Sentiment sums a small lexicon with negation and
+intensifier handling, and the summary is the sentence carrying the most
+keyword weight. The result has the same shape as a model result.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Any
+
+MAX_KEYWORDS = 5
+MAX_PHRASE_WORDS = 3
+MAX_SUMMARY_CHARS = 200
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+# Words and the punctuation that ends a candidate phrase
+_TOKEN = re.compile(r"[A-Za-z][A-Za-z'-]*|[0-9]+|[.,;:!?()\[\]\"]")
+_STOPWORDS = frozenset(
+    """
+    a about above after again against all also although am an and any are as at be
+    because been before being below between both but by can could did do does
+    doing down during each even few for from further get got had has have having he
+    her here hers him his how i if in into is it its itself just me more most
+    much my no nor not now of off on once one only or other our ours out over
+    own really same she should so some still such than that the their theirs
+    them then there these they this those though through to too under until up
+    us very was we well were what when where which while who whom why will
+    with would yet you your yours
+""".split()
+)
+_POSITIVE = dict.fromkeys(
+    """
+        amazing awesome beautiful best better brilliant calm clean comfortable
+        delicious delighted easy effective efficient enjoy enjoyed excellent
+        excited fantastic fast favorite fine fun glad good great happy helpful
+        impressive improved incredible kind like liked love loved lovely nice
+        perfect pleasant pleased positive recommend reliable satisfied smooth
+        success successful superb thank thanks useful win wonderful worth
+    """.split(),
+    1.0,
+)
+_NEGATIVE = dict.fromkeys(
+    """
+        angry annoyed annoying awful bad boring broken buggy confusing crash
+        crashed difficult dirty disappointed disappointing dislike fail failed
+        failure frustrated frustrating hard hate hated horrible hurt issue
+        issues lost mess negative poor problem problems rude sad slow sorry
+        stuck terrible ugly unhappy unreliable unusable useless waste worse
+        worst wrong
+    """.split(),
+    -1.0,
+)
+_LEXICON = {**_POSITIVE, **_NEGATIVE}
+_NEGATIONS = frozenset(
+    "not no never none nobody nothing neither nor cannot without".split()
+)
+_INTENSIFIERS = {
+    "very": 1.5,
+    "really": 1.5,
+    "extremely": 2.0,
+    "incredibly": 2.0,
+    "so": 1.3,
+    "absolutely": 1.8,
+    "totally": 1.5,
+    "quite": 1.2,
+    "slightly": 0.5,
+    "somewhat": 0.6,
+}
+# Words after a negation whose polarity it flips
+_NEGATION_SCOPE = 3
+# Compound scores within this distance of zero are neutral
+_NEUTRAL_BAND = 0.05
+
+
+def _tokens(sentence: str) -> list[str]:
+    return [token.lower() for token in _TOKEN.findall(sentence)]
+
+
+def _is_content_word(token: str) -> bool:
+    return (
+        token[0].isalpha()
+        and len(token) > 2
+        and token not in _STOPWORDS
+        and token not in _NEGATIONS
+    )
+
+
+def _candidate_phrases(tokens: list[str]) -> list[tuple[str, ...]]:
+    phrases = []
+    current: list[str] = []
+    for token in tokens:
+        if _is_content_word(token) and len(current) < MAX_PHRASE_WORDS:
+            current.append(token)
+            continue
+        if current:
+            phrases.append(tuple(current))
+        current = [token] if _is_content_word(token) else []
+    if current:
+        phrases.append(tuple(current))
+    return phrases
+
+
+def _word_scores(phrases: list[tuple[str, ...]]) -> dict[str, float]:
+    frequency: Counter = Counter()
+    degree: Counter = Counter()
+    for phrase in phrases:
+        for word in phrase:
+            frequency[word] += 1
+            degree[word] += len(phrase)
+    return {word: degree[word] / frequency[word] for word in frequency}
+
+
+def extract_keywords(
+    phrases: list[tuple[str, ...]], word_scores: dict[str, float]
+) -> list[str]:
+    """Highest scoring distinct phrases, earliest first on ties."""
+    scored: dict[tuple[str, ...], float] = {}
+    occurrences: Counter = Counter(phrases)
+    for phrase in phrases:
+        if phrase not in scored:
+            # Repeated phrases rank higher, with diminishing returns
+            scored[phrase] = sum(word_scores[word] for word in phrase) * (
+                1 + math.log(occurrences[phrase])
+            )
+    ranked = sorted(scored, key=scored.__getitem__, reverse=True)
+    keywords: list[str] = []
+    seen_words: set[str] = set()
+    for phrase in ranked:
+        # Skip phrases that only repeat words of a better phrase
+        if seen_words.issuperset(phrase):
+            continue
+        keywords.append(" ".join(phrase))
+        seen_words.update(phrase)
+        if len(keywords) == MAX_KEYWORDS:
+            break
+    return keywords
+
+
+def score_sentiment(tokens: list[str]) -> float:
+    """Lexicon sentiment squashed to -1 (negative) .. 1 (positive)."""
+    total = 0.0
+    negated_until = -1
+    weight = 1.0
+    for index, token in enumerate(tokens):
+        if token in _NEGATIONS or token.endswith("n't"):
+            negated_until = index + _NEGATION_SCOPE
+            continue
+        if token in _INTENSIFIERS:
+            weight *= _INTENSIFIERS[token]
+            continue
+        polarity = _LEXICON.get(token)
+        if polarity is not None:
+            if index <= negated_until:
+                # "not good" is milder than "bad"
+                polarity *= -0.75
+            total += polarity * weight
+        if not token[0].isalpha() or polarity is not None:
+            weight = 1.0
+    return total / math.sqrt(total * total + 15)
+
+
+def _summary(
+    sentences: list[str],
+    sentence_tokens: list[list[str]],
+    word_scores: dict[str, float],
+) -> str:
+    best, best_score = 0, -1.0
+    for index, tokens in enumerate(sentence_tokens):
+        words = [token for token in tokens if token in word_scores]
+        if not words:
+            continue
+        score = sum(word_scores[word] for word in words)
+        if score > best_score:
+            best, best_score = index, score
+    summary = sentences[best] if sentences else ""
+    if len(summary) > MAX_SUMMARY_CHARS:
+        summary = summary[:MAX_SUMMARY_CHARS].rsplit(" ", 1)[0] + "..."
+    return summary
+
+
+def analyze_locally(text: str) -> dict[str, Any]:
+    """Summary, sentiment and keywords of a text, in the model result schema."""
+    sentences = [
+        sentence.strip()
+        for sentence in _SENTENCE.split(text.strip())
+        if sentence.strip()
+    ]
+    sentence_tokens = [_tokens(sentence) for sentence in sentences]
+    phrases = [
+        phrase for tokens in sentence_tokens for phrase in _candidate_phrases(tokens)
+    ]
+    word_scores = _word_scores(phrases)
+
+    tokens = [token for sentence in sentence_tokens for token in sentence]
+    compound = score_sentiment(tokens)
+    if compound > _NEUTRAL_BAND:
+        sentiment = "positive"
+    elif compound < -_NEUTRAL_BAND:
+        sentiment = "negative"
+    else:
+        sentiment = "neutral"
+
+    keywords = extract_keywords(phrases, word_scores)
+    if not keywords:
+        # Only stopwords or symbols: fall back to the distinct words themselves
+        words = Counter(token for token in tokens if token[0].isalnum())
+        keywords = [word for word, _ in words.most_common(MAX_KEYWORDS)] or [
+            text.strip()
+        ]
+
+    return {
+        "summary": _summary(sentences, sentence_tokens, word_scores),
+        "sentiment": sentiment,
+        "keywords": keywords,
+    }
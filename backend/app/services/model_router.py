@@ -0,0 +1,145 @@
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import NamedTuple
+
+from app.config import Settings
+from app.jobs import get_job_queue
+from app.utils.metrics import MODEL_ROUTES
+
+settings = Settings()
+_model_router = None
+
+# Latencies below this many samples are too few to route on
+MIN_LATENCY_SAMPLES = 20
+
+
+class ModelRoute(NamedTuple):
+    """Model picked for an analysis and the rule that picked it."""
+
+    model: str
+    reason: str
+
+
+class ModelRouter:
+    """Pick the model of an analysis from its size, tier, backlog and latency.
+
+    The first matching rule wins:
+
+    1. Users in ``premium_tiers`` get ``default_model`` (``premium``)
+    2. Texts of at most ``short_text_tokens`` get ``fast_model`` (``short_text``)
+    3. A job queue at least ``backlog_depth`` deep sends everything to
+       ``fast_model`` (``backlog``)
+    4. So does a p95 latency of ``default_model`` over ``latency_p95``
+       seconds across its last ``latency_window`` calls (``slow_upstream``)
+    5. Otherwise ``default_model`` (``default``)
+
+    A threshold of 0 disables its rule. The queue depth is read at most
+    every ``depth_refresh_seconds``.
+    """
+
+    def __init__(
+        self,
+        default_model: str,
+        fast_model: str,
+        queue_depth: Callable[[], Awaitable[int]],
+        short_text_tokens: int = 0,
+        backlog_depth: int = 0,
+        latency_p95: float = 0.0,
+        premium_tiers: frozenset[str] = frozenset(),
+        latency_window: int = 200,
+        depth_refresh_seconds: float = 1.0,
+        enabled: bool = True,
+    ) -> None:
+        self.default_model = default_model
+        self.fast_model = fast_model
+        self.short_text_tokens = short_text_tokens
+        self.backlog_depth = backlog_depth
+        self.latency_p95 = latency_p95
+        self.premium_tiers = premium_tiers
+        self.latency_window = latency_window
+        self.depth_refresh_seconds = depth_refresh_seconds
+        self.enabled = enabled
+        self._queue_depth = queue_depth
+        self._depth = 0
+        self._depth_read_at = float("-inf")
+        self._latencies: dict[str, deque[float]] = {}
+
+    def observe_latency(self, model: str, seconds: float) -> None:
+        """Record the latency of a completed model call."""
+        window = self._latencies.get(model)
+        if window is None:
+            window = self._latencies[model] = deque(maxlen=self.latency_window)
+        window.append(seconds)
+
+    def latency_percentile(self, model: str, q: float) -> float | None:
+        """Recent latency percentile of a model, or None with too few samples."""
+        window = self._latencies.get(model)
+        if window is None or len(window) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(window)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    async def queue_depth(self) -> int:
+        """Job queue depth, at most ``depth_refresh_seconds`` old."""
+        now = time.monotonic()
+        if now - self._depth_read_at >= self.depth_refresh_seconds:
+            self._depth_read_at = now
+            self._depth = await self._queue_depth()
+        return self._depth
+
+    async def _pick(self, tokens: int, tier: str | None) -> ModelRoute:
+        if not self.enabled:
+            return ModelRoute(self.default_model, "default")
+        if tier in self.premium_tiers:
+            return ModelRoute(self.default_model, "premium")
+        if self.short_text_tokens and tokens <= self.short_text_tokens:
+            return ModelRoute(self.fast_model, "short_text")
+        if self.backlog_depth and await self.queue_depth() >= self.backlog_depth:
+            return ModelRoute(self.fast_model, "backlog")
+        if self.latency_p95:
+            p95 = self.latency_percentile(self.default_model, 0.95)
+            if p95 is not None and p95 > self.latency_p95:
+                return ModelRoute(self.fast_model, "slow_upstream")
+        return ModelRoute(self.default_model, "default")
+
+    async def route(
+        self, tokens: int, tier: str | None = None, counted: bool = True
+    ) -> ModelRoute:
+        """Pick the model for a text of ``tokens`` estimated tokens.
+
+        Pass ``counted=False`` when no analysis runs on the route, e.g. to
+        look up a cached result, so it is not counted in the routing metrics.
+        """
+        route = await self._pick(tokens, tier)
+        if counted:
+            MODEL_ROUTES.labels(route.model, route.reason).inc()
+        return route
+
+
+def get_model_router() -> ModelRouter:
+    """Get the process-wide model router singleton."""
+    global _model_router
+    if _model_router is None:
+
+        async def queue_depth() -> int:
+            from app.services.analyze_text import ANALYZE_TEXT_JOB
+
+            # Only live work: a bulk backlog must not degrade interactive analyses
+            return await get_job_queue().depth(ANALYZE_TEXT_JOB)
+
+        _model_router = ModelRouter(
+            default_model=settings.ANALYSIS_MODEL,
+            fast_model=settings.ANALYSIS_FAST_MODEL,
+            queue_depth=queue_depth,
+            short_text_tokens=settings.MODEL_ROUTING_SHORT_TEXT_TOKENS,
+            backlog_depth=settings.MODEL_ROUTING_BACKLOG_DEPTH,
+            latency_p95=settings.MODEL_ROUTING_LATENCY_P95_SECONDS,
+            premium_tiers=frozenset(
+                tier.strip()
+                for tier in settings.MODEL_ROUTING_PREMIUM_TIERS.split(",")
+                if tier.strip()
+            ),
+            enabled=settings.MODEL_ROUTING_ENABLED,
+        )
+    return _model_router
@@ -0,0 +1,290 @@
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable
+from email.utils import parsedate_to_datetime
+from types import TracebackType
+from typing import TypeVar
+
+import httpx
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+)
+
+from app.config import Settings
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.metrics import (
+    MODEL_CALL_DURATION,
+    MODEL_CALL_RETRIES,
+    MODEL_CALLS_IN_FLIGHT,
+    MODEL_CALLS_WAITING,
+)
+
+settings = Settings()
+_openai_client = None
+_model_call_limiter = None
+_model_call_policy = None
+
+T = TypeVar("T")
+
+# Status codes worth another attempt; the same set the OpenAI SDK retries
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429})
+
+
+class ModelQueueFullError(Exception):
+    """Raised when too many model calls are already waiting for a slot."""
+
+
+class ModelCallLimiter:
+    """Cap concurrent model calls with a semaphore and a bounded wait queue.
+
+    Callers beyond ``max_concurrency`` wait in FIFO order on the semaphore.
+    Once ``max_queue_size`` callers are waiting, new callers are rejected
+    with ``ModelQueueFullError`` instead of piling up without limit.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue_size: int) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._in_flight = 0
+
+    @property
+    def waiting(self) -> int:
+        """Number of calls waiting for a free slot."""
+        return self._waiting
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls currently holding a slot."""
+        return self._in_flight
+
+    async def __aenter__(self) -> "ModelCallLimiter":
+        """Wait for a free slot, unless too many calls already wait."""
+        if self._semaphore.locked():
+            if self._waiting >= self.max_queue_size:
+                raise ModelQueueFullError(
+                    f"Model call queue is full ({self._waiting} waiting)"
+                )
+            self._waiting += 1
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self._waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self._in_flight += 1
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        """Free the slot."""
+        self._in_flight -= 1
+        self._semaphore.release()
+
+
+def retry_reason(error: Exception) -> str | None:
+    """Why a failed model call may succeed if retried, or None if it will not."""
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    if isinstance(error, APIConnectionError):
+        return "connection"
+    if isinstance(error, APIStatusError):
+        if error.status_code == 429:
+            return "rate_limit"
+        if error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500:
+            return "server_error"
+    return None
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """Delay requested by the ``retry-after-ms`` or ``retry-after`` header."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return max(float(headers["retry-after-ms"]) / 1000, 0.0)
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class ModelCallPolicy:
+    """Deadlines, retries and a circuit breaker around model calls.
+
+    Each attempt holds a limiter slot and is cut off after ``timeout``
+    seconds. Timeouts, connection errors, 408/409/429 and 5xx responses
+    are retried up to ``max_retries`` times with full-jitter exponential
+    backoff, waiting at least as long as a ``Retry-After`` header asks,
+    as long as the retry can start before ``deadline`` seconds have
+    passed since the first attempt. Those failures also count towards the
+    circuit breaker, which raises ``CircuitOpenError`` instead of calling
+    the model while it is open. Other errors are raised immediately.
+    """
+
+    def __init__(
+        self,
+        limiter: ModelCallLimiter,
+        breaker: CircuitBreaker,
+        timeout: float,
+        deadline: float,
+        max_retries: int,
+        base_delay: float,
+        max_delay: float,
+    ) -> None:
+        self.limiter = limiter
+        self.breaker = breaker
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _backoff(self, retry: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.base_delay * 2**retry, self.max_delay))  # noqa: S311
+        requested = retry_after_seconds(error)
+        if requested is not None:
+            delay = max(delay, requested)
+        return delay
+
+    async def call(self, func: Callable[[], Awaitable[T]], model: str) -> T:
+        """Run ``func`` (one model request) under the policy."""
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + self.deadline
+        retry = 0
+        while True:
+            self.breaker.before_call()
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                async with self.limiter:
+                    remaining = give_up_at - loop.time()
+                    async with asyncio.timeout(min(self.timeout, max(remaining, 0.0))):
+                        result = await func()
+                outcome = "ok"
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None:
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                delay = self._backoff(retry, e)
+                if retry >= self.max_retries or loop.time() + delay >= give_up_at:
+                    raise
+                retry += 1
+                MODEL_CALL_RETRIES.labels(model, reason).inc()
+                logging.warning(
+                    "Model call failed (%s), retry %s of %s in %.1fs: %s",
+                    reason,
+                    retry,
+                    self.max_retries,
+                    delay,
+                    e,
+                )
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.release()
+                raise
+            finally:
+                MODEL_CALL_DURATION.labels(model, outcome).observe(
+                    time.perf_counter() - started
+                )
+            self.breaker.record_success()
+            return result
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Get the shared async OpenAI client singleton.
+
+    The client keeps a pooled HTTP connection so concurrent analyses reuse
+    connections instead of opening a new one per call. With
+    ``OPENAI_BACKEND=fake`` a local stand-in is returned instead.
+    """
+    global _openai_client
+    if _openai_client is None and settings.OPENAI_BACKEND == "fake":
+        from app.local.openai import FakeAsyncOpenAI
+
+        _openai_client = FakeAsyncOpenAI(
+            latency=settings.FAKE_OPENAI_LATENCY_SECONDS,
+            latency_jitter=settings.FAKE_OPENAI_LATENCY_JITTER_SECONDS,
+            error_rate=settings.FAKE_OPENAI_ERROR_RATE,
+            batch_latency=settings.FAKE_OPENAI_BATCH_LATENCY_SECONDS,
+        )
+        logging.info("✅ Fake OpenAI client initialized")
+    if _openai_client is None:
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=settings.OPENAI_TIMEOUT_SECONDS,
+        )
+        # Retries are left to ModelCallPolicy so they count towards its
+        # deadline and circuit breaker
+        _openai_client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=http_client,
+            max_retries=0,
+        )
+        logging.info("✅ OpenAI async client initialized")
+    return _openai_client
+
+
+def get_model_call_limiter() -> ModelCallLimiter:
+    """Get the process-wide model call limiter singleton."""
+    global _model_call_limiter
+    if _model_call_limiter is None:
+        _model_call_limiter = limiter = ModelCallLimiter(
+            max_concurrency=settings.OPENAI_MAX_CONCURRENCY,
+            max_queue_size=settings.OPENAI_MAX_QUEUE_SIZE,
+        )
+        MODEL_CALLS_WAITING.set_function(lambda: limiter.waiting)
+        MODEL_CALLS_IN_FLIGHT.set_function(lambda: limiter.in_flight)
+    return _model_call_limiter
+
+
+def get_model_call_policy() -> ModelCallPolicy:
+    """Get the process-wide model call policy singleton."""
+    global _model_call_policy
+    if _model_call_policy is None:
+        _model_call_policy = ModelCallPolicy(
+            limiter=get_model_call_limiter(),
+            breaker=CircuitBreaker(
+                "openai",
+                failure_threshold=settings.OPENAI_BREAKER_FAILURE_THRESHOLD,
+                recovery_timeout=settings.OPENAI_BREAKER_RECOVERY_SECONDS,
+                half_open_calls=settings.OPENAI_BREAKER_HALF_OPEN_CALLS,
+            ),
+            timeout=settings.OPENAI_TIMEOUT_SECONDS,
+            deadline=settings.OPENAI_CALL_DEADLINE_SECONDS,
+            max_retries=settings.OPENAI_MAX_RETRIES,
+            base_delay=settings.OPENAI_RETRY_BASE_DELAY_SECONDS,
+            max_delay=settings.OPENAI_RETRY_MAX_DELAY_SECONDS,
+        )
+    return _model_call_policy
+
+
+async def close_openai_client() -> None:
+    """Close the shared client and its connection pool."""
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
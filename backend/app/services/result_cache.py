@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from google.cloud.firestore_v1 import AsyncClient
+
+from app.config import Settings
+from app.utils.ttl_cache import TTLCache
+
+settings = Settings()
+_result_cache = None
+
+
+def result_cache_key(text: str, model: str, prompt_version: str) -> str:
+    """Content address of an analysis: hash of the model, prompt and text.
+
+    Args:
+        text: Normalized text, as returned by ``AnalyzeBody.validate_text``
+        model: Model that produces the analysis
+        prompt_version: Version of the analysis prompt and schema
+    """
+    digest = hashlib.sha256()
+    for part in (model, prompt_version, text):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class FirestoreResultStore:
+    """Persistent result cache tier stored in a Firestore collection."""
+
+    def __init__(self, db: AsyncClient, collection: str, ttl: float) -> None:
+        self.db = db
+        self.collection = collection
+        self.ttl = ttl
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        """Return the stored result of a key unless it has expired."""
+        snapshot = await self.db.collection(self.collection).document(key).get()
+        if not snapshot.exists:
+            return None
+        data = snapshot.to_dict()
+        if data.get("expires_at", 0) <= time.time():
+            return None
+        return data.get("result")
+
+    async def set(self, key: str, result: dict[str, Any]) -> None:
+        """Store a result that expires after ``ttl`` seconds."""
+        await (
+            self.db.collection(self.collection)
+            .document(key)
+            .set({"result": result, "expires_at": time.time() + self.ttl})
+        )
+
+
+class ResultCache:
+    """Content-addressed cache of analysis results.
+
+    Lookups check an in-memory LRU first and then the optional persistent
+    tier. ``get_or_compute`` also coalesces concurrent misses for the same
+    key into one upstream call.
+    """
+
+    def __init__(
+        self, max_size: int, ttl: float, persistent: FirestoreResultStore | None = None
+    ) -> None:
+        self.memory: TTLCache[dict[str, Any]] = TTLCache(max_size=max_size, ttl=ttl)
+        self.persistent = persistent
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        """Return a cached result, or None on a miss."""
+        result = self.memory.get(key)
+        if result is not None or self.persistent is None:
+            return result
+        try:
+            result = await self.persistent.get(key)
+        except Exception as e:
+            logging.warning("Result cache read failed: %s", e)
+            return None
+        if result is not None:
+            self.memory.set(key, result)
+        return result
+
+    async def set(self, key: str, result: dict[str, Any]) -> None:
+        """Store a result in every tier."""
+        self.memory.set(key, result)
+        if self.persistent is not None:
+            try:
+                await self.persistent.set(key, result)
+            except Exception as e:
+                logging.warning("Result cache write failed: %s", e)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[dict[str, Any]]],
+        cacheable: Callable[[dict[str, Any]], bool] = lambda result: True,
+    ) -> tuple[dict[str, Any], bool]:
+        """Return the cached result or compute it once for all waiters.
+
+        Args:
+            key: Cache key from ``result_cache_key``
+            compute: Coroutine factory producing the result on a miss
+            cacheable: Whether a computed result may be stored
+
+        Returns:
+            The result and whether it came from the cache (or another
+            in-flight computation)
+        """
+        while True:
+            result = await self.get(key)
+            if result is not None:
+                return result, True
+            future = self._in_flight.get(key)
+            if future is None:
+                break
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leading call was cancelled; try again ourselves
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; mark it retrieved for the leader
+            future.exception()
+            raise
+        else:
+            # Fill the memory tier before releasing the in-flight slot so
+            # no caller can miss both
+            is_cacheable = cacheable(result)
+            if is_cacheable:
+                self.memory.set(key, result)
+            future.set_result(result)
+        finally:
+            self._in_flight.pop(key, None)
+
+        if is_cacheable:
+            await self.set(key, result)
+        return result, False
+
+
+def get_result_cache(db: AsyncClient) -> ResultCache:
+    """Get the process-wide result cache singleton.
+
+    Args:
+        db: Firestore client for the persistent tier, if it is enabled
+    """
+    global _result_cache
+    if _result_cache is None:
+        persistent = None
+        if settings.RESULT_CACHE_PERSISTENT:
+            persistent = FirestoreResultStore(
+                db,
+                collection=settings.RESULT_CACHE_COLLECTION,
+                ttl=settings.RESULT_CACHE_TTL_SECONDS,
+            )
+        _result_cache = ResultCache(
+            max_size=settings.RESULT_CACHE_MAX_SIZE,
+            ttl=settings.RESULT_CACHE_TTL_SECONDS,
+            persistent=persistent,
+        )
+    return _result_cache
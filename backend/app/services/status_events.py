@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+from typing import Any
+
+import orjson
+from google.cloud.firestore_v1 import AsyncClient
+
+from app.config import Settings
+from app.models.user import RequestStatus
+from app.utils.metrics import span
+
+settings = Settings()
+_status_broker = None
+
+TERMINAL_STATUSES = frozenset(
+    {RequestStatus.completed.value, RequestStatus.failed.value}
+)
+EVENT_FIELDS = (
+    "user_id",
+    "status",
+    "result",
+    "result_source",
+    "partial_result",
+    "error_message",
+    "updated_at",
+    "completed_at",
+)
+
+
+def status_event(document_id: str, data: dict[str, Any]) -> dict[str, Any]:
+    """Build a status event from analysis request fields."""
+    event = {field: data.get(field) for field in EVENT_FIELDS if field in data}
+    event["document_id"] = document_id
+    return event
+
+
+def format_sse(event: dict[str, Any], event_name: str = "status") -> bytes:
+    """Encode a status event as a Server-Sent Events message."""
+    public = {key: value for key, value in event.items() if key != "user_id"}
+    return (
+        b"event: " + event_name.encode() + b"\ndata: " + orjson.dumps(public) + b"\n\n"
+    )
+
+
+class _Topic:
+    """Subscribers and latest known state of one analysis request."""
+
+    def __init__(self) -> None:
+        self.subscribers: set[asyncio.Queue] = set()
+        self.latest: dict[str, Any] | None = None
+        self.idle_since = time.monotonic()
+
+
+class Subscription:
+    """A subscriber's view of status events for one analysis request."""
+
+    def __init__(
+        self, broker: "StatusBroker", document_id: str, queue: asyncio.Queue
+    ) -> None:
+        self.broker = broker
+        self.document_id = document_id
+        self.queue = queue
+
+    async def get(self, timeout: float | None = None) -> dict[str, Any] | None:
+        """Wait for the next event, or return None after ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except TimeoutError:
+            return None
+
+    def close(self) -> None:
+        """Stop receiving events."""
+        self.broker._unsubscribe(self.document_id, self.queue)
+
+
+class StatusBroker:
+    """In-process pub/sub of analysis status changes.
+
+    ``request_text_analyze`` publishes every status write, so watchers in
+    the same process are notified immediately. When jobs run in a separate
+    worker process, one refresher task reads every watched, unfinished
+    document every ``poll_interval`` seconds with a single ``get_all``, on
+    behalf of all their watchers. That costs one round trip per interval
+    and one document read per watched request per interval, however many
+    watchers each request has.
+    """
+
+    def __init__(
+        self, poll_interval: float, idle_timeout: float, queue_size: int = 16
+    ) -> None:
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.queue_size = queue_size
+        self._topics: dict[str, _Topic] = {}
+        self._refresher: asyncio.Task | None = None
+
+    def latest(self, document_id: str) -> dict[str, Any] | None:
+        """Latest known event for a document, if it is being watched."""
+        topic = self._topics.get(document_id)
+        return topic.latest if topic else None
+
+    def publish(self, document_id: str, event: dict[str, Any]) -> None:
+        """Deliver an event to every subscriber of the document."""
+        topic = self._topics.get(document_id)
+        if topic is None:
+            return
+        if topic.latest is not None:
+            # Partial publishers may omit fields such as user_id
+            event = {**topic.latest, **event}
+        topic.latest = event
+        for queue in topic.subscribers:
+            if queue.full():
+                # Slow consumer: drop its oldest event rather than block
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def subscribe(
+        self, document_id: str, db: AsyncClient, user_id: str | None = None
+    ) -> Subscription | None:
+        """Watch an analysis request.
+
+        The subscription starts with the current state of the document.
+
+        Args:
+            document_id: Analysis request document ID
+            db: Firestore client used to read the document
+            user_id: If given, only the owner of the document may subscribe
+
+        Returns:
+            The subscription, or None if the document does not exist or
+            belongs to another user
+        """
+        topic = self._topics.get(document_id)
+        if topic is None:
+            topic = self._topics[document_id] = _Topic()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        topic.subscribers.add(queue)
+
+        if topic.latest is None or "user_id" not in topic.latest:
+            with span("firestore_read"):
+                snapshot = (
+                    await db.collection("analyze_request").document(document_id).get()
+                )
+            if not snapshot.exists:
+                self._unsubscribe(document_id, queue)
+                return None
+            # Events published during the read are newer but may lack the owner
+            topic.latest = {
+                **status_event(document_id, snapshot.to_dict()),
+                **(topic.latest or {}),
+            }
+        if user_id is not None and topic.latest.get("user_id") != user_id:
+            self._unsubscribe(document_id, queue)
+            return None
+        queue.put_nowait(topic.latest)
+
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh(db))
+        return Subscription(self, document_id, queue)
+
+    def _unsubscribe(self, document_id: str, queue: asyncio.Queue) -> None:
+        topic = self._topics.get(document_id)
+        if topic is None:
+            return
+        topic.subscribers.discard(queue)
+        if not topic.subscribers:
+            topic.idle_since = time.monotonic()
+            if self._refresher is None or self._refresher.done():
+                del self._topics[document_id]
+
+    def _watched(self) -> list[str]:
+        """Documents to refresh, dropping topics idle for ``idle_timeout``."""
+        now = time.monotonic()
+        watched = []
+        for document_id, topic in list(self._topics.items()):
+            if not topic.subscribers:
+                # Linger briefly so reconnecting long-pollers reuse the state
+                if now - topic.idle_since >= self.idle_timeout:
+                    del self._topics[document_id]
+                continue
+            if topic.latest and topic.latest.get("status") in TERMINAL_STATUSES:
+                continue
+            watched.append(document_id)
+        return watched
+
+    async def _refresh(self, db: AsyncClient) -> None:
+        collection = db.collection("analyze_request")
+        while self._topics:
+            await asyncio.sleep(self.poll_interval)
+            watched = self._watched()
+            if not watched:
+                continue
+            try:
+                with span("firestore_read"):
+                    snapshots = [
+                        snapshot
+                        async for snapshot in db.get_all(
+                            [
+                                collection.document(document_id)
+                                for document_id in watched
+                            ]
+                        )
+                    ]
+            except Exception as e:
+                logging.warning(
+                    "Failed to refresh status of %s requests: %s", len(watched), e
+                )
+                continue
+            for snapshot in snapshots:
+                topic = self._topics.get(snapshot.id)
+                if not snapshot.exists or topic is None:
+                    continue
+                event = status_event(snapshot.id, snapshot.to_dict())
+                latest = topic.latest or {}
+                if (event.get("status"), event.get("updated_at")) != (
+                    latest.get("status"),
+                    latest.get("updated_at"),
+                ):
+                    self.publish(snapshot.id, event)
+
+
+async def stream_status_events(
+    subscription: Subscription, heartbeat_interval: float
+) -> AsyncIterator[bytes]:
+    """Yield SSE messages for a subscription until the request finishes.
+
+    A comment line is sent after ``heartbeat_interval`` idle seconds so
+    proxies keep the connection open.
+    """
+    try:
+        while True:
+            event = await subscription.get(timeout=heartbeat_interval)
+            if event is None:
+                yield b": keep-alive\n\n"
+                continue
+            yield format_sse(event)
+            if event.get("status") in TERMINAL_STATUSES:
+                return
+    finally:
+        subscription.close()
+
+
+def get_status_broker() -> StatusBroker:
+    """Get the process-wide status broker singleton."""
+    global _status_broker
+    if _status_broker is None:
+        _status_broker = StatusBroker(
+            poll_interval=settings.STATUS_EVENTS_POLL_INTERVAL_SECONDS,
+            idle_timeout=settings.STATUS_EVENTS_IDLE_SECONDS,
+        )
+    return _status_broker
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from google.cloud.firestore_v1 import AsyncClient
+
+from app.config import Settings
+from app.services.analysis_stats import change_deltas, stats_writes
+from app.services.list_cache import get_list_cache
+from app.utils.firestore import FIRESTORE_BATCH_LIMIT
+from app.utils.metrics import STATUS_WRITER_BATCH_SIZE, STATUS_WRITER_FLUSH_DURATION
+
+settings = Settings()
+_status_writer = None
+
+
+class _PendingWrite:
+    """Fields waiting to be written to one document, and who waits on them."""
+
+    def __init__(self) -> None:
+        self.fields: dict[str, Any] = {}
+        self.waiters: list[asyncio.Future] = []
+        self.user_id: str | None = None
+
+    @property
+    def counted(self) -> bool:
+        """Whether the write can change its user's counters."""
+        return self.user_id is not None and "status" in self.fields
+
+
+class StatusWriter:
+    """Write-behind buffer for analysis request status updates.
+
+    Updates from concurrent jobs are merged per document and committed
+    together in Firestore batches every ``flush_interval`` seconds.
+    Non-durable writes return immediately; durable writes wait until the
+    batch holding them has been committed and raise if the commit failed.
+    Status writes that name the request's user also update the user's
+    counters in ``analysis_stats`` within the same batch, after reading the
+    statuses they replace. ``on_commit`` is called
+    with the IDs of every committed batch.
+    """
+
+    def __init__(
+        self,
+        db: AsyncClient,
+        collection: str,
+        flush_interval: float,
+        on_commit: Callable[[Iterable[str]], None] | None = None,
+    ) -> None:
+        self.db = db
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.on_commit = on_commit
+        self._pending: dict[str, _PendingWrite] = {}
+        self._wake = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+        self._flushing: asyncio.Future | None = None
+        self.batches_committed = 0
+        self.writes_committed = 0
+        self.writes_failed = 0
+        self.last_batch_size = 0
+        self.last_flush_seconds = 0.0
+        self.flush_seconds_total = 0.0
+
+    async def write(
+        self,
+        document_id: str,
+        fields: dict[str, Any],
+        durable: bool = False,
+        user_id: str | None = None,
+    ) -> None:
+        """Queue fields to be merged into a document.
+
+        Args:
+            document_id: Document in the writer's collection
+            fields: Top-level fields to set; later writes win
+            durable: Wait until the fields are committed
+            user_id: Owner of the document, whose counters a status change updates
+        """
+        entry = self._pending.get(document_id)
+        if entry is None:
+            entry = self._pending[document_id] = _PendingWrite()
+        entry.fields.update(fields)
+        if user_id is not None:
+            entry.user_id = user_id
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_periodically())
+        self._wake.set()
+
+        if durable:
+            future = asyncio.get_running_loop().create_future()
+            entry.waiters.append(future)
+            await future
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await self._wake.wait()
+            # Let concurrent jobs add their updates to this batch
+            await asyncio.sleep(self.flush_interval)
+            self._wake.clear()
+            # Shielded so shutting down never abandons a batch mid-commit
+            self._flushing = asyncio.ensure_future(self.flush())
+            await asyncio.shield(self._flushing)
+
+    async def flush(self) -> None:
+        """Commit everything written so far."""
+        pending, self._pending = self._pending, {}
+        chunk: list[tuple[str, _PendingWrite]] = []
+        users: set[str] = set()
+        for item in pending.items():
+            entry = item[1]
+            # Each user with counter changes adds one shard write to the batch
+            size = len(chunk) + len(users) + 1
+            if entry.counted and entry.user_id not in users:
+                size += 1
+            if size > FIRESTORE_BATCH_LIMIT:
+                await self._commit(chunk)
+                chunk, users = [], set()
+            chunk.append(item)
+            if entry.counted:
+                users.add(entry.user_id)
+        if chunk:
+            await self._commit(chunk)
+
+    async def _commit(self, items: list[tuple[str, _PendingWrite]]) -> None:
+        collection = self.db.collection(self.collection)
+        batch = self.db.batch()
+        for document_id, entry in items:
+            # Merging only the written fields replaces them wholesale
+            batch.set(
+                collection.document(document_id), entry.fields, merge=list(entry.fields)
+            )
+
+        started = time.perf_counter()
+        try:
+            deltas = await change_deltas(
+                self.db,
+                [
+                    (collection.document(document_id), entry.user_id, entry.fields)
+                    for document_id, entry in items
+                    if entry.counted
+                ],
+            )
+            for shard_ref, fields in stats_writes(self.db, deltas):
+                batch.set(shard_ref, fields, merge=True)
+            await batch.commit()
+        except Exception as e:
+            self.writes_failed += len(items)
+            logging.error("Failed to commit %s status updates: %s", len(items), e)
+            for _, entry in items:
+                for waiter in entry.waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+            return
+
+        elapsed = time.perf_counter() - started
+        self.batches_committed += 1
+        self.writes_committed += len(items)
+        self.last_batch_size = len(items)
+        self.last_flush_seconds = elapsed
+        self.flush_seconds_total += elapsed
+        STATUS_WRITER_BATCH_SIZE.observe(len(items))
+        STATUS_WRITER_FLUSH_DURATION.observe(elapsed)
+        if self.on_commit is not None:
+            self.on_commit([document_id for document_id, _ in items])
+        for _, entry in items:
+            for waiter in entry.waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    def stats(self) -> dict[str, Any]:
+        """Batch size and flush latency counters."""
+        return {
+            "pending_writes": len(self._pending),
+            "batches_committed": self.batches_committed,
+            "writes_committed": self.writes_committed,
+            "writes_failed": self.writes_failed,
+            "last_batch_size": self.last_batch_size,
+            "average_batch_size": self.writes_committed / self.batches_committed
+            if self.batches_committed
+            else 0.0,
+            "last_flush_seconds": self.last_flush_seconds,
+            "flush_seconds_total": self.flush_seconds_total,
+        }
+
+    async def close(self) -> None:
+        """Stop the background flusher and commit what is left."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._flushing is not None:
+            await self._flushing
+        await self.flush()
+
+
+def get_status_writer(db: AsyncClient) -> StatusWriter:
+    """Get the process-wide status writer singleton."""
+    global _status_writer
+    if _status_writer is None:
+        _status_writer = StatusWriter(
+            db,
+            collection="analyze_request",
+            flush_interval=settings.STATUS_WRITER_FLUSH_INTERVAL_SECONDS,
+            # Cached list pages must not outlive the status they show
+            on_commit=get_list_cache().invalidate_documents,
+        )
+    return _status_writer
+
+
+async def close_status_writer() -> None:
+    """Flush and drop the status writer, if one was created."""
+    global _status_writer
+    if _status_writer is not None:
+        await _status_writer.close()
+        _status_writer = None
@@ -0,0 +1,103 @@
+import time
+from enum import Enum
+
+from app.utils.metrics import CIRCUIT_BREAKER_REJECTED, CIRCUIT_BREAKER_STATE
+
+
+class CircuitState(Enum):
+    """State of a circuit, valued as exported by the state gauge."""
+
+    closed = 0
+    half_open = 1
+    open = 2
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is considered unhealthy."""
+
+    def __init__(self, name: str, retry_after: float) -> None:
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Stop calling an upstream after repeated failures.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail fast with ``CircuitOpenError`` for ``recovery_timeout``
+    seconds. It then lets ``half_open_calls`` trial calls through: a
+    success closes the circuit, a failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        recovery_timeout: float,
+        half_open_calls: int = 1,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_calls = half_open_calls
+        self._state = CircuitState.closed
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self._state_gauge = CIRCUIT_BREAKER_STATE.labels(name)
+        self._rejected = CIRCUIT_BREAKER_REJECTED.labels(name)
+        self._state_gauge.set(self._state.value)
+
+    @property
+    def state(self) -> CircuitState:
+        """Current state, half-open once an open circuit has waited long enough."""
+        if (
+            self._state is CircuitState.open
+            and time.monotonic() - self._opened_at >= self.recovery_timeout
+        ):
+            self._set_state(CircuitState.half_open)
+            self._trial_calls = 0
+        return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets calls through again."""
+        if self.state is not CircuitState.open:
+            return 0.0
+        return max(self.recovery_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def _set_state(self, state: CircuitState) -> None:
+        self._state = state
+        self._state_gauge.set(state.value)
+
+    def before_call(self) -> None:
+        """Reserve a call, or raise ``CircuitOpenError`` if none may be made."""
+        state = self.state
+        if state is CircuitState.closed:
+            return
+        if state is CircuitState.half_open and self._trial_calls < self.half_open_calls:
+            self._trial_calls += 1
+            return
+        self._rejected.inc()
+        raise CircuitOpenError(self.name, self.retry_after() or self.recovery_timeout)
+
+    def release(self) -> None:
+        """Give back a reserved call that says nothing about upstream health."""
+        if self._state is CircuitState.half_open and self._trial_calls > 0:
+            self._trial_calls -= 1
+
+    def record_success(self) -> None:
+        """Close the circuit after a call that reached a healthy upstream."""
+        self._failures = 0
+        if self._state is not CircuitState.closed:
+            self._set_state(CircuitState.closed)
+
+    def record_failure(self) -> None:
+        """Count a failed call, opening the circuit once there are too many."""
+        self._failures += 1
+        if (
+            self._state is CircuitState.half_open
+            or self._failures >= self.failure_threshold
+        ):
+            self._opened_at = time.monotonic()
+            self._set_state(CircuitState.open)
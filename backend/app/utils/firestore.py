@@ -0,0 +1,22 @@
+from typing import Any
+
+from google.cloud.firestore_v1 import AsyncClient
+
+# Firestore accepts at most 500 writes per batch
+FIRESTORE_BATCH_LIMIT = 500
+
+
+async def commit_in_batches(
+    db: AsyncClient, writes: list[tuple[Any, dict[str, Any]]]
+) -> None:
+    """Merge many documents with as few batched commits as possible.
+
+    Args:
+        db: Firestore client
+        writes: ``(document reference, fields)`` pairs
+    """
+    for start in range(0, len(writes), FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        for doc_ref, data in writes[start : start + FIRESTORE_BATCH_LIMIT]:
+            batch.set(doc_ref, data, merge=True)
+        await batch.commit()
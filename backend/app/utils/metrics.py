@@ -0,0 +1,210 @@
+import functools
+import time
+from types import TracebackType
+
+from openai.types import CompletionUsage
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+# Request, stage and model latencies, from a millisecond to a minute
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+# Jobs can wait in the queue for much longer than a request takes
+QUEUE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500)
+
+UNMATCHED_ROUTE = "unmatched"
+
+HTTP_REQUEST_DURATION = Histogram(
+    "kai_http_request_duration_seconds",
+    "HTTP request latency by route template and status code",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_DURATION = Histogram(
+    "kai_stage_duration_seconds",
+    "Time spent in one stage of handling a request or job",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+JOB_QUEUE_DEPTH = Gauge(
+    "kai_job_queue_depth", "Jobs waiting or running in the job queue"
+)
+JOB_PENDING = Histogram(
+    "kai_job_pending_seconds",
+    "Time from enqueueing a job to its first claim",
+    ["type"],
+    buckets=QUEUE_BUCKETS,
+)
+JOB_DURATION = Histogram(
+    "kai_job_duration_seconds",
+    "Job handler run time by outcome (acked, retried, deferred or failed)",
+    ["type", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+MODEL_CALL_DURATION = Histogram(
+    "kai_model_call_duration_seconds",
+    "Model API call latency by model and outcome",
+    ["model", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+MODEL_TIME_TO_FIRST_TOKEN = Histogram(
+    "kai_model_time_to_first_token_seconds",
+    "Time from sending a streaming model call to its first content token",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+MODEL_TOKENS = Counter(
+    "kai_model_tokens_total",
+    "Tokens used by model calls",
+    ["model", "kind"],
+)
+MODEL_ROUTES = Counter(
+    "kai_model_routes_total",
+    "Analyses routed to each model, by routing rule",
+    ["model", "reason"],
+)
+BULK_BATCHES = Counter(
+    "kai_bulk_batches_total",
+    "Bulk analysis batch jobs submitted and finished, by status",
+    ["status"],
+)
+BULK_ITEMS = Counter(
+    "kai_bulk_items_total",
+    "Bulk analyses by outcome (submitted, completed, failed or requeued)",
+    ["outcome"],
+)
+MODEL_CALL_RETRIES = Counter(
+    "kai_model_call_retries_total",
+    "Model API calls retried after a transient error, by reason",
+    ["model", "reason"],
+)
+CIRCUIT_BREAKER_STATE = Gauge(
+    "kai_circuit_breaker_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["name"],
+)
+CIRCUIT_BREAKER_REJECTED = Counter(
+    "kai_circuit_breaker_rejected_total",
+    "Calls shed because the circuit breaker was open",
+    ["name"],
+)
+MODEL_CALLS_WAITING = Gauge(
+    "kai_model_calls_waiting", "Model calls waiting for a limiter slot"
+)
+MODEL_CALLS_IN_FLIGHT = Gauge(
+    "kai_model_calls_in_flight", "Model calls holding a limiter slot"
+)
+
+STATUS_WRITER_BATCH_SIZE = Histogram(
+    "kai_status_writer_batch_size",
+    "Status updates committed per Firestore batch",
+    buckets=BATCH_SIZE_BUCKETS,
+)
+STATUS_WRITER_FLUSH_DURATION = Histogram(
+    "kai_status_writer_flush_seconds",
+    "Time to commit one batch of status updates",
+    buckets=LATENCY_BUCKETS,
+)
+ADMISSION_REJECTED = Counter(
+    "kai_admission_rejected_total",
+    "Analysis submissions rejected by the rate limiter",
+)
+LIST_CACHE_LOOKUPS = Counter(
+    "kai_list_cache_lookups_total",
+    "Analysis list cache lookups by result (hit or miss)",
+    ["result"],
+)
+IDEMPOTENT_REQUESTS = Counter(
+    "kai_idempotent_requests_total",
+    "Submissions with an Idempotency-Key by outcome (new, replayed, waited, reused or in_progress)",
+    ["outcome"],
+)
+EXPORTED_DOCUMENTS = Counter(
+    "kai_exported_documents_total",
+    "Analysis requests streamed by history exports, by format",
+    ["format"],
+)
+TOKEN_CACHE_SIZE = Gauge(
+    "kai_token_cache_entries", "Decoded tokens in the verification cache"
+)
+
+
+@functools.cache
+def _stage_histogram(stage: str) -> Histogram:
+    # Resolving the labelled child once keeps each span to a perf_counter
+    # pair and one observe call
+    return STAGE_DURATION.labels(stage)
+
+
+class span:  # noqa: N801
+    """Time a block of code as one stage of a request or job.
+
+    Usage::
+
+        with span("firestore_query"):
+            docs = await query.get()
+    """
+
+    __slots__ = ("_histogram", "_started")
+
+    def __init__(self, stage: str) -> None:
+        self._histogram = _stage_histogram(stage)
+
+    def __enter__(self) -> "span":
+        """Start timing."""
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        """Record the time since ``__enter__``."""
+        self._histogram.observe(time.perf_counter() - self._started)
+
+
+def observe_request(
+    method: str, route: str | None, status: int, duration: float
+) -> None:
+    """Record one HTTP request under its route template."""
+    HTTP_REQUEST_DURATION.labels(method, route or UNMATCHED_ROUTE, str(status)).observe(
+        duration
+    )
+
+
+def observe_model_usage(model: str, usage: CompletionUsage | None) -> None:
+    """Count the prompt and completion tokens of a model response."""
+    if usage is None:
+        return
+    MODEL_TOKENS.labels(model, "prompt").inc(usage.prompt_tokens or 0)
+    MODEL_TOKENS.labels(model, "completion").inc(usage.completion_tokens or 0)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Render the current metrics and their Prometheus content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,34 @@
+import base64
+import binascii
+
+import orjson
+
+
+def encode_cursor(created_at: str, document_id: str) -> str:
+    """Encode the sort key of the last returned document as an opaque cursor.
+
+    Args:
+        created_at: ``created_at`` value of the last document on the page
+        document_id: ID of the last document, used as a tie-breaker
+
+    Returns:
+        URL-safe cursor string
+    """
+    raw = orjson.dumps([created_at, document_id])
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Decode a cursor produced by ``encode_cursor``.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, document_id = orjson.loads(raw)
+    except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid pagination cursor")
+    if not isinstance(created_at, str) or not isinstance(document_id, str):
+        raise ValueError("Invalid pagination cursor")
+    return created_at, document_id
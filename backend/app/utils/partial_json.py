@@ -0,0 +1,71 @@
+import re
+from typing import Any
+
+import orjson
+
+# An escape sequence cut off at the end of a string
+_TRUNCATED_ESCAPE = re.compile(r"\\(u[0-9a-fA-F]{0,3})?$")
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _scan(text: str) -> tuple[list[str], bool, list[tuple[int, list[str]]]]:
+    """Open containers, whether a string is open, and the commas a value ends at."""
+    stack: list[str] = []
+    in_string = False
+    escaped = False
+    commas: list[tuple[int, list[str]]] = []
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(char)
+        elif char in "}]":
+            if stack:
+                stack.pop()
+        elif char == ",":
+            commas.append((index, stack[:]))
+    return stack, in_string, commas
+
+
+def _close(text: str, stack: list[str], in_string: bool) -> Any | None:
+    if in_string:
+        text = _TRUNCATED_ESCAPE.sub("", text) + '"'
+    text += "".join(_CLOSERS[opener] for opener in reversed(stack))
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return None
+
+
+def parse_partial_json(text: str) -> Any | None:
+    """Parse the prefix of a JSON document that is still being generated.
+
+    Open strings, arrays and objects are closed; a trailing key, number or
+    literal that cannot be completed is dropped back to the last value
+    that ended with a comma. Returns None if nothing usable is there yet.
+
+    >>> parse_partial_json('{"summary": "The quick br')
+    {'summary': 'The quick br'}
+    >>> parse_partial_json('{"summary": "Done", "keywords": ["a", "b')
+    {'summary': 'Done', 'keywords': ['a', 'b']}
+    """
+    text = text.strip()
+    if not text:
+        return None
+    stack, in_string, commas = _scan(text)
+    parsed = _close(text, stack, in_string)
+    if parsed is not None:
+        return parsed
+    for index, stack_at_comma in reversed(commas):
+        parsed = _close(text[:index], stack_at_comma, False)
+        if parsed is not None:
+            return parsed
+    # Nothing complete after the first opener yet
+    return _close(text[:1], stack[:1], False) if stack else None
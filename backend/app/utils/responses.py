@@ -1,72 +1,111 @@
+import hashlib
+import math
+from datetime import date, datetime
+from enum import Enum
 from typing import Any
 
+import orjson
 from fastapi import HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
 
-from app.models.response import ErrorResponse, SuccessResponse
+from app.utils.metrics import span
+
+
+def _json_default(value: Any) -> Any:
+    """Serialize types orjson does not handle natively."""
+    if isinstance(value, datetime | date):
+        # Firestore returns datetime subclasses, which orjson rejects
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, set | frozenset | tuple):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def json_bytes(content: Any) -> bytes:
+    """Serialize API data to JSON with orjson, like every JSON response."""
+    return orjson.dumps(content, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered straight to bytes with orjson.
+
+    Used as the application's default response class and by the envelope
+    helpers below, which build plain dicts in the ``SuccessResponse`` and
+    ``ErrorResponse`` shapes instead of round-tripping through Pydantic.
+    """
+
+    def render(self, content: Any) -> bytes:
+        """Serialize the content with orjson."""
+        with span("response_render"):
+            return json_bytes(content)
 
 
 def success_response(
     data: Any = None,
     message: str = "Operation completed successfully",
-    status_code: int = status.HTTP_200_OK
+    status_code: int = status.HTTP_200_OK,
 ) -> JSONResponse:
     """Create a standardized success response.
-    
+
     Args:
         data: Response data payload
         message: Success message
         status_code: HTTP status code
-        
+
     Returns:
         JSONResponse with success structure
     """
-    response = SuccessResponse(
-        data=data,
-        message=message,
-        status_code=status_code
-    )
-    return JSONResponse(
-        content=response.dict(),
-        status_code=status_code
+    return FastJSONResponse(
+        content={
+            "status_code": status_code,
+            "data": data,
+            "message": message,
+            "success": True,
+        },
+        status_code=status_code,
     )
 
 
 def error_response(
     message: str = "An error occurred",
-    error: str = None,
-    status_code: int = status.HTTP_400_BAD_REQUEST
+    error: str | None = None,
+    status_code: int = status.HTTP_400_BAD_REQUEST,
 ) -> JSONResponse:
     """Create a standardized error response.
-    
+
     Args:
         message: Error message
         error: Detailed error information
         status_code: HTTP status code
-        
+
     Returns:
         JSONResponse with error structure
     """
-    response = ErrorResponse(
-        error=error or message,
-    )
-    response.message = message
-    response.status_code = status_code
-    return JSONResponse(
-        content=response.dict(),
-        status_code=status_code
+    return FastJSONResponse(
+        content={
+            "status_code": status_code,
+            "data": None,
+            "message": message,
+            "success": False,
+            "error": error or message,
+        },
+        status_code=status_code,
     )
 
 
 def validation_error_response(
-    message: str = "Validation failed",
-    error: str = None
+    message: str = "Validation failed", error: str | None = None
 ) -> JSONResponse:
     """Create a validation error response."""
     return error_response(
         message=message,
         error=error or message,
-        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+        status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
     )
 
 
@@ -75,34 +114,67 @@ def not_found_response(resource: str = "Resource") -> JSONResponse:
     return error_response(
         message=f"{resource} not found",
         error=f"{resource} not found",
-        status_code=status.HTTP_404_NOT_FOUND
+        status_code=status.HTTP_404_NOT_FOUND,
     )
 
 
 def unauthorized_response(message: str = "Unauthorized access") -> JSONResponse:
     """Create an unauthorized error response."""
     return error_response(
-        message=message,
-        error=message,
-        status_code=status.HTTP_401_UNAUTHORIZED
+        message=message, error=message, status_code=status.HTTP_401_UNAUTHORIZED
     )
 
 
 def forbidden_response(message: str = "Access forbidden") -> JSONResponse:
     """Create a forbidden error response."""
     return error_response(
-        message=message,
-        error=message,
-        status_code=status.HTTP_403_FORBIDDEN
+        message=message, error=message, status_code=status.HTTP_403_FORBIDDEN
+    )
+
+
+def too_many_requests_response(
+    retry_after: float, message: str = "Too many requests, please retry later"
+) -> JSONResponse:
+    """Create a rate limit error response with a ``Retry-After`` header."""
+    response = error_response(
+        message=message, error=message, status_code=status.HTTP_429_TOO_MANY_REQUESTS
+    )
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def compute_etag(data: Any) -> str:
+    """Weak ETag of the JSON serialization of response data."""
+    body = orjson.dumps(data, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an ``If-None-Match`` header matches an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
     )
 
 
-def internal_server_error_response(message: str = "Internal server error") -> JSONResponse:
+def not_modified_response(etag: str) -> Response:
+    """Create an empty ``304 Not Modified`` response."""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def internal_server_error_response(
+    message: str = "Internal server error",
+) -> JSONResponse:
     """Create an internal server error response."""
     return error_response(
         message=message,
         error=message,
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
     )
 
 
@@ -111,30 +183,25 @@ def handle_exception(exception: Exception) -> JSONResponse:
 
     Args:
         exception: The exception to handle
- 
+
     Returns:
         JSONResponse with appropriate error structure
     """
     if isinstance(exception, HTTPException):
         return error_response(
-            message=exception.detail,
-            status_code=exception.status_code
+            message=exception.detail, status_code=exception.status_code
         )
-    
+
     # Handle specific exception types
     if isinstance(exception, ValueError):
         return validation_error_response(
-            message="Invalid input provided",
-            error=str(exception)
+            message="Invalid input provided", error=str(exception)
         )
-    
+
     if isinstance(exception, KeyError):
         return validation_error_response(
-            message="Required field missing",
-            error=f"Missing field: {str(exception)}"
+            message="Required field missing", error=f"Missing field: {exception!s}"
         )
-    
+
     # Default to internal server error
-    return internal_server_error_response(
-        message="An unexpected error occurred"
-    )
+    return internal_server_error_response(message="An unexpected error occurred")
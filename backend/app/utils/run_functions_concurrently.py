@@ -1,6 +1,8 @@
 import asyncio
+from collections.abc import Awaitable, Iterable
+from typing import Any
 
 
-async def run_functions_concurrently(coroutines):
+async def run_functions_concurrently(coroutines: Iterable[Awaitable[Any]]) -> list[Any]:
     """Run multiple async functions concurrently."""
     return await asyncio.gather(*coroutines)
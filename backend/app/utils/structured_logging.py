@@ -0,0 +1,163 @@
+import atexit
+import logging
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+import orjson
+
+from app.config import Settings
+
+ACCESS_LOGGER = "kai.access"
+TEXT_FORMAT = "%(levelname)s: [%(request_id)s] %(message)s"
+
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "request_id"}
+
+_listener: QueueListener | None = None
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the request ID of the request being handled."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Set ``request_id`` on the record; never drops it."""
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of records below WARNING; warnings and errors always pass."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Keep the record if it is a warning or falls in the sample."""
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        return random.random() < self.rate  # noqa: S311
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Render the record as a JSON line."""
+        entry: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hand records to the writer thread without formatting them.
+
+    The stock ``QueueHandler`` formats every record before enqueueing it,
+    which is the expensive part; here the message is only rendered by the
+    listener thread. Records are dropped, not waited on, when the queue is
+    full.
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Pass the record through unformatted."""
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Queue the record, or count it as dropped if the queue is full."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _parse_levels(levels: str) -> dict[str, str]:
+    """Parse ``"httpx=WARNING,kai.access=INFO"`` into logger levels."""
+    parsed = {}
+    for item in levels.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            parsed[name.strip()] = level.strip().upper()
+    return parsed
+
+
+def configure_logging(settings: Settings) -> None:
+    """Route all logging through a queue drained by a background thread.
+
+    The event loop only creates records and puts them on a bounded queue;
+    formatting and writing to stdout happen on the listener thread. Uses
+    ``LOG_LEVEL``, ``LOG_FORMAT`` (``text`` or ``json``), ``LOG_LEVELS``
+    (per-logger overrides such as ``httpx=WARNING``),
+    ``LOG_ACCESS_SAMPLE_RATE`` and ``LOG_QUEUE_SIZE``.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    # Send uvicorn's records through the same queue instead of its own
+    # synchronous stream handlers
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    access_logger = logging.getLogger(ACCESS_LOGGER)
+    for existing in access_logger.filters[:]:
+        if isinstance(existing, SamplingFilter):
+            access_logger.removeFilter(existing)
+    access_logger.addFilter(SamplingFilter(settings.LOG_ACCESS_SAMPLE_RATE))
+
+    for name, logger_level in _parse_levels(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -1,39 +1,135 @@
+import asyncio
+import hashlib
 import logging
-from typing import Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
 
 from firebase_admin import auth
+from firebase_admin._token_gen import ID_TOKEN_CERT_URI
 from firebase_admin.exceptions import FirebaseError
 
+from app.config import Settings
+from app.utils.metrics import TOKEN_CACHE_SIZE
+from app.utils.ttl_cache import TTLCache
 
-async def verify_firebase_token(token: str) -> Optional[dict[str, Any]]:
-    """Verify a Firebase ID token on the server side.
+settings = Settings()
 
-    Args:
-        token: The Firebase ID token to verify
-        
-    Returns:
-        Decoded token payload if valid, None if invalid
+
+class TokenCache(TTLCache[dict[str, Any]]):
+    """Bounded LRU cache of decoded tokens keyed by token hash.
+
+    Entries expire after ``ttl`` seconds or at the token's own ``exp``
+    claim, whichever comes first, so a cached token is never accepted
+    after Firebase would have rejected it.
     """
+
+    @staticmethod
+    def key(token: str) -> str:
+        """Hash a raw token so it is never kept in memory as-is."""
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def set(self, key: str, decoded_token: dict[str, Any]) -> None:
+        """Cache a decoded token until its expiry or the cache TTL."""
+        exp = decoded_token.get("exp")
+        super().set(key, decoded_token, float(exp) if exp is not None else None)
+
+
+_token_cache = TokenCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_TTL_SECONDS
+)
+TOKEN_CACHE_SIZE.set_function(lambda: len(_token_cache))
+_verify_executor = ThreadPoolExecutor(
+    max_workers=settings.TOKEN_VERIFY_THREADS, thread_name_prefix="token-verify"
+)
+_in_flight: dict[str, asyncio.Future] = {}
+
+
+def get_token_cache() -> TokenCache:
+    """Get the process-wide token cache."""
+    return _token_cache
+
+
+def _verify_id_token(token: str) -> dict[str, Any] | None:
+    """Verify a token synchronously; runs in the verification thread pool."""
     try:
-        # This is the correct way to use verifyIdToken - on the backend
         decoded_token = auth.verify_id_token(token)
-        
-        logging.info("Token verified successfully", extra={
-            "user_id": decoded_token.get('uid'),
-            "email": decoded_token.get('email')
-        })
-        
+
+        logging.debug(
+            "Token verified successfully",
+            extra={
+                "user_id": decoded_token.get("uid"),
+                "email": decoded_token.get("email"),
+            },
+        )
+
         return decoded_token
-        
+
     except FirebaseError as e:
-        logging.error("Firebase token verification failed", extra={
-            "error_code": e.code,
-            "error_message": str(e)
-        })
+        logging.error(
+            "Firebase token verification failed",
+            extra={"error_code": e.code, "error_message": str(e)},
+        )
         return None
-        
+
     except Exception as e:
-        logging.error("Unexpected error during token verification", extra={
-            "error": str(e)
-        })
+        logging.error(
+            "Unexpected error during token verification", extra={"error": str(e)}
+        )
         return None
+
+
+async def verify_firebase_token(token: str) -> dict[str, Any] | None:
+    """Verify a Firebase ID token on the server side.
+
+    Verified tokens are served from an in-memory cache. Cache misses are
+    verified in a thread pool, and concurrent misses for the same token
+    share a single verification.
+
+    Args:
+        token: The Firebase ID token to verify
+
+    Returns:
+        Decoded token payload if valid, None if invalid
+    """
+    key = TokenCache.key(token)
+    decoded_token = _token_cache.get(key)
+    if decoded_token is not None:
+        return decoded_token
+
+    future = _in_flight.get(key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_verify_executor, _verify_id_token, token)
+    _in_flight[key] = future
+    try:
+        decoded_token = await asyncio.shield(future)
+    finally:
+        _in_flight.pop(key, None)
+
+    if decoded_token is not None:
+        _token_cache.set(key, decoded_token)
+    return decoded_token
+
+
+def _fetch_public_certs() -> None:
+    """Fetch Google's token signing certs into the Firebase HTTP cache."""
+    # The verifier's request object caches responses by their cache-control
+    # headers, so warming it here keeps cert fetches off the request path.
+    # firebase-admin has no public hook for it, which is why requirements.txt
+    # pins the version; test_token_verification checks the hook still works.
+    token_verifier = auth._get_client(None)._token_verifier
+    token_verifier.request(ID_TOKEN_CERT_URI)
+
+
+async def refresh_public_certs(interval: float) -> None:
+    """Prefetch the public certs now and refresh them every ``interval`` seconds."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(_verify_executor, _fetch_public_certs)
+            logging.debug("Refreshed Firebase public certificates")
+        except Exception as e:
+            logging.warning(f"Failed to refresh Firebase public certificates: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,53 @@
+import time
+from collections import OrderedDict
+from typing import Any, Generic, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """Bounded LRU cache whose entries expire after a time-to-live.
+
+    Not thread-safe; meant to be used from the event loop.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[Any, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of entries, including expired ones not yet evicted."""
+        return len(self._entries)
+
+    def get(self, key: Any) -> V | None:
+        """Return the cached value if present and not expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: V, expires_at: float | None = None) -> None:
+        """Cache a value until ``expires_at`` or the TTL, whichever is sooner."""
+        default_expiry = time.time() + self.ttl
+        expires_at = (
+            default_expiry if expires_at is None else min(expires_at, default_expiry)
+        )
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Any) -> V | None:
+        """Remove a key and return its value, expired or not."""
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        self._entries.clear()
@@ -0,0 +1,257 @@
+"""Background worker pool for queued analysis jobs.
+
+Run it with ``python -m app.worker`` (the ``kai-worker`` service in
+docker-compose). Any number of workers can share one queue.
+"""
+
+import asyncio
+import logging
+import random
+import signal
+import time
+from collections.abc import Awaitable, Callable
+
+from google.cloud.firestore_v1 import AsyncClient
+from prometheus_client import start_http_server
+
+from app.config import Settings
+from app.jobs import Job, JobDeferredError, JobQueue, get_job_queue
+from app.services.analyze_text import (
+    ANALYZE_TEXT_JOB,
+    request_text_analyze,
+    update_request_status,
+)
+from app.services.bulk_analysis import (
+    BULK_POLL_JOB,
+    BulkSubmitter,
+    poll_bulk_batch,
+    settle_bulk_items,
+    settled_fields,
+)
+from app.utils.metrics import JOB_DURATION, JOB_PENDING
+from app.utils.structured_logging import configure_logging
+
+JobHandler = Callable[[Job], Awaitable[None]]
+
+
+def build_job_handlers(db: AsyncClient, queue: JobQueue) -> dict[str, JobHandler]:
+    """Map job types to the coroutines that process them."""
+
+    async def analyze_text(job: Job) -> None:
+        await request_text_analyze(
+            job.payload["document_id"],
+            job.payload["text"],
+            db,
+            is_last_attempt=job.is_last_attempt,
+            refine=job.payload.get("refine", False),
+            tier=job.payload.get("tier"),
+            user_id=job.tenant or None,
+        )
+
+    async def bulk_poll(job: Job) -> None:
+        await poll_bulk_batch(db, queue, job)
+
+    return {ANALYZE_TEXT_JOB: analyze_text, BULK_POLL_JOB: bulk_poll}
+
+
+def build_dead_letter_handler(db: AsyncClient) -> JobHandler:
+    """Settle the requests of jobs dropped after their last lease expired.
+
+    The worker that held the lease died without running the job's failure
+    path, so it is run here: the request fails (or, when refined, keeps its
+    local result) instead of staying ``processing`` forever.
+    """
+
+    async def dead_letter(job: Job) -> None:
+        error_message = f"Analysis abandoned after {job.attempts} attempts"
+        if job.type == BULK_POLL_JOB:
+            await settle_bulk_items(
+                db, job.payload["batch_id"], job.payload["items"], error_message
+            )
+            return
+        await update_request_status(
+            db,
+            job.payload["document_id"],
+            {
+                **settled_fields(error_message, job.payload.get("refine", False)),
+                "partial_result": None,
+            },
+            durable=True,
+            user_id=job.tenant or None,
+        )
+
+    return dead_letter
+
+
+class Worker:
+    """Pull jobs from a queue and run them with bounded concurrency.
+
+    Each of the ``concurrency`` slots claims one job at a time, keeps its
+    lease alive while the handler runs, and then acks it or schedules a
+    retry with exponential backoff. A handler raising ``JobDeferredError``
+    gets its job rescheduled without using up an attempt. Only jobs with a
+    handler are claimed; bulk analyses are left to the ``BulkSubmitter``.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: dict[str, JobHandler],
+        concurrency: int,
+        visibility_timeout: float,
+        poll_interval: float,
+        retry_base_delay: float,
+        retry_max_delay: float,
+    ) -> None:
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._stopping = asyncio.Event()
+
+    @classmethod
+    def from_settings(
+        cls, settings: Settings, queue: JobQueue, handlers: dict[str, JobHandler]
+    ) -> "Worker":
+        """Create a worker configured from application settings."""
+        return cls(
+            queue=queue,
+            handlers=handlers,
+            concurrency=settings.WORKER_CONCURRENCY,
+            visibility_timeout=settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+            poll_interval=settings.WORKER_POLL_INTERVAL_SECONDS,
+            retry_base_delay=settings.JOB_RETRY_BASE_DELAY_SECONDS,
+            retry_max_delay=settings.JOB_RETRY_MAX_DELAY_SECONDS,
+        )
+
+    def stop(self) -> None:
+        """Stop claiming new jobs; running jobs finish first."""
+        self._stopping.set()
+
+    async def run(self) -> None:
+        """Run the worker slots until ``stop`` is called."""
+        logging.info("Worker started with concurrency %s", self.concurrency)
+        await asyncio.gather(*(self._slot() for _ in range(self.concurrency)))
+        logging.info("Worker stopped")
+
+    async def _slot(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = await self.queue.claim(
+                    self.visibility_timeout, self.handlers.keys()
+                )
+            except Exception as e:
+                logging.error("Failed to claim job: %s", e)
+                job = None
+            if job is None:
+                await self._wait(self.poll_interval)
+                continue
+            await self._process(job)
+
+    async def _wait(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except TimeoutError:
+            pass
+
+    async def _keep_lease(self, job: Job) -> None:
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            if not await self.queue.extend(job, self.visibility_timeout):
+                logging.warning("Lost lease on job %s", job.id)
+                return
+
+    def _retry_delay(self, attempts: int) -> float:
+        delay = self.retry_base_delay * 2 ** (attempts - 1)
+        return random.uniform(0, min(delay, self.retry_max_delay))  # noqa: S311
+
+    async def _process(self, job: Job) -> None:
+        handler = self.handlers.get(job.type)
+        if handler is None:
+            logging.error("No handler for job %s of type %s", job.id, job.type)
+            await self.queue.ack(job)
+            return
+
+        if job.attempts == 1:
+            JOB_PENDING.labels(job.type).observe(max(time.time() - job.created_at, 0.0))
+
+        lease_keeper = asyncio.create_task(self._keep_lease(job))
+        started = time.perf_counter()
+        outcome = "acked"
+        try:
+            await handler(job)
+        except JobDeferredError as e:
+            # Spread deferred jobs out so they do not all return at once
+            delay = e.delay * random.uniform(1.0, 1.5)  # noqa: S311
+            if await self.queue.defer(job, delay):
+                outcome = "deferred"
+                logging.info("Job %s deferred for %.1fs: %s", job.id, delay, e)
+        except Exception as e:
+            delay = self._retry_delay(job.attempts)
+            if await self.queue.retry(job, delay, str(e)):
+                outcome = "retried"
+                logging.warning(
+                    "Job %s failed on attempt %s, retrying in %.1fs: %s",
+                    job.id,
+                    job.attempts,
+                    delay,
+                    e,
+                )
+            else:
+                outcome = "failed"
+                logging.error(
+                    "Job %s failed after %s attempts: %s", job.id, job.attempts, e
+                )
+        else:
+            await self.queue.ack(job)
+        finally:
+            lease_keeper.cancel()
+            JOB_DURATION.labels(job.type, outcome).observe(
+                time.perf_counter() - started
+            )
+
+
+async def run_worker(settings: Settings | None = None) -> None:
+    """Run a standalone worker and bulk submitter until SIGINT or SIGTERM."""
+    from app.firebase import get_firestore_client
+    from app.services.openai_client import close_openai_client
+    from app.services.status_writer import close_status_writer
+
+    settings = settings or Settings()
+    if settings.WORKER_METRICS_PORT:
+        # The API's /metrics only covers the API process
+        start_http_server(settings.WORKER_METRICS_PORT)
+        logging.info("Worker metrics served on port %s", settings.WORKER_METRICS_PORT)
+    queue = get_job_queue()
+    db = get_firestore_client()
+    queue.dead_letter_handler = build_dead_letter_handler(db)
+    worker = Worker.from_settings(settings, queue, build_job_handlers(db, queue))
+    bulk_submitter = BulkSubmitter.from_settings(settings, db, queue)
+
+    def stop() -> None:
+        worker.stop()
+        bulk_submitter.stop()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop)
+
+    try:
+        await asyncio.gather(worker.run(), bulk_submitter.run())
+    finally:
+        await close_status_writer()
+        await queue.close()
+        await close_openai_client()
+
+
+def main() -> None:
+    """Entry point for the ``kai-worker`` process."""
+    configure_logging(Settings())
+    asyncio.run(run_worker())
+
+
+if __name__ == "__main__":
+    main()
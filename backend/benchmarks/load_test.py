@@ -0,0 +1,316 @@
+"""Load test of the real ASGI app against local Firestore and OpenAI stand-ins.
+
+Runs ``app.main.app`` in process (lifespan and embedded worker included)
+with ``FIRESTORE_BACKEND=memory``, ``OPENAI_BACKEND=fake`` and the memory
+job queue. Each endpoint is driven with ``--requests`` calls at
+``--concurrency`` and reported as throughput and p50/p95/p99 latency.
+Authentication goes through the real middleware; the local users' tokens
+are pre-seeded in the token cache with ``app.local.auth.seed_tokens``.
+
+Usage:
+    python -m benchmarks.load_test [--concurrency 32] [--requests 2000]
+        [--endpoints me,analyze,list] [--openai-latency 0.5]
+        [--firestore-latency 0.0]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+from google.cloud.firestore_v1 import AsyncClient
+
+if TYPE_CHECKING:
+    import httpx
+
+BASE_URL = "http://bench"
+ANALYZE_REQUEST_COLLECTION = "analyze_request"
+
+
+@dataclass
+class Scenario:
+    """One endpoint to drive: its method, and the path and body of request ``i``."""
+
+    name: str
+    method: str
+    path: Callable[[int], str]
+    body: Callable[[int], Any] | None = None
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """Select the local backends; must run before any ``app`` import."""
+    os.environ.update(
+        {
+            "FIRESTORE_BACKEND": "memory",
+            "MEMORY_FIRESTORE_LATENCY_SECONDS": str(args.firestore_latency),
+            "OPENAI_BACKEND": "fake",
+            "FAKE_OPENAI_LATENCY_SECONDS": str(args.openai_latency),
+            "FAKE_OPENAI_ERROR_RATE": str(args.openai_error_rate),
+            "JOB_QUEUE_BACKEND": "memory",
+            "JOB_QUEUE_MAX_DEPTH": str(max(args.requests * 100, 10000)),
+            "RUN_EMBEDDED_WORKER": "true",
+            "WORKER_CONCURRENCY": str(args.workers),
+            "WORKER_POLL_INTERVAL_SECONDS": "0.05",
+            "LOG_LEVEL": "WARNING",
+            "RATE_LIMIT_ENABLED": "false",
+        }
+    )
+
+
+async def seed_documents(
+    db: AsyncClient, users: int, per_user: int
+) -> dict[int, list[str]]:
+    """Create completed analysis requests for every benchmark user."""
+    from app.utils.firestore import commit_in_batches
+
+    collection = db.collection(ANALYZE_REQUEST_COLLECTION)
+    started = datetime.utcnow() - timedelta(days=1)
+    document_ids: dict[int, list[str]] = {}
+    writes = []
+    for user in range(users):
+        document_ids[user] = []
+        for index in range(per_user):
+            doc_ref = collection.document()
+            created_at = (started + timedelta(seconds=index)).isoformat()
+            text = f"Seeded text {index} for user {user}. It was a good day."
+            writes.append(
+                (
+                    doc_ref,
+                    {
+                        "user_id": f"bench-user-{user}",
+                        "text": text,
+                        "text_preview": text,
+                        "status": "completed",
+                        "result": {
+                            "summary": "Seeded",
+                            "sentiment": "positive",
+                            "keywords": ["seeded"],
+                        },
+                        "created_at": created_at,
+                        "updated_at": created_at,
+                        "completed_at": created_at,
+                    },
+                )
+            )
+            document_ids[user].append(doc_ref.id)
+    await commit_in_batches(db, writes)
+    return document_ids
+
+
+def build_scenarios(document_ids: dict[int, list[str]]) -> dict[str, Scenario]:
+    """Build the request scenarios over the seeded documents of each user."""
+    users = len(document_ids)
+    run_id = int(time.time())
+
+    def document_id(i: int) -> str:
+        ids = document_ids[i % users]
+        return ids[i % len(ids)]
+
+    return {
+        "health": Scenario("GET /health", "GET", lambda i: "/health"),
+        "me": Scenario("GET /v1/user/me", "GET", lambda i: "/v1/user/me"),
+        "analyze": Scenario(
+            "POST /v1/user/analyze",
+            "POST",
+            lambda i: "/v1/user/analyze",
+            lambda i: {
+                "text": f"Load test {run_id} text number {i}. The service works great."
+            },
+        ),
+        "batch": Scenario(
+            "POST /v1/user/analyze/batch",
+            "POST",
+            lambda i: "/v1/user/analyze/batch",
+            lambda i: {
+                "texts": [
+                    f"Batch {run_id}-{i} item {item}. Nothing much happened today."
+                    for item in range(10)
+                ]
+            },
+        ),
+        "list": Scenario(
+            "GET /v1/user/analyze", "GET", lambda i: "/v1/user/analyze?limit=20"
+        ),
+        "status": Scenario(
+            "GET /v1/user/analyze/{id}/status",
+            "GET",
+            lambda i: f"/v1/user/analyze/{document_id(i)}/status",
+        ),
+    }
+
+
+def percentile(latencies: list[float], q: int) -> float:
+    """Return the ``q``-th percentile of ``latencies``, nearest rank."""
+    if len(latencies) < 2:
+        return latencies[0] if latencies else 0.0
+    return statistics.quantiles(latencies, n=100, method="inclusive")[q - 1]
+
+
+async def run_scenario(
+    client: "httpx.AsyncClient",
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+    users: int,
+) -> dict[str, Any]:
+    """Send ``requests`` requests of a scenario, ``concurrency`` at a time."""
+    from app.local.auth import bench_token
+
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    next_request = 0
+
+    async def drive() -> None:
+        nonlocal next_request
+        while next_request < requests:
+            i = next_request
+            next_request += 1
+            user = i % users
+            body = scenario.body(i) if scenario.body else None
+            started = time.perf_counter()
+            response = await client.request(
+                scenario.method,
+                scenario.path(i),
+                json=body,
+                headers={"Authorization": f"Bearer {bench_token(user)}"},
+            )
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(drive() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "name": scenario.name,
+        "requests": requests,
+        "errors": sum(count for code, count in statuses.items() if code >= 400),
+        "rps": requests / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "statuses": dict(statuses),
+    }
+
+
+async def wait_for_analyses(
+    db: AsyncClient, timeout: float, seeded: set[str]
+) -> tuple[int, int, float]:
+    """Wait for the job queue to drain and count the submitted analyses."""
+    from app.jobs import get_job_queue
+
+    collection = db.collection(ANALYZE_REQUEST_COLLECTION)
+    queue = get_job_queue()
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if await queue.depth() == 0:
+            break
+        await asyncio.sleep(0.1)
+    elapsed = time.perf_counter() - started
+    documents = [
+        snapshot.to_dict()
+        for snapshot in await collection.get()
+        if snapshot.id not in seeded
+    ]
+    completed = sum(document["status"] == "completed" for document in documents)
+    failed = sum(document["status"] == "failed" for document in documents)
+    return completed, failed, elapsed
+
+
+def print_results(results: list[dict[str, Any]]) -> None:
+    """Write one table row per scenario to stdout."""
+    sys.stdout.write(
+        f"{'endpoint':<36}{'requests':>9}{'errors':>8}{'req/s':>10}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}\n"
+    )
+    for result in results:
+        sys.stdout.write(
+            f"{result['name']:<36}{result['requests']:>9}{result['errors']:>8}"
+            f"{result['rps']:>10.1f}{result['p50'] * 1000:>10.1f}"
+            f"{result['p95'] * 1000:>10.1f}{result['p99'] * 1000:>10.1f}\n"
+        )
+        unexpected = {
+            code: count for code, count in result["statuses"].items() if code != 200
+        }
+        if unexpected:
+            sys.stdout.write(f"{'':<4}status codes: {unexpected}\n")
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Run every selected scenario against the app and report the results."""
+    import httpx
+
+    from app.firebase import get_firestore_client
+    from app.local.auth import seed_tokens
+    from app.main import app
+    from app.services.status_writer import get_status_writer
+
+    db = get_firestore_client()
+    seed_tokens(args.users)
+    document_ids = await seed_documents(db, args.users, args.seed_documents)
+    scenarios = build_scenarios(document_ids)
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url=BASE_URL) as client:
+            for name in args.endpoints.split(","):
+                scenario = scenarios[name.strip()]
+                # Warm up caches and connection setup outside the measurement
+                await run_scenario(
+                    client,
+                    scenario,
+                    min(args.concurrency, args.requests),
+                    args.concurrency,
+                    args.users,
+                )
+                results.append(
+                    await run_scenario(
+                        client, scenario, args.requests, args.concurrency, args.users
+                    )
+                )
+        print_results(results)
+
+        if args.drain_timeout > 0:
+            seeded = {
+                document_id for ids in document_ids.values() for document_id in ids
+            }
+            completed, failed, elapsed = await wait_for_analyses(
+                db, args.drain_timeout, seeded
+            )
+            sys.stdout.write(
+                f"\nanalyses drained in {elapsed:.1f}s: {completed} completed, "
+                f"{failed} failed\n"
+            )
+        sys.stdout.write(f"firestore: {db.stats()}\n")
+        sys.stdout.write(f"status writer: {get_status_writer(db).stats()}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="per endpoint")
+    parser.add_argument("--endpoints", default="health,me,analyze,batch,list,status")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seed-documents", type=int, default=100, help="per user")
+    parser.add_argument("--workers", type=int, default=32, help="embedded worker slots")
+    parser.add_argument("--openai-latency", type=float, default=0.5)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--firestore-latency", type=float, default=0.0)
+    parser.add_argument(
+        "--drain-timeout",
+        type=float,
+        default=60.0,
+        help="seconds to wait for queued analyses; 0 to skip",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+    configure_environment(args)
+    asyncio.run(main(args))
@@ -0,0 +1,156 @@
+"""Microbenchmark of per-request middleware overhead.
+
+Compares the previous ``app.middleware("http")`` auth and logging pair,
+which Starlette wraps in ``BaseHTTPMiddleware``, with the pure ASGI
+``RequestContextMiddleware``. Token verification is stubbed out so only
+the middleware machinery is measured.
+
+Usage:
+    python -m benchmarks.middleware_overhead [--requests 20000]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+
+from fastapi import FastAPI, Request, Response
+from starlette.types import ASGIApp
+
+from app.middleware.request_context import RequestContextMiddleware
+from app.utils.responses import unauthorized_response
+
+DECODED_TOKEN = {"uid": "bench-user", "name": "Bench", "email": "bench@example.com"}
+
+
+async def stub_verify(token: str) -> dict:
+    """Accept any token as the benchmark user."""
+    return DECODED_TOKEN
+
+
+def build_app() -> FastAPI:
+    """Build an app with one ``/v1/user/me`` route and no middleware."""
+    app = FastAPI()
+
+    @app.get("/v1/user/me")
+    async def me(request: Request) -> dict:
+        user = getattr(request.state, "user", None)
+        return {"uid": user["user_id"] if user else None}
+
+    return app
+
+
+def build_legacy_app() -> FastAPI:
+    """Build the app with the auth and logging http middlewares of before."""
+    app = build_app()
+
+    async def authorize_token(
+        request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        authorization = request.headers.get("authorization")
+        if not authorization or not authorization.startswith("Bearer "):
+            return unauthorized_response(message="Invalid authorization header")
+        decoded_token = await stub_verify(authorization.split("Bearer ")[1])
+        request.state.user = {
+            "user_id": decoded_token["uid"],
+            "name": decoded_token.get("name"),
+            "email": decoded_token.get("email"),
+            "email_verified": decoded_token.get("email_verified", False),
+        }
+        return await call_next(request)
+
+    async def log_request_metadata(
+        request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        request_id = str(uuid.uuid4())
+        request_metadata = {
+            "client": request.client.host if request.client else None,
+            "url": str(request.url),
+            "method": request.method,
+            "request_id": request_id,
+        }
+        logging.info(f"Starting http request {request_metadata!s}")
+        start_time = time.time()
+        response = await call_next(request)
+        request_metadata["request_duration"] = time.time() - start_time
+        request_metadata["status_code"] = response.status_code
+        logging.info(f"HTTP request complete {request_metadata!s}")
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+    app.middleware("http")(authorize_token)
+    app.middleware("http")(log_request_metadata)
+    return app
+
+
+def build_asgi_app() -> FastAPI:
+    """Build the app behind ``RequestContextMiddleware``."""
+    app = build_app()
+    app.add_middleware(RequestContextMiddleware, token_verifier=stub_verify)
+    return app
+
+
+async def call(app: ASGIApp, scope: dict) -> int:
+    """Send one request straight to the ASGI app and return its status."""
+    status = 0
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(dict(scope), receive, send)
+    return status
+
+
+async def measure(app: ASGIApp, requests: int) -> float:
+    """Return the mean microseconds per request after a warm-up."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/v1/user/me",
+        "raw_path": b"/v1/user/me",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"authorization", b"Bearer bench-token")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    for _ in range(min(requests, 500)):  # warm up
+        if (status := await call(app, scope)) != 200:
+            raise RuntimeError(f"Warm-up request returned {status}")
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, scope)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def main(requests: int) -> None:
+    """Measure each middleware stack and print the overheads."""
+    baseline = await measure(build_app(), requests)
+    legacy = await measure(build_legacy_app(), requests)
+    asgi = await measure(build_asgi_app(), requests)
+    sys.stdout.write(f"{'stack':<28}{'us/request':>12}{'overhead':>12}\n")
+    for name, value in (
+        ("no middleware", baseline),
+        ("http middlewares (before)", legacy),
+        ("pure ASGI (after)", asgi),
+    ):
+        sys.stdout.write(f"{name:<28}{value:>12.1f}{value - baseline:>12.1f}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, force=True)
+    asyncio.run(main(args.requests))
@@ -0,0 +1,87 @@
+"""Benchmark of the response envelope on large list payloads.
+
+Compares the previous envelope path (build a ``SuccessResponse`` model,
+call ``.dict()`` and encode with stdlib ``json`` through ``JSONResponse``)
+with ``success_response``, which writes the envelope straight to bytes
+with orjson.
+
+Usage:
+    python -m benchmarks.response_envelope [--documents 50] [--iterations 2000]
+"""
+
+import argparse
+import sys
+import time
+import warnings
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.models.response import SuccessResponse
+from app.utils.responses import success_response
+
+
+def legacy_success_response(data: Any, message: str, status_code: int) -> JSONResponse:
+    """Build the envelope the way ``success_response`` did before."""
+    response = SuccessResponse(data=data, message=message, status_code=status_code)
+    return JSONResponse(content=response.dict(), status_code=status_code)
+
+
+def build_payload(documents: int, text_length: int) -> dict:
+    """Build a list page of ``documents`` analysis requests."""
+    now = datetime.utcnow().isoformat()
+    requests = [
+        {
+            "id": f"doc-{index:05d}",
+            "user_id": "bench-user",
+            "text": "Lorem ipsum dolor sit amet. " * (text_length // 28),
+            "status": "completed",
+            "result": {
+                "summary": "A short summary of the submitted text. " * 4,
+                "sentiment": "positive",
+                "keywords": [f"keyword-{k}" for k in range(10)],
+            },
+            "created_at": now,
+            "updated_at": now,
+            "completed_at": now,
+        }
+        for index in range(documents)
+    ]
+    return {"requests": requests, "total": documents, "limit": documents, "offset": 0}
+
+
+def measure(
+    build: Callable[[Any, str, int], JSONResponse], payload: dict, iterations: int
+) -> tuple[float, int]:
+    """Return the mean microseconds per response and its size in bytes."""
+    size = len(build(payload, "ok", 200).body)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        build(payload, "ok", 200)
+    return (time.perf_counter() - start) / iterations * 1e6, size
+
+
+def main(documents: int, text_length: int, iterations: int) -> None:
+    """Compare both envelope paths and print the results."""
+    warnings.simplefilter("ignore", DeprecationWarning)
+    payload = build_payload(documents, text_length)
+    legacy, legacy_size = measure(legacy_success_response, payload, iterations)
+    fast, fast_size = measure(success_response, payload, iterations)
+    sys.stdout.write(f"{documents} documents, {text_length} chars of text each\n")
+    sys.stdout.write(f"{'path':<32}{'us/response':>14}{'bytes':>10}\n")
+    sys.stdout.write(
+        f"{'SuccessResponse + json (before)':<32}{legacy:>14.1f}{legacy_size:>10}\n"
+    )
+    sys.stdout.write(f"{'orjson envelope (after)':<32}{fast:>14.1f}{fast_size:>10}\n")
+    sys.stdout.write(f"speedup: {legacy / fast:.1f}x\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--text-length", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.documents, args.text_length, args.iterations)
@@ -0,0 +1,79 @@
+import os
+
+# Run against the in-process stand-ins; set before any app module reads Settings
+os.environ.update({
+    "FIRESTORE_BACKEND": "memory",
+    "OPENAI_BACKEND": "fake",
+    "JOB_QUEUE_BACKEND": "memory",
+    "RATE_LIMIT_BACKEND": "memory",
+    "RUN_EMBEDDED_WORKER": "false",
+})
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from app import firebase, jobs, ratelimit  # noqa: E402
+from app.local.firestore import InMemoryFirestore  # noqa: E402
+from app.services import (  # noqa: E402
+    admission,
+    analysis_stats,
+    idempotency,
+    list_cache,
+    model_router,
+    openai_client,
+    result_cache,
+    status_events,
+    status_writer,
+)
+
+# Process-wide singletons, dropped between tests
+SINGLETONS = [
+    (firebase, "_firestore_client"),
+    (jobs, "_job_queue"),
+    (ratelimit, "_rate_limiter"),
+    (admission, "_admission_controller"),
+    (idempotency, "_idempotency_store"),
+    (list_cache, "_list_cache"),
+    (model_router, "_model_router"),
+    (openai_client, "_openai_client"),
+    (openai_client, "_model_call_limiter"),
+    (openai_client, "_model_call_policy"),
+    (result_cache, "_result_cache"),
+    (status_events, "_status_broker"),
+    (status_writer, "_status_writer"),
+]
+
+
+@pytest.fixture(autouse=True)
+async def fresh_singletons(monkeypatch):
+    for module, name in SINGLETONS:
+        monkeypatch.setattr(module, name, None)
+    monkeypatch.setattr(analysis_stats, "_backfilled", set())
+    yield
+    await status_writer.close_status_writer()
+
+
+@pytest.fixture
+def db():
+    client = InMemoryFirestore()
+    firebase._firestore_client = client
+    return client
+
+
+@pytest.fixture
+def user_token():
+    """Tokens of ``bench-user-{n}``, accepted without contacting Firebase."""
+    from app.local.auth import bench_token, seed_tokens
+
+    seed_tokens(2)
+    return bench_token
+
+
+@pytest.fixture
+async def client(db, user_token):
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        http.headers["Authorization"] = f"Bearer {user_token(0)}"
+        yield http
@@ -0,0 +1,108 @@
+from collections import Counter
+
+from app.services.analysis_stats import (
+    change_delta,
+    created_delta,
+    get_user_stats,
+    stats_writes,
+)
+from app.services.bulk_analysis import write_bulk_statuses
+from app.services.status_writer import StatusWriter
+from app.utils.firestore import commit_in_batches
+
+COMPLETED = {"status": "completed", "result": {"sentiment": "positive"}}
+
+
+def test_created_delta_counts_total_and_final_status():
+    assert created_delta({"status": "pending"}) == Counter({"total": 1})
+    assert created_delta(COMPLETED) == Counter(
+        {"total": 1, "status.completed": 1, "sentiment.positive": 1}
+    )
+
+
+def test_change_delta_counts_only_real_changes():
+    assert change_delta({"status": "processing"}, COMPLETED) == Counter(
+        {"status.completed": 1, "sentiment.positive": 1}
+    )
+    assert +change_delta(COMPLETED, COMPLETED) == Counter()
+    assert -change_delta(COMPLETED, COMPLETED) == Counter()
+
+
+def test_change_delta_takes_back_a_reopened_request():
+    delta = change_delta(COMPLETED, {"status": "processing"})
+
+    assert delta == Counter({"status.completed": -1, "sentiment.positive": -1})
+
+
+def test_change_delta_keeps_the_existing_result():
+    # A refined request completed with its local result
+    previous = {"status": "processing", "result": {"sentiment": "negative"}}
+
+    delta = change_delta(previous, {"status": "completed"})
+
+    assert delta == Counter({"status.completed": 1, "sentiment.negative": 1})
+
+
+async def _create(db, document_id, user_id="u1", **fields):
+    data = {"user_id": user_id, "status": "pending", "created_at": "2024", **fields}
+    doc_ref = db.collection("analyze_request").document(document_id)
+    await commit_in_batches(
+        db, [(doc_ref, data), *stats_writes(db, {user_id: created_delta(data)})]
+    )
+
+
+async def test_repeated_final_write_is_counted_once(db):
+    await _create(db, "a")
+    writer = StatusWriter(db, "analyze_request", flush_interval=0)
+
+    for _ in range(2):
+        # A job delivered twice writes the same final status twice
+        await writer.write("a", {"status": "processing"}, user_id="u1")
+        await writer.write("a", dict(COMPLETED), durable=True, user_id="u1")
+        await writer.flush()
+    await writer.close()
+
+    stats = await get_user_stats(db, "u1")
+    assert stats["total"] == 1
+    assert stats["by_status"] == {"completed": 1, "failed": 0, "in_progress": 0}
+    assert stats["sentiment"]["positive"] == 1
+
+
+async def test_rewritten_bulk_results_are_counted_once(db):
+    await _create(db, "a")
+    await _create(db, "b")
+    updates = {"a": dict(COMPLETED), "b": {"status": "failed"}}
+
+    for _ in range(2):
+        await write_bulk_statuses(db, updates, {"a": "u1", "b": "u1"})
+
+    stats = await get_user_stats(db, "u1")
+    assert stats["by_status"] == {"completed": 1, "failed": 1, "in_progress": 0}
+
+
+async def test_first_read_backfills_existing_requests(db):
+    await db.collection("analyze_request").document("old").set(
+        {"user_id": "u1", "created_at": "2020", **COMPLETED}
+    )
+    await _create(db, "new")
+
+    stats = await get_user_stats(db, "u1")
+
+    assert stats["total"] == 2
+    assert stats["by_status"] == {"completed": 1, "failed": 0, "in_progress": 1}
+    assert stats["sentiment"]["positive"] == 1
+
+
+async def test_stats_endpoint(client):
+    response = await client.post("/v1/user/analyze", json={
+        "text": "A perfectly fine text.", "analysis_mode": "local"
+    })
+    assert response.status_code == 200
+
+    response = await client.get("/v1/user/analyze/stats")
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["total"] == 1
+    assert data["by_status"]["completed"] == 1
+    assert sum(data["sentiment"].values()) == 1
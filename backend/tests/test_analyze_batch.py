@@ -0,0 +1,104 @@
+from app.jobs import InMemoryJobQueue, JobQueueFullError, get_job_queue
+from app.models.user import ANALYZE_BATCH_MAX_ITEMS
+from app.services.analysis_stats import get_user_stats
+from app.services.analyze_text import ANALYZE_TEXT_JOB
+
+BATCH_URL = "/v1/user/analyze/batch"
+
+
+async def _requests(db):
+    return [
+        snapshot.to_dict()
+        async for snapshot in db.collection("analyze_request").stream()
+    ]
+
+
+async def test_invalid_items_are_reported_by_index(client, db):
+    response = await client.post(BATCH_URL, json={
+        "texts": ["A fine first text.", "", "A fine second text.", "   ", "ab"],
+        "analysis_mode": "model",
+    })
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["accepted"] == 2
+    assert data["rejected"] == 3
+    items = data["items"]
+    assert [item["index"] for item in items] == [0, 1, 2, 3, 4]
+    assert items[1] == {"index": 1, "error": "String should have at least 1 character"}
+    assert items[3] == {"index": 3, "error": "Value error, Text cannot be empty"}
+    assert items[4] == {
+        "index": 4, "error": "Value error, Text too short for meaningful analysis"
+    }
+    assert {items[0]["status"], items[2]["status"]} == {"pending"}
+    assert len(await _requests(db)) == 2
+    assert await get_job_queue().depth(ANALYZE_TEXT_JOB) == 2
+
+
+async def test_empty_batch_is_rejected(client, db):
+    response = await client.post(BATCH_URL, json={"texts": []})
+
+    assert response.status_code == 422
+    assert await _requests(db) == []
+
+
+async def test_largest_batch_is_written_at_once(client, db):
+    texts = [f"A fine text number {n}." for n in range(ANALYZE_BATCH_MAX_ITEMS)]
+    round_trips = db.round_trips
+
+    response = await client.post(BATCH_URL, json={"texts": texts, "analysis_mode": "model"})
+
+    assert response.status_code == 200
+    assert response.json()["data"]["accepted"] == ANALYZE_BATCH_MAX_ITEMS
+    # Every request and the stats shard in one batched write
+    assert db.round_trips - round_trips == 1
+    assert len(await _requests(db)) == ANALYZE_BATCH_MAX_ITEMS
+    stats = await get_user_stats(db, "bench-user-0")
+    assert stats["by_status"]["in_progress"] == ANALYZE_BATCH_MAX_ITEMS
+
+
+async def test_batch_over_the_limit_is_rejected(client, db):
+    texts = ["A fine text."] * (ANALYZE_BATCH_MAX_ITEMS + 1)
+
+    response = await client.post(BATCH_URL, json={"texts": texts})
+
+    assert response.status_code == 422
+    assert await _requests(db) == []
+
+
+async def test_full_queue_rejects_the_batch_before_writing(client, db):
+    get_job_queue().max_depth = 1
+
+    response = await client.post(BATCH_URL, json={
+        "texts": ["A fine first text.", "A fine second text."], "analysis_mode": "model"
+    })
+
+    assert response.status_code == 503
+    assert response.json()["message"] == "Analysis queue is full, please retry later"
+    assert await _requests(db) == []
+
+
+class _RacedQueue(InMemoryJobQueue):
+    """Passes the depth check, then fills up before the jobs are queued."""
+
+    async def enqueue_many(self, job_type, payloads, **kwargs):
+        raise JobQueueFullError("Job queue is full")
+
+
+async def test_queue_filled_after_the_write_fails_the_requests(client, db):
+    from app.main import app
+
+    app.dependency_overrides[get_job_queue] = lambda: _RacedQueue(max_depth=10, max_attempts=3)
+    try:
+        response = await client.post(BATCH_URL, json={
+            "texts": ["A fine first text.", "A fine second text."], "analysis_mode": "model"
+        })
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 503
+    requests = await _requests(db)
+    assert [request["status"] for request in requests] == ["failed", "failed"]
+    stats = await get_user_stats(db, "bench-user-0")
+    assert stats["by_status"]["failed"] == 2
+    assert stats["by_status"]["in_progress"] == 0
@@ -0,0 +1,201 @@
+import pytest
+
+from app.jobs import InMemoryJobQueue, Job, JobQueueFullError, get_job_queue
+from app.local.openai import FakeAsyncOpenAI
+from app.ratelimit.memory import InMemoryRateLimiter
+from app.services import openai_client
+from app.services.admission import AdmissionController
+from app.services.analysis_stats import get_user_stats
+from app.services.analyze_text import ANALYZE_TEXT_JOB
+from app.services import bulk_analysis
+from app.services.bulk_analysis import (
+    BATCH_ENDPOINT,
+    BULK_ANALYZE_JOB,
+    BULK_POLL_JOB,
+    BulkSubmitter,
+    batch_request_line,
+    poll_bulk_batch,
+)
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    client = FakeAsyncOpenAI()
+    monkeypatch.setattr(openai_client, "_openai_client", client)
+    return client
+
+
+async def _finished_batch(db, client, answered, unanswered, batches=1):
+    """A completed batch that answered only the ``answered`` requests."""
+    lines = b"".join(
+        batch_request_line(document_id, "A perfectly fine text.", "gpt-4o-mini")
+        for document_id in answered
+    )
+    batch_file = await client.files.create(file=("bulk.jsonl", lines), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=batch_file.id, endpoint=BATCH_ENDPOINT, completion_window="24h"
+    )
+    for document_id in [*answered, *unanswered]:
+        await db.collection("analyze_request").document(document_id).set({
+            "user_id": "u1",
+            "text": "A perfectly fine text.",
+            "status": "processing",
+            "batch_id": batch.id,
+            "created_at": "2024",
+        })
+    items = [
+        {
+            "document_id": document_id,
+            "cache_key": document_id,
+            "user_id": "u1",
+            "batches": batches,
+        }
+        for document_id in [*answered, *unanswered]
+    ]
+    return Job(type=BULK_POLL_JOB, payload={"batch_id": batch.id, "items": items}, attempts=1)
+
+
+class _PollFailingQueue(InMemoryJobQueue):
+    """Refuses the first ``bulk_poll`` job, as if the queue went down after the upload."""
+
+    failures = 1
+
+    async def enqueue(self, job_type, payload, **kwargs):
+        if job_type == BULK_POLL_JOB and self.failures:
+            self.failures -= 1
+            raise ConnectionError("queue unavailable")
+        return await super().enqueue(job_type, payload, **kwargs)
+
+
+def _submitter(db, queue):
+    return BulkSubmitter(
+        db, queue, model="gpt-4o-mini", collect_interval=60,
+        max_items=100, max_bytes=1_000_000, poll_interval=0,
+        completion_window="24h", visibility_timeout=60,
+        retry_base_delay=0, retry_max_delay=0,
+    )
+
+
+async def _status(db, document_id):
+    snapshot = await db.collection("analyze_request").document(document_id).get()
+    return snapshot.to_dict()["status"]
+
+
+async def test_poll_retry_resumes_after_a_full_queue(db, fake_openai):
+    queue = InMemoryJobQueue(max_depth=10, max_attempts=3, type_max_depths={BULK_ANALYZE_JOB: 0})
+    job = await _finished_batch(db, fake_openai, ["a"], ["b"])
+
+    with pytest.raises(JobQueueFullError):
+        await poll_bulk_batch(db, queue, job)
+
+    # Nothing was written, so the retry does it all
+    assert await _status(db, "a") == "processing"
+    queue.type_max_depths[BULK_ANALYZE_JOB] = 10
+    await poll_bulk_batch(db, queue, job)
+    await poll_bulk_batch(db, queue, job)
+
+    assert await _status(db, "a") == "completed"
+    assert await _status(db, "b") == "pending"
+    assert await queue.depth(BULK_ANALYZE_JOB) == 1
+    assert await queue.depth(ANALYZE_TEXT_JOB) == 0
+    stats = await get_user_stats(db, "u1")
+    assert stats["by_status"]["completed"] == 1
+
+
+async def test_poll_fails_unqueueable_requests_on_the_last_attempt(db, fake_openai):
+    queue = InMemoryJobQueue(max_depth=0, max_attempts=1)
+    job = await _finished_batch(db, fake_openai, ["a"], ["b"])
+    job.max_attempts = 1
+
+    await poll_bulk_batch(db, queue, job)
+
+    assert await _status(db, "a") == "completed"
+    assert await _status(db, "b") == "failed"
+
+
+async def test_unanswered_requests_go_to_a_later_batch(db, fake_openai):
+    queue = InMemoryJobQueue(max_depth=0, max_attempts=3, type_max_depths={BULK_ANALYZE_JOB: 10})
+    job = await _finished_batch(db, fake_openai, [], ["b"])
+
+    await poll_bulk_batch(db, queue, job)
+
+    requeued = await queue.claim(60, (BULK_ANALYZE_JOB,))
+    assert requeued.payload == {"document_id": "b", "text": "A perfectly fine text.", "batches": 1}
+    assert requeued.tenant == "u1"
+    assert await queue.depth(ANALYZE_TEXT_JOB) == 0
+
+
+async def test_requests_fail_after_the_last_batch(db, fake_openai, monkeypatch):
+    monkeypatch.setattr(bulk_analysis.settings, "BULK_MAX_BATCHES", 2)
+    queue = InMemoryJobQueue(max_depth=10, max_attempts=3)
+    job = await _finished_batch(db, fake_openai, [], ["b"], batches=2)
+
+    await poll_bulk_batch(db, queue, job)
+
+    assert await _status(db, "b") == "failed"
+    assert await queue.depth() == 0
+
+
+async def test_failed_poll_enqueue_does_not_resubmit_the_batch(db, fake_openai):
+    queue = _PollFailingQueue(max_depth=10, max_attempts=3, type_max_depths={BULK_ANALYZE_JOB: 10})
+    for document_id in ["a", "b"]:
+        await db.collection("analyze_request").document(document_id).set({
+            "user_id": "u1", "text": "A perfectly fine text.", "status": "pending"
+        })
+        await queue.enqueue(
+            BULK_ANALYZE_JOB,
+            {"document_id": document_id, "text": "A perfectly fine text."},
+            tenant="u1",
+        )
+    submitter = _submitter(db, queue)
+
+    with pytest.raises(ConnectionError):
+        await submitter.submit_once()
+
+    assert await _status(db, "a") == "processing"
+    assert await submitter.submit_once() == 2
+    assert len(fake_openai.batches._batches) == 1
+    assert await queue.depth(BULK_ANALYZE_JOB) == 0
+    poll = await queue.claim(60, (BULK_POLL_JOB,))
+    assert poll.payload["batch_id"] == next(iter(fake_openai.batches._batches))
+    assert [item["document_id"] for item in poll.payload["items"]] == ["a", "b"]
+
+
+async def test_bulk_jobs_have_their_own_queue_depth():
+    queue = InMemoryJobQueue(max_depth=1, max_attempts=3, type_max_depths={BULK_ANALYZE_JOB: 2})
+
+    await queue.enqueue(ANALYZE_TEXT_JOB, {})
+    await queue.enqueue_many(BULK_ANALYZE_JOB, [{}, {}])
+
+    with pytest.raises(JobQueueFullError):
+        await queue.enqueue(ANALYZE_TEXT_JOB, {})
+    with pytest.raises(JobQueueFullError):
+        await queue.enqueue(BULK_ANALYZE_JOB, {})
+    assert await queue.depth(ANALYZE_TEXT_JOB) == 1
+    assert await queue.depth(BULK_ANALYZE_JOB) == 2
+    assert await queue.depth() == 3
+
+
+async def test_bulk_submissions_have_their_own_budget():
+    admission = AdmissionController(
+        InMemoryRateLimiter(),
+        user_rate=0.001, user_burst=1,
+        global_rate=0.001, global_burst=1,
+        bulk_rate=0.001, bulk_burst=5,
+    )
+
+    assert await admission.admit("u1") == 0
+    assert await admission.admit("u1") > 0
+    assert await admission.admit("u1", 5, bulk=True) == 0
+    assert await admission.admit("u1", bulk=True) > 0
+
+
+async def test_bulk_submission_is_queued_apart_from_live_work(client):
+    response = await client.post("/v1/user/analyze", json={
+        "text": "A perfectly fine text.", "analysis_mode": "model", "priority": "bulk"
+    })
+
+    assert response.status_code == 200
+    queue = get_job_queue()
+    assert await queue.depth(BULK_ANALYZE_JOB) == 1
+    assert await queue.depth(ANALYZE_TEXT_JOB) == 0
@@ -0,0 +1,97 @@
+import pytest
+
+from app.jobs import JobDeferredError
+from app.services import analyze_text
+from app.services.chunking import (
+    CHARS_PER_TOKEN,
+    merge_keywords,
+    merge_sentiment,
+    split_into_chunks,
+)
+from app.utils.circuit_breaker import CircuitOpenError
+
+LONG_TEXT = " ".join(f"Sentence number {i} talks about the product." for i in range(2000))
+
+
+def test_short_text_is_one_chunk():
+    assert split_into_chunks("Short text. Two sentences.", 100) == [
+        "Short text. Two sentences."
+    ]
+
+
+def test_split_keeps_sentences_within_budget():
+    chunks = split_into_chunks(LONG_TEXT, 200)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 200 * CHARS_PER_TOKEN for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+    assert " ".join(chunks) == LONG_TEXT
+
+
+def test_split_breaks_overlong_sentences_on_whitespace():
+    sentence = " ".join(["word"] * 500)
+
+    chunks = split_into_chunks(sentence, 50)
+
+    assert all(len(chunk) <= 50 * CHARS_PER_TOKEN for chunk in chunks)
+    assert " ".join(chunks) == sentence
+
+
+def test_merge_keywords_ranks_by_weight_and_dedupes_case():
+    results = [
+        {"keywords": ["Battery", "screen"]},
+        {"keywords": ["battery", "price"]},
+    ]
+
+    merged = merge_keywords(results, [1.0, 3.0])
+
+    assert merged[0] == "Battery"
+    assert [keyword.lower() for keyword in merged] == ["battery", "price", "screen"]
+
+
+def test_merge_sentiment_weights_by_length():
+    results = [{"sentiment": "positive"}, {"sentiment": "negative"}]
+
+    assert merge_sentiment(results, [3.0, 1.0]) == "positive"
+    assert merge_sentiment(results, [1.0, 3.0]) == "negative"
+    assert merge_sentiment(results, [1.0, 1.0]) == "neutral"
+
+
+async def _analyze_failing_chunks(db, monkeypatch, error, is_last_attempt=True):
+    await db.collection("analyze_request").document("req").set(
+        {"user_id": "u", "text": LONG_TEXT, "status": "pending"}
+    )
+
+    async def failing_analysis(text, run, on_output=None):
+        raise error
+
+    monkeypatch.setattr(analyze_text, "run_model_analysis", failing_analysis)
+    try:
+        await analyze_text.request_text_analyze(
+            "req", LONG_TEXT, db, is_last_attempt=is_last_attempt
+        )
+    finally:
+        snapshot = await db.collection("analyze_request").document("req").get()
+    return snapshot.to_dict()
+
+
+async def test_open_circuit_in_a_chunk_defers_the_job(db, monkeypatch):
+    with pytest.raises(JobDeferredError):
+        await _analyze_failing_chunks(db, monkeypatch, CircuitOpenError("openai", 5.0))
+
+    snapshot = await db.collection("analyze_request").document("req").get()
+    assert snapshot.to_dict()["status"] == "pending"
+
+
+async def test_chunk_failure_is_reported_as_itself(db, monkeypatch):
+    data = await _analyze_failing_chunks(db, monkeypatch, RuntimeError("model down"))
+
+    assert data["status"] == "failed"
+    assert data["error_message"] == "model down"
+
+
+async def test_chunk_failure_before_last_attempt_is_retried(db, monkeypatch):
+    with pytest.raises(RuntimeError, match="model down"):
+        await _analyze_failing_chunks(
+            db, monkeypatch, RuntimeError("model down"), is_last_attempt=False
+        )
@@ -0,0 +1,86 @@
+import csv
+import io
+
+import orjson
+
+from app.models.user import ExportFormat
+from app.services.analysis_export import export_user_requests
+
+
+async def _requests(db, count, user_id="bench-user-0"):
+    for n in range(count):
+        await db.collection("analyze_request").document(f"{user_id}-{n:03d}").set({
+            "user_id": user_id,
+            "text": f"Text {n}, with a comma.",
+            "status": "completed",
+            "result": {"sentiment": "positive", "keywords": ["a", "b"]},
+            "created_at": f"2024-01-01T00:00:{n:02d}",
+        })
+
+
+async def _collect(db, export_format, projection, **kwargs):
+    return [
+        chunk async for chunk in export_user_requests(
+            db, "bench-user-0", export_format, projection, **kwargs
+        )
+    ]
+
+
+async def test_ndjson_pages_through_the_whole_history(db):
+    await _requests(db, 7)
+    await _requests(db, 2, user_id="bench-user-1")
+
+    chunks = await _collect(db, ExportFormat.ndjson, ["status", "created_at"], page_size=3)
+
+    lines = [orjson.loads(line) for line in b"".join(chunks).splitlines()]
+    assert [line["id"] for line in lines] == [f"bench-user-0-{n:03d}" for n in reversed(range(7))]
+    assert set(lines[0]) == {"id", "status", "created_at"}
+
+
+async def test_first_document_is_sent_at_once(db):
+    await _requests(db, 5)
+
+    chunks = await _collect(
+        db, ExportFormat.ndjson, None, page_size=2, flush_bytes=1_000_000
+    )
+
+    assert len(chunks) == 2
+    assert chunks[0].count(b"\n") == 1
+
+
+async def test_csv_has_a_header_and_json_cells(db):
+    await _requests(db, 2)
+
+    chunks = await _collect(db, ExportFormat.csv, ["text", "result", "created_at"])
+
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+    assert rows[0] == ["id", "text", "result", "created_at"]
+    assert rows[1][1] == "Text 1, with a comma."
+    assert orjson.loads(rows[1][2]) == {"sentiment": "positive", "keywords": ["a", "b"]}
+    assert len(rows) == 3
+
+
+async def test_export_endpoint_streams_csv(client, db):
+    await _requests(db, 3)
+
+    response = await client.get(
+        "/v1/user/analyze/export", params={"format": "csv", "fields": "status"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "attachment" in response.headers["content-disposition"]
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "status", "created_at"]
+    assert len(rows) == 4
+
+
+async def test_export_endpoint_defaults_to_ndjson(client, db):
+    await _requests(db, 2)
+
+    response = await client.get("/v1/user/analyze/export")
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [orjson.loads(line) for line in response.content.splitlines()]
+    assert len(lines) == 2
+    assert lines[0]["text"] == "Text 1, with a comma."
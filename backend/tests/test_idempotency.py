@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+from fastapi.responses import Response
+
+from app.services.idempotency import (
+    REPLAYED_HEADER,
+    FirestoreIdempotencyStore,
+    IdempotencyKeyInProgressError,
+    IdempotencyKeyReusedError,
+    IdempotencyStore,
+    request_fingerprint,
+)
+
+BODY = {"text": "A perfectly fine text.", "analysis_mode": "local"}
+
+
+def _store(wait=1.0, persistent=None):
+    return IdempotencyStore(max_keys=10, ttl=60, wait=wait, persistent=persistent)
+
+
+def _handler(status_code=200):
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return Response(content=b'{"n": %d}' % len(calls), status_code=status_code)
+
+    return handler, calls
+
+
+async def test_retry_replays_the_first_response():
+    store = _store()
+    handler, calls = _handler()
+
+    first = await store.run("u1", "key", "fp", handler)
+    second = await store.run("u1", "key", "fp", handler)
+
+    assert len(calls) == 1
+    assert second.body == first.body
+    assert second.headers[REPLAYED_HEADER] == "true"
+
+
+async def test_concurrent_duplicates_wait_for_the_first_request():
+    store = _store()
+    handler, calls = _handler()
+
+    responses = await asyncio.gather(*(store.run("u1", "key", "fp", handler) for _ in range(3)))
+
+    assert len(calls) == 1
+    assert len({response.body for response in responses}) == 1
+
+
+async def test_duplicate_outlasting_the_wait_is_refused():
+    store = _store(wait=0.001)
+    handler, _ = _handler()
+
+    first = asyncio.create_task(store.run("u1", "key", "fp", handler))
+    await asyncio.sleep(0)
+    with pytest.raises(IdempotencyKeyInProgressError):
+        await store.run("u1", "key", "fp", handler)
+    await first
+
+
+async def test_key_reused_with_another_request_is_refused():
+    store = _store()
+    handler, _ = _handler()
+    await store.run("u1", "key", "fp", handler)
+
+    with pytest.raises(IdempotencyKeyReusedError):
+        await store.run("u1", "key", "other", handler)
+
+
+async def test_keys_are_per_user_and_failures_are_not_kept():
+    store = _store()
+    handler, calls = _handler(status_code=500)
+
+    await store.run("u1", "key", "fp", handler)
+    await store.run("u1", "key", "fp", handler)
+    await store.run("u2", "key", "fp", handler)
+
+    assert len(calls) == 3
+
+
+async def test_persistent_tier_replays_across_processes(db):
+    persistent = FirestoreIdempotencyStore(db, "idempotency", ttl=60, lease=30)
+    handler, calls = _handler()
+    first = await _store(persistent=persistent).run("u1", "key", "fp", handler)
+
+    replayed = await _store(persistent=persistent).run("u1", "key", "fp", handler)
+
+    assert len(calls) == 1
+    assert replayed.body == first.body
+
+
+def test_fingerprint_covers_path_and_body():
+    assert request_fingerprint("/a", b"x") == request_fingerprint("/a", b"x")
+    assert request_fingerprint("/a", b"x") != request_fingerprint("/b", b"x")
+    assert request_fingerprint("/a", b"x") != request_fingerprint("/a", b"y")
+
+
+async def test_submission_retry_creates_one_request(client):
+    headers = {"Idempotency-Key": "submit-1"}
+
+    first = await client.post("/v1/user/analyze", json=BODY, headers=headers)
+    second = await client.post("/v1/user/analyze", json=BODY, headers=headers)
+
+    assert second.headers[REPLAYED_HEADER] == "true"
+    assert second.json() == first.json()
+    listed = (await client.get("/v1/user/analyze")).json()["data"]["requests"]
+    assert len(listed) == 1
+
+
+async def test_submission_key_reused_with_another_body_gets_422(client):
+    headers = {"Idempotency-Key": "submit-1"}
+    await client.post("/v1/user/analyze", json=BODY, headers=headers)
+
+    response = await client.post(
+        "/v1/user/analyze", json={**BODY, "text": "Another text."}, headers=headers
+    )
+
+    assert response.status_code == 422
@@ -0,0 +1,116 @@
+import pytest
+
+from app.jobs import InMemoryJobQueue, SQLiteJobQueue
+from app.jobs.sqlite import _claim_queries
+from app.services.analyze_text import ANALYZE_TEXT_JOB
+from app.worker import build_dead_letter_handler
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+async def queue(request, tmp_path):
+    if request.param == "memory":
+        queue = InMemoryJobQueue(max_depth=100, max_attempts=2)
+    else:
+        queue = SQLiteJobQueue(str(tmp_path / "jobs.db"), max_depth=100, max_attempts=2)
+    yield queue
+    await queue.close()
+
+
+async def test_claimed_job_is_leased(queue):
+    await queue.enqueue(ANALYZE_TEXT_JOB, {"n": 1})
+
+    job = await queue.claim(60)
+
+    assert job.payload == {"n": 1}
+    assert job.attempts == 1
+    assert await queue.claim(60) is None
+    assert await queue.ack(job)
+    assert await queue.depth() == 0
+
+
+async def test_expired_lease_is_claimed_again(queue):
+    await queue.enqueue(ANALYZE_TEXT_JOB, {})
+    first = await queue.claim(0)
+
+    second = await queue.claim(60)
+
+    assert second.id == first.id
+    assert second.attempts == 2
+    # The first lease is no longer valid
+    assert not await queue.ack(first)
+    assert await queue.ack(second)
+
+
+async def test_retry_reschedules_until_the_last_attempt(queue):
+    await queue.enqueue(ANALYZE_TEXT_JOB, {})
+    job = await queue.claim(60)
+
+    assert await queue.retry(job, 0, "boom")
+    job = await queue.claim(60)
+    assert job.last_error == "boom"
+    assert job.is_last_attempt
+    assert not await queue.retry(job, 0, "boom")
+    assert await queue.depth() == 0
+
+
+async def test_defer_does_not_use_up_an_attempt(queue):
+    await queue.enqueue(ANALYZE_TEXT_JOB, {})
+    job = await queue.claim(60)
+
+    assert await queue.defer(job, 0)
+
+    assert (await queue.claim(60)).attempts == 1
+
+
+async def test_claims_rotate_between_tenants(queue):
+    await queue.enqueue_many(ANALYZE_TEXT_JOB, [{"n": 1}, {"n": 2}], tenant="busy")
+    await queue.enqueue(ANALYZE_TEXT_JOB, {"n": 3}, tenant="quiet")
+
+    tenants = [(await queue.claim(60)).tenant for _ in range(3)]
+
+    assert tenants == ["busy", "quiet", "busy"]
+
+
+async def test_claims_only_take_the_requested_types(queue):
+    await queue.enqueue_many("bulk", [{"n": 1}, {"n": 2}], tenant="busy")
+    await queue.enqueue(ANALYZE_TEXT_JOB, {"n": 3}, tenant="busy")
+    await queue.enqueue("poll", {"n": 4}, tenant="quiet")
+    await queue.enqueue(ANALYZE_TEXT_JOB, {"n": 5}, tenant="quiet")
+
+    claimed = [await queue.claim(60, (ANALYZE_TEXT_JOB, "poll")) for _ in range(4)]
+
+    assert [job.payload["n"] for job in claimed[:3]] == [3, 4, 5]
+    assert claimed[3] is None
+    assert (await queue.claim(60, ("bulk",))).payload == {"n": 1}
+
+
+def test_typed_claims_search_the_type_index(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"), max_depth=100, max_attempts=2)
+    heads_sql, next_sql = _claim_queries(2)
+
+    plans = [
+        " ".join(row[3] for row in queue._conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+        for sql, params in [
+            (heads_sql, ("a", "b")),
+            (next_sql, ("a", "t", 0, "b", "t", 0)),
+        ]
+    ]
+
+    assert all("jobs_type_tenant_visible_at" in plan for plan in plans)
+    assert not any("SCAN jobs" in plan for plan in plans)
+
+
+async def test_job_dropped_after_its_last_lease_fails_its_request(queue, db):
+    doc_ref = db.collection("analyze_request").document("a")
+    await doc_ref.set({"user_id": "u1", "status": "processing", "created_at": "2024"})
+    queue.dead_letter_handler = build_dead_letter_handler(db)
+    await queue.enqueue(ANALYZE_TEXT_JOB, {"document_id": "a", "text": "x"}, tenant="u1")
+    await queue.claim(0)
+    await queue.claim(0)
+
+    assert await queue.claim(60) is None
+
+    assert await queue.depth() == 0
+    data = (await doc_ref.get()).to_dict()
+    assert data["status"] == "failed"
+    assert "abandoned" in data["error_message"]
@@ -0,0 +1,72 @@
+from app.services.list_cache import AnalysisListCache
+from app.utils.responses import etag_matches
+
+
+def _page(*document_ids):
+    return {"requests": [{"id": document_id} for document_id in document_ids]}
+
+
+def test_etag_matching_is_weak_and_accepts_lists():
+    assert etag_matches('W/"abc"', 'W/"abc"')
+    assert etag_matches('"abc"', 'W/"abc"')
+    assert etag_matches('"x", W/"abc"', 'W/"abc"')
+    assert etag_matches("*", 'W/"abc"')
+    assert not etag_matches(None, 'W/"abc"')
+    assert not etag_matches('W/"other"', 'W/"abc"')
+
+
+def test_pages_are_dropped_by_user_and_by_document():
+    cache = AnalysisListCache(max_pages=10, ttl=60)
+    cache.set("u1", "p1", _page("a"), cache.version)
+    cache.set("u1", "p2", _page("b"), cache.version)
+    cache.set("u2", "p1", _page("c"), cache.version)
+
+    cache.invalidate_documents(["a"])
+    assert cache.get("u1", "p1") is None
+    assert cache.get("u1", "p2") is not None
+
+    cache.invalidate_user("u1")
+    assert cache.get("u1", "p2") is None
+    assert cache.get("u2", "p1") is not None
+
+
+def test_page_read_across_an_invalidation_is_not_stored():
+    cache = AnalysisListCache(max_pages=10, ttl=60)
+    version = cache.version
+
+    cache.invalidate_documents(["a"])
+    page = cache.set("u1", "p1", _page("a"), version)
+
+    assert page.etag
+    assert cache.get("u1", "p1") is None
+
+
+def test_least_recently_used_pages_are_dropped():
+    cache = AnalysisListCache(max_pages=2, ttl=60)
+    for params in ("p1", "p2"):
+        cache.set("u1", params, _page(), cache.version)
+    cache.get("u1", "p1")
+
+    cache.set("u1", "p3", _page(), cache.version)
+
+    assert cache.get("u1", "p2") is None
+    assert len(cache) == 2
+
+
+async def test_unchanged_list_gets_304(client):
+    body = {"text": "A perfectly fine text.", "analysis_mode": "local"}
+    await client.post("/v1/user/analyze", json=body)
+    response = await client.get("/v1/user/analyze")
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+    response = await client.get("/v1/user/analyze", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # A submission changes the page
+    await client.post("/v1/user/analyze", json=body)
+    response = await client.get("/v1/user/analyze", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()["data"]["requests"]) == 2
+    assert response.headers["ETag"] != etag
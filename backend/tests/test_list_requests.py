@@ -0,0 +1,163 @@
+import pytest
+
+from app.routes.v1.user import parse_fields
+from app.utils.pagination import decode_cursor, encode_cursor
+
+LONG_TEXT = "word " * 100
+
+
+async def _legacy_request(db, document_id, text):
+    # Created before text_preview was stored
+    await db.collection("analyze_request").document(document_id).set({
+        "user_id": "bench-user-0",
+        "text": text,
+        "status": "completed",
+        "created_at": "2020-01-01T00:00:00",
+    })
+
+
+async def test_list_items_are_slim(client):
+    await client.post("/v1/user/analyze", json={"text": LONG_TEXT, "analysis_mode": "local"})
+
+    response = await client.get("/v1/user/analyze")
+
+    (item,) = response.json()["data"]["requests"]
+    assert "text" not in item
+    assert "result" not in item
+    assert item["text_preview"].endswith("…")
+    assert len(item["text_preview"]) <= 201
+
+
+async def test_legacy_requests_get_a_text_preview(client, db):
+    await _legacy_request(db, "old", "An old text.")
+
+    response = await client.get("/v1/user/analyze")
+
+    (item,) = response.json()["data"]["requests"]
+    assert item["text_preview"] == "An old text."
+    assert "text" not in item
+
+
+async def test_single_legacy_request_gets_a_text_preview(client, db):
+    await _legacy_request(db, "old", LONG_TEXT)
+
+    response = await client.get("/v1/user/analyze/old", params={"fields": "text_preview"})
+
+    data = response.json()["data"]
+    assert data["text_preview"].startswith("word word")
+    assert "text" not in data
+
+
+async def _requests(db, count, created_at="2024-01-01T00:00:00"):
+    # Equal timestamps, so pages rely on the document ID tie-breaker
+    for n in range(count):
+        await db.collection("analyze_request").document(f"doc-{n:02d}").set({
+            "user_id": "bench-user-0",
+            "text": f"Text {n}.",
+            "text_preview": f"Text {n}.",
+            "status": "completed",
+            "created_at": created_at,
+        })
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2024-01-01T00:00:00", "doc-01")
+
+    assert decode_cursor(cursor) == ("2024-01-01T00:00:00", "doc-01")
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+
+
+async def test_cursor_pages_cover_every_request_once(client, db):
+    await _requests(db, 5)
+    seen = []
+    params = {"limit": 2}
+
+    while True:
+        data = (await client.get("/v1/user/analyze", params=params)).json()["data"]
+        seen.extend(item["id"] for item in data["requests"])
+        if data["next_cursor"] is None:
+            break
+        params["cursor"] = data["next_cursor"]
+
+    assert seen == [f"doc-{n:02d}" for n in reversed(range(5))]
+
+
+async def test_offset_pages_include_the_total(client, db):
+    await _requests(db, 3)
+
+    data = (await client.get("/v1/user/analyze", params={"offset": 1, "limit": 1})).json()["data"]
+
+    assert [item["id"] for item in data["requests"]] == ["doc-01"]
+    assert data["offset"] == 1
+    assert data["total"] == 3
+
+
+async def test_malformed_cursor_is_rejected(client):
+    response = await client.get("/v1/user/analyze", params={"cursor": "%%%"})
+
+    assert response.status_code == 422
+
+
+async def test_other_users_requests_are_not_listed(client, db):
+    await _requests(db, 1)
+    await db.collection("analyze_request").document("theirs").set({
+        "user_id": "bench-user-1", "status": "completed", "created_at": "2024"
+    })
+
+    data = (await client.get("/v1/user/analyze")).json()["data"]
+
+    assert [item["id"] for item in data["requests"]] == ["doc-00"]
+
+
+def test_parse_fields():
+    assert parse_fields(None, ("status",)) == ["status"]
+    assert parse_fields("*", ("status",)) is None
+    assert parse_fields("status, result,status,id") == ["status", "result"]
+    with pytest.raises(ValueError):
+        parse_fields("password")
+
+
+async def test_fields_pick_what_list_items_hold(client, db):
+    await _requests(db, 1)
+
+    response = await client.get("/v1/user/analyze", params={"fields": "status"})
+
+    (item,) = response.json()["data"]["requests"]
+    # created_at is always read for the next cursor
+    assert set(item) == {"id", "status", "created_at"}
+
+
+async def test_all_fields(client, db):
+    await _requests(db, 1)
+
+    response = await client.get("/v1/user/analyze", params={"fields": "*"})
+
+    (item,) = response.json()["data"]["requests"]
+    assert item["text"] == "Text 0."
+
+
+async def test_unknown_field_is_rejected(client):
+    response = await client.get("/v1/user/analyze", params={"fields": "status,secret"})
+
+    assert response.status_code == 422
+
+
+async def test_single_request_projection_hides_the_owner(client, db):
+    await _requests(db, 1)
+
+    response = await client.get("/v1/user/analyze/doc-00", params={"fields": "status"})
+
+    assert response.json()["data"] == {"id": "doc-00", "status": "completed"}
+
+
+@pytest.mark.parametrize(("limit", "expected"), [(1000, 100), (0, 1), (-5, 1)])
+async def test_out_of_range_limit_is_clamped(client, db, limit, expected):
+    await _requests(db, 3)
+
+    response = await client.get("/v1/user/analyze", params={"limit": limit})
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["limit"] == expected
+    assert len(data["requests"]) == min(expected, 3)
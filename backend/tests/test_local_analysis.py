@@ -0,0 +1,87 @@
+from app.jobs import get_job_queue
+from app.local.openai import FakeAsyncOpenAI
+from app.services import analyze_text, openai_client
+from app.services.analyze_text import ANALYZE_TEXT_JOB, is_valid_result
+from app.services.local_analysis import analyze_locally
+
+
+def test_local_result_has_the_model_schema():
+    result = analyze_locally(
+        "The new release is excellent and the team loves it. Setup was quick and easy."
+    )
+
+    assert is_valid_result(result)
+    assert result["sentiment"] == "positive"
+    assert result["keywords"]
+
+
+def test_negative_text_scores_negative():
+    result = analyze_locally("The service was terrible. Support never answered and it broke.")
+
+    assert result["sentiment"] == "negative"
+
+
+def test_stopwords_only_fall_back_to_the_words():
+    assert analyze_locally("it is what it is")["keywords"]
+
+
+async def test_local_mode_completes_without_a_model_call(client, db):
+    response = await client.post("/v1/user/analyze", json={
+        "text": "A perfectly fine text about local analysis.", "analysis_mode": "local"
+    })
+
+    data = response.json()["data"]
+    assert response.status_code == 200
+    assert data["status"] == "completed"
+    assert data["result_source"] == "local"
+    assert is_valid_result(data["result"])
+    assert await get_job_queue().depth() == 0
+    stored = (await db.collection("analyze_request").document(data["document_id"]).get()).to_dict()
+    assert stored["result"] == data["result"]
+    assert stored["result_source"] == "local"
+
+
+async def test_local_then_refine_is_replaced_by_the_model_result(client, db, monkeypatch):
+    monkeypatch.setattr(openai_client, "_openai_client", FakeAsyncOpenAI())
+    text = "A perfectly fine text about refined analysis."
+
+    response = await client.post("/v1/user/analyze", json={
+        "text": text, "analysis_mode": "local-then-refine"
+    })
+
+    data = response.json()["data"]
+    assert data["status"] == "pending"
+    assert data["result_source"] == "local"
+    assert is_valid_result(data["result"])
+    job = await get_job_queue().claim(60, (ANALYZE_TEXT_JOB,))
+    assert job.payload["refine"] is True
+
+    await analyze_text.request_text_analyze(
+        data["document_id"], text, db, refine=True, user_id="bench-user-0"
+    )
+
+    stored = (await db.collection("analyze_request").document(data["document_id"]).get()).to_dict()
+    assert stored["status"] == "completed"
+    assert stored["result_source"] == "model"
+    assert stored["result"] != data["result"]
+
+
+async def test_failed_refine_keeps_the_local_result(db, monkeypatch):
+    monkeypatch.setattr(openai_client, "_openai_client", FakeAsyncOpenAI(error_rate=1.0))
+    monkeypatch.setattr(openai_client.settings, "OPENAI_MAX_RETRIES", 0)
+    local_result = analyze_locally("A perfectly fine text.")
+    doc_ref = db.collection("analyze_request").document("a")
+    await doc_ref.set({
+        "user_id": "u1",
+        "status": "pending",
+        "result": local_result,
+        "result_source": "local",
+        "created_at": "2024",
+    })
+
+    await analyze_text.request_text_analyze("a", "A perfectly fine text.", db, refine=True)
+
+    stored = (await doc_ref.get()).to_dict()
+    assert stored["status"] == "completed"
+    assert stored["result"] == local_result
+    assert stored["result_source"] == "local"
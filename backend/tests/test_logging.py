@@ -0,0 +1,89 @@
+import io
+import logging
+import sys
+
+import orjson
+import pytest
+
+from app.config import Settings
+from app.utils import structured_logging
+from app.utils.structured_logging import (
+    NonBlockingQueueHandler,
+    configure_logging,
+    request_id_var,
+    stop_logging,
+)
+
+
+@pytest.fixture
+def log_output(monkeypatch):
+    """Configure JSON logging into a buffer; restores stdout logging afterwards."""
+    output = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", output)
+    configure_logging(Settings(LOG_FORMAT="json", LOG_LEVEL="INFO", LOG_ACCESS_SAMPLE_RATE=1.0))
+    yield output
+    monkeypatch.undo()
+    configure_logging(Settings())
+
+
+def _queue_handler():
+    (handler,) = [
+        handler
+        for handler in logging.getLogger().handlers
+        if isinstance(handler, NonBlockingQueueHandler)
+    ]
+    return handler
+
+
+def _entries(output):
+    return [orjson.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_records_go_through_the_queue(log_output):
+    assert _queue_handler().queue.maxsize == Settings().LOG_QUEUE_SIZE
+
+    token = request_id_var.set("req-1")
+    try:
+        logging.getLogger("kai.test").info("Queued", extra={"document_id": "a"})
+    finally:
+        request_id_var.reset(token)
+    stop_logging()
+
+    (entry,) = [entry for entry in _entries(log_output) if entry["logger"] == "kai.test"]
+    assert entry["message"] == "Queued"
+    assert entry["request_id"] == "req-1"
+    assert entry["document_id"] == "a"
+
+
+def test_shutdown_flushes_queued_records(log_output):
+    for n in range(500):
+        logging.getLogger("kai.test").info("Record %s", n)
+
+    stop_logging()
+
+    messages = [entry["message"] for entry in _entries(log_output)]
+    assert messages == [f"Record {n}" for n in range(500)]
+    assert structured_logging._listener is None
+
+
+def test_full_queue_drops_records_instead_of_blocking(log_output, monkeypatch):
+    stop_logging()
+    handler = _queue_handler()
+    monkeypatch.setattr(handler.queue, "maxsize", 2)
+
+    for n in range(5):
+        logging.getLogger("kai.test").info("Record %s", n)
+
+    assert handler.dropped == 3
+
+
+async def test_access_log_carries_the_request_id(client, log_output):
+    response = await client.get("/v1/user/analyze")
+    stop_logging()
+
+    (entry,) = [
+        entry for entry in _entries(log_output) if entry["logger"] == "kai.access"
+    ]
+    assert entry["request_id"] == response.headers["X-Request-ID"]
+    assert entry["status_code"] == 200
+    assert entry["method"] == "GET"
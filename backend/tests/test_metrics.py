@@ -0,0 +1,39 @@
+from prometheus_client.parser import text_string_to_metric_families
+
+from app.local.openai import FakeAsyncOpenAI
+from app.services import analyze_text, openai_client
+
+
+async def test_metrics_are_scraped_without_auth(client, db, monkeypatch):
+    monkeypatch.setattr(openai_client, "_openai_client", FakeAsyncOpenAI())
+    response = await client.post("/v1/user/analyze", json={
+        "text": "A perfectly fine text.", "analysis_mode": "model"
+    })
+    document_id = response.json()["data"]["document_id"]
+    await analyze_text.request_text_analyze(
+        document_id, "A perfectly fine text.", db, user_id="bench-user-0"
+    )
+
+    scrape = await client.get("/metrics", headers={"Authorization": ""})
+
+    assert scrape.status_code == 200
+    assert scrape.headers["content-type"].startswith("text/plain")
+    samples = {
+        sample.name: sample
+        for family in text_string_to_metric_families(scrape.text)
+        for sample in family.samples
+    }
+    assert {
+        "kai_http_request_duration_seconds_count",
+        "kai_job_queue_depth",
+        "kai_model_call_duration_seconds_count",
+        "kai_model_tokens_total",
+    } <= set(samples)
+    assert samples["kai_job_queue_depth"].value == 1
+    routes = {
+        sample.labels["route"]
+        for family in text_string_to_metric_families(scrape.text)
+        if family.name == "kai_http_request_duration_seconds"
+        for sample in family.samples
+    }
+    assert "/v1/user/analyze" in routes
@@ -0,0 +1,115 @@
+import pytest
+
+from app.services import analyze_text
+from app.services.openai_client import ModelCallLimiter, ModelCallPolicy
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
+
+
+def _policy(breaker, max_retries=2):
+    return ModelCallPolicy(
+        limiter=ModelCallLimiter(max_concurrency=4, max_queue_size=10),
+        breaker=breaker,
+        timeout=1.0,
+        deadline=5.0,
+        max_retries=max_retries,
+        base_delay=0.0,
+        max_delay=0.0,
+    )
+
+
+def _failing(errors):
+    async def call():
+        error = next(errors, None)
+        if error is not None:
+            raise error
+        return "ok"
+
+    return call
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state is CircuitState.open
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert 0 < error.value.retry_after <= 60
+
+
+def test_half_open_breaker_admits_trial_calls_only():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0, half_open_calls=1)
+    breaker.record_failure()
+
+    assert breaker.state is CircuitState.half_open
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state is CircuitState.closed
+
+
+def test_failed_trial_call_opens_the_breaker_again():
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_timeout=0)
+    for _ in range(3):
+        breaker.record_failure()
+    breaker.before_call()
+
+    breaker.recovery_timeout = 60
+    breaker.record_failure()
+
+    assert breaker.state is CircuitState.open
+
+
+async def test_policy_retries_transient_errors():
+    breaker = CircuitBreaker("test", failure_threshold=10, recovery_timeout=60)
+    policy = _policy(breaker)
+
+    result = await policy.call(_failing(iter([TimeoutError(), TimeoutError()])), "m")
+
+    assert result == "ok"
+    assert breaker.state is CircuitState.closed
+
+
+async def test_policy_does_not_retry_other_errors():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=60)
+
+    with pytest.raises(ValueError):
+        await _policy(breaker).call(_failing(iter([ValueError(), ValueError()])), "m")
+
+    # Not an upstream failure
+    assert breaker.state is CircuitState.closed
+
+
+async def test_policy_fails_fast_once_the_breaker_opens():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+    policy = _policy(breaker, max_retries=5)
+
+    with pytest.raises(CircuitOpenError):
+        await policy.call(_failing(iter([TimeoutError()] * 5)), "m")
+
+
+async def test_success_after_a_failed_attempt_clears_the_error(db, monkeypatch):
+    doc_ref = db.collection("analyze_request").document("a")
+    await doc_ref.set({"user_id": "u1", "status": "pending", "created_at": "2024"})
+    results = iter([RuntimeError("model down")])
+
+    async def analysis(*args, **kwargs):
+        error = next(results, None)
+        if error is not None:
+            raise error
+        return {"summary": "Fine.", "sentiment": "positive", "keywords": ["fine"]}
+
+    monkeypatch.setattr(analyze_text, "run_model_analysis", analysis)
+    with pytest.raises(RuntimeError):
+        await analyze_text.request_text_analyze("a", "Some text.", db, is_last_attempt=False)
+    assert (await doc_ref.get()).to_dict()["error_message"] == "model down"
+
+    await analyze_text.request_text_analyze("a", "Some text.", db)
+
+    data = (await doc_ref.get()).to_dict()
+    assert data["status"] == "completed"
+    assert data["error_message"] is None
@@ -0,0 +1,66 @@
+from app.jobs import InMemoryJobQueue
+from app.services.analysis_requests import submit_analysis_requests
+from app.services.analyze_text import analysis_cache_key, request_text_analyze
+from app.services.model_router import ModelRouter
+from app.services.result_cache import get_result_cache
+
+RESULT = {"summary": "Fine.", "sentiment": "positive", "keywords": ["fine"]}
+TEXT = "A perfectly fine text."
+
+
+async def _no_backlog() -> int:
+    return 0
+
+
+async def test_router_rules():
+    router = ModelRouter(
+        default_model="big",
+        fast_model="small",
+        queue_depth=_no_backlog,
+        short_text_tokens=10,
+        premium_tiers=frozenset({"premium"}),
+    )
+
+    assert await router.route(5) == ("small", "short_text")
+    assert await router.route(5, "premium") == ("big", "premium")
+    assert await router.route(500) == ("big", "default")
+
+
+async def test_cache_is_keyed_on_the_routed_model():
+    assert analysis_cache_key(TEXT, "big") != analysis_cache_key(TEXT, "small")
+
+
+async def test_cache_hit_records_the_model_it_was_routed_to(db, monkeypatch):
+    router = ModelRouter(
+        default_model="big", fast_model="small", queue_depth=_no_backlog, short_text_tokens=100
+    )
+    monkeypatch.setattr("app.services.model_router._model_router", router)
+    queue = InMemoryJobQueue(max_depth=10, max_attempts=3)
+    # Only the other model's result is cached
+    await get_result_cache(db).set(analysis_cache_key(TEXT, "big"), RESULT)
+
+    (item,) = await submit_analysis_requests(db, queue, "u1", [TEXT])
+    assert not item["cache_hit"]
+
+    await get_result_cache(db).set(analysis_cache_key(TEXT, "small"), RESULT)
+    (item,) = await submit_analysis_requests(db, queue, "u1", [TEXT])
+
+    assert item["cache_hit"]
+    snapshot = await db.collection("analyze_request").document(item["document_id"]).get()
+    assert snapshot.to_dict()["model"] == "small"
+
+
+async def test_worker_cache_hit_records_the_model(db, monkeypatch):
+    router = ModelRouter(
+        default_model="big", fast_model="small", queue_depth=_no_backlog, short_text_tokens=100
+    )
+    monkeypatch.setattr("app.services.model_router._model_router", router)
+    doc_ref = db.collection("analyze_request").document("a")
+    await doc_ref.set({"user_id": "u1", "status": "pending", "created_at": "2024"})
+    await get_result_cache(db).set(analysis_cache_key(TEXT, "small"), RESULT)
+
+    await request_text_analyze("a", TEXT, db, user_id="u1")
+
+    data = (await doc_ref.get()).to_dict()
+    assert data["cache_hit"]
+    assert data["model"] == "small"
@@ -0,0 +1,127 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.ratelimit import TokenBucket
+from app.ratelimit.memory import InMemoryRateLimiter
+from app.ratelimit.sqlite import SQLiteRateLimiter
+from app.services import admission
+from app.services.admission import AdmissionController
+
+SLOW = 0.001
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+async def limiter(request, tmp_path):
+    if request.param == "memory":
+        limiter = InMemoryRateLimiter()
+    else:
+        limiter = SQLiteRateLimiter(str(tmp_path / "ratelimit.db"))
+    yield limiter
+    await limiter.close()
+
+
+async def test_bucket_admits_its_burst_then_asks_to_wait(limiter):
+    bucket = TokenBucket("user:a", rate=1.0, capacity=2)
+
+    assert await limiter.acquire([bucket]) == 0
+    assert await limiter.acquire([bucket]) == 0
+    assert await limiter.acquire([bucket]) == pytest.approx(1.0, abs=0.05)
+
+
+async def test_tokens_are_taken_from_all_buckets_or_none(limiter):
+    user = TokenBucket("user:a", rate=SLOW, capacity=5)
+    shared = TokenBucket("global", rate=SLOW, capacity=1)
+
+    assert await limiter.acquire([user, shared]) == 0
+    assert await limiter.acquire([user, shared]) > 0
+
+    # The rejected call took nothing from the user's bucket
+    assert await limiter.acquire([user], 4) == 0
+
+
+async def test_cost_above_capacity_is_capped(limiter):
+    bucket = TokenBucket("user:a", rate=SLOW, capacity=3)
+
+    assert await limiter.acquire([bucket], 10) == 0
+    assert await limiter.acquire([bucket]) > 0
+
+
+async def test_least_recently_used_buckets_are_forgotten():
+    limiter = InMemoryRateLimiter(max_buckets=2)
+    buckets = [TokenBucket(f"user:{n}", rate=SLOW, capacity=1) for n in range(3)]
+
+    await limiter.acquire([buckets[0]])
+    await limiter.acquire([buckets[1]])
+    await limiter.acquire([buckets[2]])
+
+    # Bucket 0 was evicted and starts full again; 1 and 2 are still empty
+    assert await limiter.acquire([buckets[0]]) == 0
+    assert await limiter.acquire([buckets[2]]) > 0
+
+
+def _bucket_keys(limiter):
+    return {row[0] for row in limiter._conn.execute("SELECT key FROM rate_limit_buckets")}
+
+
+async def test_sqlite_prunes_buckets_that_are_full_again(tmp_path):
+    limiter = SQLiteRateLimiter(str(tmp_path / "ratelimit.db"), prune_interval=0)
+    fast = TokenBucket("user:fast", rate=1000.0, capacity=1)
+    slow = TokenBucket("user:slow", rate=SLOW, capacity=1)
+
+    await limiter.acquire([fast])
+    await asyncio.sleep(0.01)
+    await limiter.acquire([slow])
+    assert _bucket_keys(limiter) == {"user:slow"}
+
+    # Pruning forgets nothing: the slow bucket is still empty
+    assert await limiter.acquire([slow]) > 0
+    await limiter.close()
+
+
+async def test_sqlite_prunes_at_most_every_interval(tmp_path):
+    limiter = SQLiteRateLimiter(str(tmp_path / "ratelimit.db"), prune_interval=3600)
+    buckets = [TokenBucket(f"user:{n}", rate=1000.0, capacity=1) for n in range(3)]
+
+    for bucket in buckets:
+        await limiter.acquire([bucket])
+        await asyncio.sleep(0.01)
+
+    # Only the first acquire pruned, before any bucket had refilled
+    assert _bucket_keys(limiter) == {"user:0", "user:1", "user:2"}
+    await limiter.close()
+
+
+async def test_sqlite_migrates_the_bucket_table(tmp_path):
+    path = str(tmp_path / "ratelimit.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE rate_limit_buckets "
+        "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO rate_limit_buckets VALUES ('user:old', 0, 0)")
+    conn.commit()
+    conn.close()
+
+    limiter = SQLiteRateLimiter(path, prune_interval=0)
+    await limiter.acquire([TokenBucket("user:new", rate=SLOW, capacity=1)])
+
+    assert _bucket_keys(limiter) == {"user:new"}
+    await limiter.close()
+
+
+async def test_over_limit_submission_gets_429(client, monkeypatch):
+    monkeypatch.setattr(admission, "_admission_controller", AdmissionController(
+        InMemoryRateLimiter(),
+        user_rate=SLOW, user_burst=1,
+        global_rate=0, global_burst=0,
+        bulk_rate=SLOW, bulk_burst=1,
+    ))
+    body = {"text": "A perfectly fine text.", "analysis_mode": "local"}
+
+    assert (await client.post("/v1/user/analyze", json=body)).status_code == 200
+    response = await client.post("/v1/user/analyze", json=body)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
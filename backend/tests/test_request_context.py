@@ -0,0 +1,115 @@
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from app.middleware.request_context import RequestContextMiddleware
+
+TOKENS = {
+    "good": {"uid": "u1", "name": "Ada", "email": "ada@example.com", "tier": "premium"},
+}
+
+
+async def _verify(token):
+    if token == "broken":
+        raise RuntimeError("verifier down")
+    return TOKENS.get(token)
+
+
+def _app():
+    app = FastAPI()
+
+    @app.get("/me")
+    async def me(request: Request):
+        return request.state.user
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get("/metrics")
+    async def metrics():
+        return {}
+
+    app.add_middleware(RequestContextMiddleware, token_verifier=_verify)
+    return app
+
+
+@pytest.fixture
+async def http():
+    transport = httpx.ASGITransport(app=_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.parametrize("headers", [
+    {},
+    {"Authorization": "Basic abc"},
+    {"Authorization": "Bearer "},
+])
+async def test_missing_or_malformed_header_is_unauthorized(http, headers):
+    response = await http.get("/me", headers=headers)
+
+    assert response.status_code == 401
+    body = response.json()
+    assert body["status_code"] == 401
+    assert body["success"] is False
+    assert body["message"] == body["error"] == "Invalid authorization header"
+    assert body["data"] is None
+    assert "X-Request-ID" in response.headers
+
+
+async def test_rejected_token_is_unauthorized(http):
+    response = await http.get("/me", headers={"Authorization": "Bearer expired"})
+
+    assert response.status_code == 401
+    assert response.json()["message"] == "Invalid or expired token"
+
+
+async def test_verifier_failure_is_a_server_error(http):
+    response = await http.get("/me", headers={"Authorization": "Bearer broken"})
+
+    assert response.status_code == 500
+    assert response.json() == {"detail": "Authentication failed"}
+
+
+async def test_user_is_stored_on_the_request(http):
+    response = await http.get("/me", headers={"Authorization": "Bearer good"})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "user_id": "u1",
+        "name": "Ada",
+        "email": "ada@example.com",
+        "email_verified": False,
+        "tier": "premium",
+    }
+
+
+async def test_every_response_gets_its_own_request_id(http):
+    first = await http.get("/me", headers={"Authorization": "Bearer good"})
+    second = await http.get("/me")
+
+    ids = [first.headers["X-Request-ID"], second.headers["X-Request-ID"]]
+    assert all(uuid.UUID(request_id) for request_id in ids)
+    assert ids[0] != ids[1]
+
+
+@pytest.mark.parametrize("path", ["/health", "/metrics", "/docs", "/openapi.json"])
+async def test_excluded_paths_skip_auth(http, path):
+    response = await http.get(path)
+
+    assert response.status_code == 200
+
+
+async def test_unlogged_paths_have_no_request_id(http):
+    response = await http.get("/health")
+
+    assert "X-Request-ID" not in response.headers
+
+
+async def test_options_requests_skip_auth(http):
+    response = await http.options("/me")
+
+    assert response.status_code != 401
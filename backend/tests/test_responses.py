@@ -0,0 +1,85 @@
+import warnings
+from datetime import UTC, datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.models.response import ErrorResponse, SuccessResponse
+from app.utils.responses import error_response, success_response
+
+DOCUMENT = {
+    "id": "abc",
+    "text": "Ünïcode — and \"quotes\"\n",
+    "status": "completed",
+    "result": {"sentiment": "positive", "keywords": ["a", "b"], "score": 0.75},
+    "partial_result": None,
+    "cache_hit": False,
+    "usage": {"model_calls": 1, "total_tokens": 42},
+    "counts": {1: 2},
+}
+
+
+def _legacy_success(data, message, status_code):
+    """The envelope as rendered before, through the Pydantic models."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        response = SuccessResponse(data=data, message=message, status_code=status_code)
+        return JSONResponse(content=response.dict(), status_code=status_code)
+
+
+def _legacy_error(message, error, status_code):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        response = ErrorResponse(error=error or message)
+        response.message = message
+        response.status_code = status_code
+        return JSONResponse(content=response.dict(), status_code=status_code)
+
+
+@pytest.mark.parametrize("data", [
+    None,
+    DOCUMENT,
+    {"requests": [DOCUMENT, DOCUMENT], "next_cursor": None, "total": 2},
+    [],
+    "text",
+])
+def test_success_envelope_is_unchanged(data):
+    response = success_response(data=data, message="Done")
+    legacy = _legacy_success(data, "Done", 200)
+
+    assert response.body == legacy.body
+    assert response.status_code == legacy.status_code
+    assert response.headers["content-type"] == legacy.headers["content-type"]
+
+
+@pytest.mark.parametrize(("message", "error", "status_code"), [
+    ("Analysis request not found", None, 404),
+    ("Invalid authorization header", "Invalid authorization header", 401),
+    ("Validation failed", "Text cannot be empty", 422),
+    ("Analysis queue is full, please retry later", None, 503),
+])
+def test_error_envelope_is_unchanged(message, error, status_code):
+    response = error_response(message=message, error=error, status_code=status_code)
+    legacy = _legacy_error(message, error, status_code)
+
+    assert response.body == legacy.body
+    assert response.status_code == legacy.status_code
+
+
+def test_datetimes_are_rendered_in_iso_format():
+    data = {
+        "created_at": datetime(2024, 1, 2, 3, 4, 5, 6000),
+        "updated_at": datetime(2024, 1, 2, 3, 4, 5, tzinfo=UTC),
+    }
+
+    response = success_response(data=data)
+
+    # The old renderer could not serialize datetimes; this is FastAPI's encoding
+    expected = JSONResponse(content=jsonable_encoder({
+        "status_code": 200, "data": data, "message": "Operation completed successfully",
+        "success": True,
+    }))
+    assert response.body == expected.body
+    assert b'"created_at":"2024-01-02T03:04:05.006000"' in response.body
+    assert b'"updated_at":"2024-01-02T03:04:05+00:00"' in response.body
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from app.services.result_cache import FirestoreResultStore, ResultCache, result_cache_key
+
+RESULT = {"summary": "Fine.", "sentiment": "positive", "keywords": ["fine"]}
+
+
+def test_key_depends_on_model_prompt_and_text():
+    key = result_cache_key("text", "model", "v1")
+
+    assert key == result_cache_key("text", "model", "v1")
+    assert key != result_cache_key("text", "other", "v1")
+    assert key != result_cache_key("text", "model", "v2")
+    assert key != result_cache_key("other", "model", "v1")
+
+
+async def test_concurrent_misses_share_one_computation():
+    cache = ResultCache(max_size=10, ttl=60)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return RESULT
+
+    outcomes = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+
+    assert calls == 1
+    assert all(result == RESULT for result, _ in outcomes)
+    assert sorted(hit for _, hit in outcomes) == [False, True, True, True, True]
+    assert await cache.get_or_compute("k", compute) == (RESULT, True)
+
+
+async def test_failure_reaches_every_waiter_and_is_not_cached():
+    cache = ResultCache(max_size=10, ttl=60)
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model down")
+
+    outcomes = await asyncio.gather(
+        *(cache.get_or_compute("k", compute) for _ in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert await cache.get("k") is None
+
+
+async def test_uncacheable_results_are_not_stored():
+    cache = ResultCache(max_size=10, ttl=60)
+
+    async def compute():
+        return {"parse_error": "bad"}
+
+    await cache.get_or_compute("k", compute, cacheable=lambda result: "parse_error" not in result)
+
+    assert await cache.get("k") is None
+
+
+async def test_cancelled_leader_lets_a_waiter_compute():
+    cache = ResultCache(max_size=10, ttl=60)
+    started = asyncio.Event()
+
+    async def slow():
+        started.set()
+        await asyncio.sleep(10)
+
+    async def fast():
+        return RESULT
+
+    leader = asyncio.create_task(cache.get_or_compute("k", slow))
+    await started.wait()
+    waiter = asyncio.create_task(cache.get_or_compute("k", fast))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await waiter == (RESULT, False)
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+async def test_persistent_tier_fills_the_memory_tier(db):
+    store = FirestoreResultStore(db, "result_cache", ttl=60)
+    await ResultCache(max_size=10, ttl=60, persistent=store).set("k", RESULT)
+    cache = ResultCache(max_size=10, ttl=60, persistent=store)
+
+    assert await cache.get("k") == RESULT
+    assert cache.memory.get("k") == RESULT
@@ -0,0 +1,64 @@
+import asyncio
+
+from app.services.status_events import StatusBroker, status_event
+
+
+async def _request(db, document_id="a", **fields):
+    await db.collection("analyze_request").document(document_id).set({
+        "user_id": "u1", "status": "pending", "updated_at": "1", **fields
+    })
+
+
+async def test_subscription_starts_with_the_current_state(db):
+    await _request(db)
+    broker = StatusBroker(poll_interval=60, idle_timeout=60)
+
+    subscription = await broker.subscribe("a", db, user_id="u1")
+
+    assert (await subscription.get(1))["status"] == "pending"
+    subscription.close()
+
+
+async def test_other_users_cannot_subscribe(db):
+    await _request(db)
+    broker = StatusBroker(poll_interval=60, idle_timeout=60)
+
+    assert await broker.subscribe("a", db, user_id="u2") is None
+    assert await broker.subscribe("missing", db) is None
+
+
+async def test_publish_during_the_first_read_keeps_the_owner(db):
+    await _request(db)
+    db.latency = 0.05
+    broker = StatusBroker(poll_interval=60, idle_timeout=60)
+    subscribing = asyncio.create_task(broker.subscribe("a", db, user_id="u1"))
+    await asyncio.sleep(0.01)
+
+    broker.publish("a", status_event("a", {"status": "processing", "updated_at": "2"}))
+    subscription = await subscribing
+
+    assert subscription is not None
+    assert broker.latest("a")["status"] == "processing"
+    assert broker.latest("a")["user_id"] == "u1"
+    subscription.close()
+
+
+async def test_refresh_reads_every_watched_request_in_one_round_trip(db):
+    await _request(db, "a")
+    await _request(db, "b")
+    broker = StatusBroker(poll_interval=0.01, idle_timeout=60)
+    subscriptions = [await broker.subscribe(document_id, db) for document_id in "ab"]
+    for subscription in subscriptions:
+        await subscription.get(1)
+    await asyncio.sleep(0.015)
+    round_trips = db.round_trips
+
+    # Written by another process, so nothing is published
+    await _request(db, "b", status="completed", updated_at="2")
+    event = await subscriptions[1].get(1)
+
+    assert event["status"] == "completed"
+    # The write plus one batched read per refresh
+    assert db.round_trips - round_trips <= 1 + 2
+    for subscription in subscriptions:
+        subscription.close()
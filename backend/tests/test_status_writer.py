@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from app.local.openai import FakeAsyncOpenAI
+from app.services import analyze_text, openai_client, status_writer
+from app.services.analysis_stats import get_user_stats
+from app.services.status_writer import StatusWriter, close_status_writer, get_status_writer
+
+
+async def _stored(db, document_id):
+    snapshot = await db.collection("analyze_request").document(document_id).get()
+    return snapshot.to_dict() if snapshot.exists else None
+
+
+async def test_concurrent_writes_are_committed_in_one_batch(db):
+    commits = []
+    writer = StatusWriter(db, "analyze_request", flush_interval=0.01, on_commit=commits.append)
+    round_trips = db.round_trips
+
+    await asyncio.gather(*(
+        writer.write(f"doc-{n}", {"status": "processing"}) for n in range(20)
+    ))
+    await writer.write("doc-0", {"status": "completed"}, durable=True)
+
+    assert writer.batches_committed == 1
+    assert writer.writes_committed == 20
+    assert db.round_trips - round_trips == 1
+    assert sorted(commits[0]) == sorted(f"doc-{n}" for n in range(20))
+    # Later writes to a document win
+    assert (await _stored(db, "doc-0"))["status"] == "completed"
+    await writer.close()
+
+
+async def test_durable_write_waits_for_the_commit(db):
+    writer = StatusWriter(db, "analyze_request", flush_interval=0.01)
+
+    await writer.write("a", {"status": "processing"})
+    assert await _stored(db, "a") is None
+    await writer.write("a", {"status": "completed"}, durable=True)
+
+    assert (await _stored(db, "a"))["status"] == "completed"
+    await writer.close()
+
+
+async def test_status_changes_update_the_user_counters(db):
+    await db.collection("analyze_request").document("a").set({
+        "user_id": "u1", "status": "pending", "created_at": "2024"
+    })
+    writer = StatusWriter(db, "analyze_request", flush_interval=0.01)
+
+    await writer.write("a", {"status": "completed"}, durable=True, user_id="u1")
+
+    stats = await get_user_stats(db, "u1")
+    assert stats["by_status"]["completed"] == 1
+    await writer.close()
+
+
+async def test_final_status_is_committed_before_the_job_finishes(db, monkeypatch):
+    # Non-durable writes would still be buffered when the job returns
+    monkeypatch.setattr(status_writer.settings, "STATUS_WRITER_FLUSH_INTERVAL_SECONDS", 0.2)
+    monkeypatch.setattr(openai_client, "_openai_client", FakeAsyncOpenAI())
+    await db.collection("analyze_request").document("a").set({
+        "user_id": "u1", "status": "pending", "created_at": "2024"
+    })
+
+    await analyze_text.request_text_analyze("a", "A perfectly fine text.", db, user_id="u1")
+
+    assert (await _stored(db, "a"))["status"] == "completed"
+
+
+async def test_close_flushes_pending_writes(db):
+    writer = get_status_writer(db)
+    writer.flush_interval = 60
+
+    await writer.write("a", {"status": "processing"})
+    await writer.write("b", {"status": "processing"})
+    assert await _stored(db, "a") is None
+    await close_status_writer()
+
+    assert (await _stored(db, "a"))["status"] == "processing"
+    assert (await _stored(db, "b"))["status"] == "processing"
+    assert status_writer._status_writer is None
+
+
+async def test_failed_batch_fails_its_durable_writes(db, monkeypatch):
+    writer = StatusWriter(db, "analyze_request", flush_interval=0.01)
+
+    async def fail(self):
+        raise RuntimeError("commit failed")
+
+    monkeypatch.setattr(type(db.batch()), "commit", fail)
+    await writer.write("a", {"status": "processing"})
+    with pytest.raises(RuntimeError, match="commit failed"):
+        await writer.write("b", {"status": "completed"}, durable=True)
+
+    assert writer.writes_failed == 2
+    assert writer.batches_committed == 0
+    assert await _stored(db, "b") is None
+    monkeypatch.undo()
+    # The writer keeps going after a failed batch
+    await writer.write("c", {"status": "completed"}, durable=True)
+    assert (await _stored(db, "c"))["status"] == "completed"
+    await writer.close()
@@ -0,0 +1,49 @@
+import pytest
+
+from app.local.openai import FakeAsyncOpenAI
+from app.services import analyze_text, openai_client
+from app.services.status_events import get_status_broker
+from app.utils.partial_json import parse_partial_json
+
+
+@pytest.mark.parametrize(("text", "expected"), [
+    ("", None),
+    ("{", {}),
+    ('{"summary": "The quick br', {"summary": "The quick br"}),
+    ('{"summary": "Done", "keywords": ["a", "b', {"summary": "Done", "keywords": ["a", "b"]}),
+    ('{"summary": "Done", "sentim', {"summary": "Done"}),
+    ('{"summary": "Done", "score": 1.', {"summary": "Done"}),
+    ('{"summary": "Line\\', {"summary": "Line"}),
+    ('{"summary": "caf\\u00e', {"summary": "caf"}),
+    ('{"summary": "a, b", "keywords": [', {"summary": "a, b", "keywords": []}),
+])
+def test_parse_partial_json(text, expected):
+    assert parse_partial_json(text) == expected
+
+
+def test_complete_json_parses_as_is():
+    assert parse_partial_json('{"summary": "Done", "keywords": []}') == {
+        "summary": "Done", "keywords": []
+    }
+
+
+async def test_streamed_analysis_publishes_partials_then_clears_them(db, monkeypatch):
+    monkeypatch.setattr(analyze_text.settings, "ANALYSIS_STREAMING", True)
+    monkeypatch.setattr(analyze_text.settings, "STREAM_PARTIAL_PUBLISH_INTERVAL_SECONDS", 0.0)
+    monkeypatch.setattr(openai_client, "_openai_client", FakeAsyncOpenAI(latency=0.05))
+    doc_ref = db.collection("analyze_request").document("a")
+    await doc_ref.set({"user_id": "u1", "status": "pending", "created_at": "2024"})
+    subscription = await get_status_broker().subscribe("a", db)
+
+    await analyze_text.request_text_analyze("a", "A perfectly fine text about streaming.", db)
+
+    events = []
+    while (event := await subscription.get(0.1)) is not None:
+        events.append(event)
+    subscription.close()
+    partials = [event["partial_result"] for event in events if event.get("partial_result")]
+    assert partials
+    assert all(set(partial) <= {"summary", "keywords"} for partial in partials)
+    data = (await doc_ref.get()).to_dict()
+    assert data["status"] == "completed"
+    assert data["partial_result"] is None
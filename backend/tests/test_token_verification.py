@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+
+import firebase_admin
+import google.auth.credentials
+import pytest
+from firebase_admin import credentials
+from firebase_admin._token_gen import ID_TOKEN_CERT_URI, CertificateFetchRequest
+
+from app.utils import token_verification
+from app.utils.token_verification import TokenCache, verify_firebase_token
+
+
+class _Verifier:
+    """Stands in for ``auth.verify_id_token``, answering from a list of results."""
+
+    def __init__(self, *results, release=None):
+        self.results = list(results)
+        self.release = release
+        self.calls = 0
+
+    def __call__(self, token):
+        self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        result = self.results[min(self.calls, len(self.results)) - 1]
+        return dict(result) if result else None
+
+
+@pytest.fixture(autouse=True)
+def token_cache(monkeypatch):
+    cache = TokenCache(max_size=100, ttl=300)
+    monkeypatch.setattr(token_verification, "_token_cache", cache)
+    monkeypatch.setattr(token_verification, "_in_flight", {})
+    return cache
+
+
+def _use(monkeypatch, verifier):
+    monkeypatch.setattr(token_verification, "_verify_id_token", verifier)
+    return verifier
+
+
+async def test_verified_token_is_served_from_the_cache(monkeypatch):
+    verifier = _use(monkeypatch, _Verifier({"uid": "u1", "exp": time.time() + 3600}))
+
+    first = await verify_firebase_token("token")
+    second = await verify_firebase_token("token")
+
+    assert first["uid"] == second["uid"] == "u1"
+    assert verifier.calls == 1
+
+
+async def test_cache_entry_ends_at_the_token_expiry(monkeypatch, token_cache):
+    exp = time.time() + 0.05
+    verifier = _use(monkeypatch, _Verifier({"uid": "u1", "exp": exp}, None))
+
+    assert await verify_firebase_token("token") is not None
+    assert token_cache._entries[TokenCache.key("token")][0] == exp
+    await asyncio.sleep(0.06)
+
+    # Verified again once expired, and Firebase now rejects it
+    assert await verify_firebase_token("token") is None
+    assert verifier.calls == 2
+
+
+async def test_cache_ttl_applies_to_long_lived_tokens(monkeypatch, token_cache):
+    token_cache.ttl = 0.05
+    verifier = _use(monkeypatch, _Verifier({"uid": "u1", "exp": time.time() + 3600}))
+
+    await verify_firebase_token("token")
+    await asyncio.sleep(0.06)
+    await verify_firebase_token("token")
+
+    assert verifier.calls == 2
+
+
+async def test_rejected_token_is_never_cached(monkeypatch, token_cache):
+    # A revoked or expired token fails verification every time it is sent
+    verifier = _use(monkeypatch, _Verifier(None))
+
+    assert await verify_firebase_token("revoked") is None
+    assert await verify_firebase_token("revoked") is None
+
+    assert verifier.calls == 2
+    assert len(token_cache) == 0
+
+
+async def test_concurrent_misses_share_one_verification(monkeypatch):
+    release = threading.Event()
+    verifier = _use(
+        monkeypatch, _Verifier({"uid": "u1", "exp": time.time() + 3600}, release=release)
+    )
+
+    tasks = [asyncio.create_task(verify_firebase_token("token")) for _ in range(10)]
+    await asyncio.sleep(0.01)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert verifier.calls == 1
+    assert {result["uid"] for result in results} == {"u1"}
+    assert token_verification._in_flight == {}
+
+
+class _AnonymousCredential(credentials.Base):
+    def get_credential(self):
+        return google.auth.credentials.AnonymousCredentials()
+
+
+def test_cert_prefetch_warms_the_firebase_verifier(monkeypatch):
+    fetched = []
+    monkeypatch.setattr(
+        CertificateFetchRequest, "__call__", lambda self, url, **kwargs: fetched.append(url)
+    )
+    app = firebase_admin.initialize_app(_AnonymousCredential(), {"projectId": "test"})
+    try:
+        token_verification._fetch_public_certs()
+    finally:
+        firebase_admin.delete_app(app)
+
+    assert fetched == [ID_TOKEN_CERT_URI]
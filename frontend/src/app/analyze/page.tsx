@@ -15,8 +15,9 @@ interface StatusBadgeProps {
 // Define types for analysis submissions
 interface AnalysisSubmission {
   id: string;
-  user_id: string;
-  text: string;
+  user_id?: string;
+  text?: string;
+  text_preview?: string;
   status: StatusType;
   result?: {
     summary: string;
@@ -41,6 +42,8 @@ export default function Analyze() {
     const [totalPages, setTotalPages] = useState(1);
     const [totalItems, setTotalItems] = useState(0);
     const itemsPerPage = 10;
+    // The list only reads what it renders; the full text stays in Firestore
+    const listFields = 'status,text_preview,result,error_message,created_at';
     const router = useRouter();
     const { user, loading: authLoading, isTokenValid } = useAuth();
 
@@ -51,8 +54,8 @@ export default function Analyze() {
           errors.push('Text is required');
         }
 
-        if (text.length > 10000) {
-          errors.push('Text must be less than 10,000 characters');
+        if (text.length > 100000) {
+          errors.push('Text must be less than 100,000 characters');
         }
 
         if (text.length < 3) {
@@ -67,7 +70,7 @@ export default function Analyze() {
         try {
             setSubmissionsLoading(true);
             const offset = (page - 1) * itemsPerPage;
-            const response = await fetchWithAuth(`/user/analyze?offset=${offset}&limit=${itemsPerPage}`, {
+            const response = await fetchWithAuth(`/user/analyze?offset=${offset}&limit=${itemsPerPage}&fields=${listFields}`, {
                 method: 'GET',
             });
             console.log('Submissions response:', response);
@@ -87,7 +90,7 @@ export default function Analyze() {
         } finally {
             setSubmissionsLoading(false);
         }
-    }, [currentPage, itemsPerPage]);
+    }, [currentPage, itemsPerPage, listFields]);
     useEffect(() => {
         console.log('Analyze page useEffect - authLoading:', authLoading, 'user:', user);
 
@@ -255,7 +258,7 @@ export default function Analyze() {
                                     <div className="flex items-start justify-between gap-4 p-3 pt-0">
                                         <div className="flex-1 min-w-0">
                                             <p className="text-sm text-muted-foreground mb-2 font-bold">
-                                                {submission.text}
+                                                {submission.text_preview ?? submission.text}
                                             </p>
                                             {
                                                 submission.result && (